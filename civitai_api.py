@@ -4,26 +4,182 @@ CivitAI API Utility
 Provides functions to interact with CivitAI API for model discovery and download URL extraction.
 """
 import requests
-from typing import Dict, List, Optional
+from requests.adapters import HTTPAdapter
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 import os
+import threading
+import time
+
+REQUEST_TIMEOUT = (10, 30)      # (connect, read) seconds
+POOL_SIZE = 8                   # Keep-alive connections to civitai.com
+CACHE_ENTRIES = 256             # LRU capacity of the response cache
+CACHE_TTL = 600                 # Seconds a cached response is reused
+MAX_RATE_LIMIT_RETRIES = 4      # 429 retries before giving up
+MAX_RETRY_AFTER = 120           # Cap on a single Retry-After wait (seconds)
+PAGE_SIZE = 100                 # Largest page the /models endpoint returns
+RESOLVE_WORKERS = 8             # Concurrent lookups in the batch resolvers
+
+class ResponseCache:
+    """Thread-safe LRU cache with a per-entry TTL for decoded JSON responses"""
+    
+    def __init__(self, max_entries: int = CACHE_ENTRIES, ttl: float = CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key) -> Optional[Any]:
+        """Return a fresh cached value, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+def _retry_after_seconds(value: Optional[str], attempt: int) -> float:
+    """
+    Parse a Retry-After header (delta-seconds or HTTP date)
+    
+    Falls back to exponential backoff when the header is missing or invalid.
+    """
+    delay = None
+    if value:
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                delay = None
+    if delay is None:
+        delay = 2 ** attempt
+    return min(max(delay, 0.0), MAX_RETRY_AFTER)
 
 class CivitAIAPI:
     """Wrapper for CivitAI REST API v1"""
     
     BASE_URL = "https://civitai.com/api/v1"
     
-    def __init__(self, api_token: Optional[str] = None):
+    def __init__(self, api_token: Optional[str] = None,
+                 cache_ttl: float = CACHE_TTL,
+                 cache_entries: int = CACHE_ENTRIES,
+                 catalog: Optional[str] = None,
+                 offline: Optional[bool] = None):
         """
         Initialize CivitAI API client
         
         Args:
             api_token: Optional CivitAI API token for authenticated requests
+            cache_ttl: Seconds a lookup result is reused (0 disables the cache)
+            cache_entries: Maximum number of cached responses
+            catalog: Path of a local catalogue (see civitai_catalog.py)
+            offline: Answer search_models/get_top_loras/get_model from the
+                catalogue (default: $CIVITAI_OFFLINE == "1")
         """
         self.api_token = api_token or os.getenv("CIVITAI_API_TOKEN")
         self.headers = {"Content-Type": "application/json"}
        
         if self.api_token:
             self.headers["Authorization"] = f"Bearer {self.api_token}"
+        
+        # One keep-alive session per client; sized for concurrent lookups
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE, max_retries=2)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        self.cache = ResponseCache(cache_entries, cache_ttl) if cache_ttl > 0 else None
+        
+        self.offline = os.getenv("CIVITAI_OFFLINE") == "1" if offline is None else offline
+        self.catalog_path = catalog or os.getenv("CIVITAI_CATALOG")
+        self._catalog = None
+        # Shared across threads: after a 429 every request waits until this time
+        self._throttled_until = 0.0
+        self._throttle_lock = threading.Lock()
+    
+    def _get(self, path: str, params: Optional[Dict] = None, use_cache: bool = True) -> Dict:
+        """
+        GET a JSON document from the API
+        
+        Responses are served from the LRU+TTL cache when fresh. 429 responses
+        are retried after the server's Retry-After delay, and the delay is
+        applied to all requests made through this client.
+        
+        Args:
+            path: Path below BASE_URL (e.g. "/models/123") or an absolute URL
+            params: Query parameters
+            use_cache: Read and populate the response cache
+            
+        Returns:
+            Decoded JSON response
+        """
+        url = path if path.startswith("http") else f"{self.BASE_URL}{path}"
+        key = (url, tuple(sorted((k, tuple(v) if isinstance(v, list) else v)
+                                 for k, v in (params or {}).items())))
+        if use_cache and self.cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            wait = self._throttled_until - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            
+            response = self.session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+            if response.status_code != 429 or attempt == MAX_RATE_LIMIT_RETRIES:
+                break
+            
+            delay = _retry_after_seconds(response.headers.get("Retry-After"), attempt)
+            with self._throttle_lock:
+                self._throttled_until = max(self._throttled_until, time.monotonic() + delay)
+        
+        response.raise_for_status()
+        data = response.json()
+        if use_cache and self.cache:
+            self.cache.put(key, data)
+        return data
+    
+    @property
+    def catalog(self):
+        """The local ModelCatalog, opened on first use"""
+        if self._catalog is None:
+            from civitai_catalog import DEFAULT_CATALOG, ModelCatalog
+            self._catalog = ModelCatalog(self.catalog_path or DEFAULT_CATALOG)
+        return self._catalog
+    
+    def sync_catalog(self, **filters) -> Dict:
+        """
+        Incrementally pull models into the local catalogue
+        
+        Args:
+            **filters: types, base_models, query, limit, full (see ModelCatalog.sync)
+            
+        Returns:
+            Dict with fetched, updated and unchanged counts (unchanged
+            models get their download counts and ratings refreshed)
+        """
+        return self.catalog.sync(self, **filters)
     
     def get_model(self, model_id: int) -> Dict:
         """
@@ -35,17 +191,20 @@ class CivitAIAPI:
         Returns:
             Model data including all versions and download URLs
         """
-        url = f"{self.BASE_URL}/models/{model_id}"
-        response = requests.get(url, headers=self.headers)
-        response.raise_for_status()
-        return response.json()
+        if self.offline:
+            model = self.catalog.get_model(model_id)
+            if model is None:
+                raise ValueError(f"Model {model_id} is not in the offline catalogue")
+            return model
+        return self._get(f"/models/{model_id}")
     
     def search_models(self, 
                      query: Optional[str] = None,
                      types: Optional[List[str]] = None,
                      sort: str = "Highest Rated",
                      limit: int = 20,
-                     base_models: Optional[List[str]] = None) -> Dict:
+                     base_models: Optional[List[str]] = None,
+                     offline: Optional[bool] = None) -> Dict:
         """
         Search for models
         
@@ -55,11 +214,16 @@ class CivitAIAPI:
             sort: Sort order ("Highest Rated", "Most Downloaded", "Newest")
             limit: Number of results (max 100)
             base_models: Filter by base models (e.g., ["SDXL 1.0"])
+            offline: Query the local catalogue (default: the client's mode)
             
         Returns:
             Search results with models list
         """
-        url = f"{self.BASE_URL}/models"
+        if self.offline if offline is None else offline:
+            items = self.catalog.search(query, types=types, sort=sort,
+                                        limit=limit, base_models=base_models)
+            return {"items": items, "metadata": {"source": "catalog"}}
+        
         params = {"limit": limit, "sort": sort}
         
         if query:
@@ -69,9 +233,53 @@ class CivitAIAPI:
         if base_models:
             params["baseModels"] = base_models
             
-        response = requests.get(url, headers=self.headers, params=params)
-        response.raise_for_status()
-        return response.json()
+        return self._get("/models", params)
+    
+    def iter_models(self,
+                    query: Optional[str] = None,
+                    types: Optional[List[str]] = None,
+                    sort: str = "Highest Rated",
+                    base_models: Optional[List[str]] = None,
+                    limit: Optional[int] = None,
+                    page_size: int = PAGE_SIZE) -> Iterator[Dict]:
+        """
+        Stream models across pages of the /models cursor API
+        
+        Pages are fetched lazily as the iterator is consumed, so stopping
+        early costs nothing further.
+        
+        Args:
+            query, types, sort, base_models: Same filters as search_models
+            limit: Stop after this many models (None = all pages)
+            page_size: Models per request (max 100; never more than limit)
+            
+        Yields:
+            Model documents, including their modelVersions
+        """
+        size = min(page_size, PAGE_SIZE)
+        if limit is not None:
+            size = max(1, min(size, limit))  # A small limit needs only a small page
+        params = {"limit": size, "sort": sort}
+        if query:
+            params["query"] = query
+        if types:
+            params["types"] = types
+        if base_models:
+            params["baseModels"] = base_models
+        
+        seen = 0
+        while True:
+            page = self._get("/models", params)
+            for item in page.get("items", []):
+                yield item
+                seen += 1
+                if limit is not None and seen >= limit:
+                    return
+            
+            cursor = page.get("metadata", {}).get("nextCursor")
+            if not cursor or not page.get("items"):
+                return
+            params = dict(params, cursor=cursor)
     
     def get_model_version(self, version_id: int) -> Dict:
         """
@@ -83,22 +291,24 @@ class CivitAIAPI:
         Returns:
             Version data including download URL
         """
-        url = f"{self.BASE_URL}/model-versions/{version_id}"
-        response = requests.get(url, headers=self.headers)
-        response.raise_for_status()
-        return response.json()
+        return self._get(f"/model-versions/{version_id}")
     
-    def get_download_url(self, model_id: int, version_index: int = 0) -> str:
+    def get_download_url(self, model_id: int, version_index: int = 0,
+                         version_id: Optional[int] = None) -> str:
         """
         Get download URL for a model version
         
         Args:
             model_id: CivitAI model ID
             version_index: Index of version in model versions list (0 = latest)
+            version_id: Exact version ID; fetches only that version document
             
         Returns:
             Download URL string
         """
+        if version_id is not None:
+            return self.get_model_version(version_id).get("downloadUrl", "")
+        
         model_data = self.get_model(model_id)
         if "modelVersions" not in model_data or not model_data["modelVersions"]:
             raise ValueError(f"No versions found for model {model_id}")
@@ -106,31 +316,129 @@ class CivitAIAPI:
         version = model_data["modelVersions"][version_index]
         return version.get("downloadUrl", "")
     
-    def get_top_loras(self, base_model: str = "SDXL 1.0", limit: int = 10) -> List[Dict]:
+    @staticmethod
+    def version_info(version: Dict, model_id: Optional[int] = None,
+                     file_type: Optional[str] = None,
+                     file_format: Optional[str] = None) -> Dict:
+        """
+        Summarise one file of a model version (the primary file by default)
+        
+        Args:
+            version: Version document (from /model-versions or a model's modelVersions)
+            model_id: Model ID, when the version document does not carry it
+            file_type: Pick the file of this type instead (e.g. "Model", "VAE"),
+                as in a download URL's ?type= parameter
+            file_format: Pick the file of this format (e.g. "SafeTensor"),
+                as in a download URL's ?format= parameter
+            
+        Returns:
+            Dict with model_id, version_id, version_name, download_url,
+            file_name, size_bytes and sha256 (lowercase hex or None)
+        """
+        files = version.get("files") or []
+        if file_type or file_format:
+            files = [f for f in files
+                     if (not file_type or f.get("type") == file_type)
+                     and (not file_format or (f.get("metadata") or {}).get("format") == file_format)]
+        primary = next((f for f in files if f.get("primary")), files[0] if files else {})
+        sha256 = (primary.get("hashes") or {}).get("SHA256")
+        size_kb = primary.get("sizeKB")
+        return {
+            "model_id": version.get("modelId", model_id),
+            "version_id": version.get("id"),
+            "version_name": version.get("name"),
+            "download_url": primary.get("downloadUrl") or version.get("downloadUrl", ""),
+            "file_name": primary.get("name"),
+            "size_bytes": round(size_kb * 1024) if size_kb else None,
+            "sha256": sha256.lower() if sha256 else None,
+        }
+    
+    def _resolve(self, ids: Iterable[int], fetch, workers: int) -> Dict[int, Dict]:
+        """Run fetch(id) for each ID concurrently; failures become {"error": ...}"""
+        ids = list(dict.fromkeys(ids))
+        
+        def run(item_id):
+            try:
+                return item_id, fetch(item_id)
+            except (requests.RequestException, ValueError, KeyError, IndexError) as e:
+                return item_id, {"error": str(e)}
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(ids) or 1))) as pool:
+            return dict(pool.map(run, ids))
+    
+    def resolve_versions(self, version_ids: Iterable[int],
+                         workers: int = RESOLVE_WORKERS) -> Dict[int, Dict]:
+        """
+        Resolve many version IDs to download details concurrently
+        
+        Args:
+            version_ids: CivitAI model version IDs
+            workers: Concurrent requests (sharing this client's session)
+            
+        Returns:
+            {version_id: version_info(...)}, or {"error": message} per failed ID
+        """
+        return self._resolve(
+            version_ids, lambda vid: self.version_info(self.get_model_version(vid)), workers)
+    
+    def resolve_models(self, model_ids: Iterable[int], version_index: int = 0,
+                       workers: int = RESOLVE_WORKERS) -> Dict[int, Dict]:
+        """
+        Resolve many model IDs to the download details of one version each
+        
+        Args:
+            model_ids: CivitAI model IDs
+            version_index: Index into each model's versions (0 = latest)
+            workers: Concurrent requests (sharing this client's session)
+            
+        Returns:
+            {model_id: version_info(...)}, or {"error": message} per failed ID
+        """
+        def fetch(model_id):
+            versions = self.get_model(model_id).get("modelVersions") or []
+            if not versions:
+                raise ValueError(f"No versions found for model {model_id}")
+            return self.version_info(versions[version_index], model_id)
+        
+        return self._resolve(model_ids, fetch, workers)
+    
+    def get_top_loras(self, base_model: str = "SDXL 1.0", limit: int = 10,
+                      offline: Optional[bool] = None) -> List[Dict]:
         """
         Get top-rated LoRAs for a specific base model
         
         Args:
             base_model: Base model name (e.g., "SDXL 1.0", "SD 1.5")
-            limit: Number of results
+            limit: Number of results (pages are followed beyond 100)
+            offline: Query the local catalogue (default: the client's mode)
             
         Returns:
             List of LoRA models sorted by highest rating
         """
-        result = self.search_models(
+        if self.offline if offline is None else offline:
+            return self.catalog.search(types=["LORA"], base_models=[base_model],
+                                       sort="Highest Rated", limit=limit)
+        return list(self.iter_models(
             types=["LORA"],
             base_models=[base_model],
             sort="Highest Rated",
             limit=limit
-        )
-        return result.get("items", [])
+        ))
 
 
 # Convenience functions
+_clients: Dict[Optional[str], CivitAIAPI] = {}
+
+def get_client(api_token: Optional[str] = None) -> CivitAIAPI:
+    """Return a shared client per token so repeated calls reuse its session and cache"""
+    token = api_token or os.getenv("CIVITAI_API_TOKEN")
+    if token not in _clients:
+        _clients[token] = CivitAIAPI(token)
+    return _clients[token]
+
 def get_civitai_download_url(model_id: int, api_token: Optional[str] = None) -> str:
     """Quick function to get download URL for a model"""
-    api = CivitAIAPI(api_token)
-    return api.get_download_url(model_id)
+    return get_client(api_token).get_download_url(model_id)
 
 
 if __name__ == "__main__":
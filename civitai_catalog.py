@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+CivitAI Catalogue
+Local SQLite (FTS5) index of CivitAI models, versions, files and hashes, synced
+incrementally from the API so searches can be answered offline in milliseconds.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_CATALOG = os.path.join(
+    os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "comfy", "civitai_catalog.db")
+
+# Incremental sync stops after this many consecutive models that are already
+# indexed with the same latest version (i.e. nothing newer further down)
+UNCHANGED_STOP = 100
+
+# Offline equivalents of the API's sort orders
+SORT_COLUMNS = {
+    "Highest Rated": "rating DESC, thumbs_up DESC",
+    "Most Downloaded": "download_count DESC",
+    "Newest": "published_at DESC",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    type TEXT,
+    nsfw INTEGER,
+    creator TEXT,
+    tags TEXT,
+    download_count INTEGER,
+    favorite_count INTEGER,
+    thumbs_up INTEGER,
+    rating REAL,
+    published_at TEXT,
+    latest_version_id INTEGER,
+    synced_at REAL,
+    raw TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versions (
+    id INTEGER PRIMARY KEY,
+    model_id INTEGER NOT NULL REFERENCES models(id) ON DELETE CASCADE,
+    name TEXT,
+    base_model TEXT,
+    published_at TEXT,
+    download_url TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    version_id INTEGER NOT NULL REFERENCES versions(id) ON DELETE CASCADE,
+    name TEXT,
+    size_bytes INTEGER,
+    sha256 TEXT,
+    is_primary INTEGER,
+    PRIMARY KEY (version_id, name)
+);
+CREATE INDEX IF NOT EXISTS versions_model ON versions(model_id);
+CREATE INDEX IF NOT EXISTS versions_base ON versions(base_model);
+CREATE INDEX IF NOT EXISTS files_sha256 ON files(sha256);
+CREATE VIRTUAL TABLE IF NOT EXISTS models_fts USING fts5(
+    name, tags, creator, content='models', content_rowid='id'
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    filters TEXT PRIMARY KEY,
+    synced_at REAL,
+    models INTEGER
+);
+"""
+
+
+def _fts_query(query: str) -> str:
+    """Turn free text into an FTS5 prefix query ("foo"* "bar"*)"""
+    terms = [t.replace('"', '') for t in query.split()]
+    return " ".join(f'"{t}"*' for t in terms if t)
+
+
+class ModelCatalog:
+    """SQLite catalogue of CivitAI model documents with full-text search"""
+
+    def __init__(self, path: str = DEFAULT_CATALOG):
+        """
+        Open (and create if needed) a catalogue
+
+        Args:
+            path: SQLite database file, or ":memory:"
+        """
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.db.close()
+
+    # -- writing -------------------------------------------------------------
+
+    def ingest(self, models: Iterable[Dict]) -> int:
+        """
+        Insert or replace model documents (as returned by /models)
+
+        Returns:
+            Number of models written
+        """
+        count = 0
+        with self._lock, self.db:
+            for model in models:
+                self._upsert(model)
+                count += 1
+        return count
+
+    def refresh_stats(self, models: Iterable[Dict]) -> int:
+        """
+        Update the counters of already indexed models without rewriting them
+
+        Download counts and ratings change on every model while its versions
+        stay the same; this keeps the offline sort orders current.
+
+        Returns:
+            Number of models updated
+        """
+        count = 0
+        with self._lock, self.db:
+            for model in models:
+                stats = model.get("stats") or {}
+                count += self.db.execute(
+                    "UPDATE models SET download_count = ?, favorite_count = ?, thumbs_up = ?, "
+                    "rating = ?, synced_at = ?, raw = ? WHERE id = ?",
+                    (stats.get("downloadCount", 0), stats.get("favoriteCount", 0),
+                     stats.get("thumbsUpCount", 0), stats.get("rating", 0.0),
+                     time.time(), json.dumps(model), model["id"])).rowcount
+        return count
+
+    def _upsert(self, model: Dict):
+        stats = model.get("stats") or {}
+        versions = model.get("modelVersions") or []
+        latest = versions[0] if versions else {}
+        model_id = model["id"]
+
+        old = self.db.execute("SELECT name, tags, creator FROM models WHERE id = ?",
+                              (model_id,)).fetchone()
+        if old:
+            # External-content FTS tables need the old row to delete it
+            self.db.execute("INSERT INTO models_fts(models_fts, rowid, name, tags, creator) "
+                            "VALUES ('delete', ?, ?, ?, ?)",
+                            (model_id, old["name"], old["tags"], old["creator"]))
+            self.db.execute("DELETE FROM versions WHERE model_id = ?", (model_id,))
+
+        tags = " ".join(t if isinstance(t, str) else t.get("name", "")
+                        for t in model.get("tags") or [])
+        creator = (model.get("creator") or {}).get("username")
+        self.db.execute(
+            "INSERT OR REPLACE INTO models (id, name, type, nsfw, creator, tags, download_count, "
+            "favorite_count, thumbs_up, rating, published_at, latest_version_id, synced_at, raw) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (model_id, model.get("name", ""), model.get("type"), int(bool(model.get("nsfw"))),
+             creator, tags, stats.get("downloadCount", 0), stats.get("favoriteCount", 0),
+             stats.get("thumbsUpCount", 0), stats.get("rating", 0.0),
+             latest.get("publishedAt") or latest.get("createdAt"), latest.get("id"),
+             time.time(), json.dumps(model)))
+        self.db.execute("INSERT INTO models_fts(rowid, name, tags, creator) VALUES (?, ?, ?, ?)",
+                        (model_id, model.get("name", ""), tags, creator))
+
+        for version in versions:
+            self.db.execute(
+                "INSERT OR REPLACE INTO versions (id, model_id, name, base_model, published_at, "
+                "download_url) VALUES (?, ?, ?, ?, ?, ?)",
+                (version["id"], model_id, version.get("name"), version.get("baseModel"),
+                 version.get("publishedAt") or version.get("createdAt"),
+                 version.get("downloadUrl")))
+            for f in version.get("files") or []:
+                sha256 = (f.get("hashes") or {}).get("SHA256")
+                size_kb = f.get("sizeKB")
+                self.db.execute(
+                    "INSERT OR REPLACE INTO files (version_id, name, size_bytes, sha256, is_primary) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (version["id"], f.get("name"), round(size_kb * 1024) if size_kb else None,
+                     sha256.lower() if sha256 else None, int(bool(f.get("primary")))))
+
+    def sync(self, api, types: Optional[List[str]] = None,
+             base_models: Optional[List[str]] = None, query: Optional[str] = None,
+             limit: Optional[int] = None, full: bool = False) -> Dict:
+        """
+        Pull models from the API into the catalogue
+
+        Walks the cursor API newest-first. Unless full is set, the walk stops
+        once UNCHANGED_STOP models in a row are already indexed with the same
+        latest version, so repeat syncs only fetch what changed. Models whose
+        versions are unchanged still get their stats (downloads, rating)
+        refreshed, so an incremental sync refreshes the newest models and a
+        full sync refreshes every one.
+
+        Args:
+            api: CivitAIAPI client
+            types, base_models, query: API filters
+            limit: Maximum models to fetch
+            full: Walk every page regardless of what is already indexed
+
+        Returns:
+            Dict with fetched, updated and unchanged counts (unchanged
+            models had only their stats refreshed)
+        """
+        known = {row["id"]: row["latest_version_id"]
+                 for row in self.db.execute("SELECT id, latest_version_id FROM models")}
+        counts = {"fetched": 0, "updated": 0, "unchanged": 0}
+        streak = 0
+        batch, stale = [], []
+
+        for model in api.iter_models(query=query, types=types, sort="Newest",
+                                     base_models=base_models, limit=limit):
+            counts["fetched"] += 1
+            versions = model.get("modelVersions") or []
+            latest = versions[0].get("id") if versions else None
+            if model["id"] in known and known[model["id"]] == latest:
+                counts["unchanged"] += 1
+                streak += 1
+                stale.append(model)
+                if len(stale) >= 100:
+                    self.refresh_stats(stale)
+                    stale = []
+                if not full and streak >= UNCHANGED_STOP:
+                    break
+                continue
+
+            streak = 0
+            batch.append(model)
+            if len(batch) >= 100:
+                counts["updated"] += self.ingest(batch)
+                batch = []
+
+        counts["updated"] += self.ingest(batch)
+        self.refresh_stats(stale)
+
+        filters = json.dumps({"types": types, "base_models": base_models, "query": query},
+                             sort_keys=True)
+        with self._lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO sync_state (filters, synced_at, models) "
+                            "VALUES (?, ?, ?)", (filters, time.time(), counts["fetched"]))
+        return counts
+
+    # -- reading -------------------------------------------------------------
+
+    def search(self, query: Optional[str] = None, types: Optional[List[str]] = None,
+               sort: str = "Highest Rated", limit: int = 20,
+               base_models: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Search the catalogue with the same filters as CivitAIAPI.search_models
+
+        Returns:
+            Model documents in the API's shape
+        """
+        sql = "SELECT m.raw FROM models m"
+        where, params = [], []
+        if query and _fts_query(query):
+            sql += " JOIN models_fts ON models_fts.rowid = m.id"
+            where.append("models_fts MATCH ?")
+            params.append(_fts_query(query))
+        if types:
+            where.append(f"m.type IN ({','.join('?' * len(types))})")
+            params.extend(types)
+        if base_models:
+            where.append("EXISTS (SELECT 1 FROM versions v WHERE v.model_id = m.id "
+                         f"AND v.base_model IN ({','.join('?' * len(base_models))}))")
+            params.extend(base_models)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {SORT_COLUMNS.get(sort, SORT_COLUMNS['Highest Rated'])} LIMIT ?"
+        params.append(limit)
+
+        return [json.loads(row["raw"]) for row in self.db.execute(sql, params)]
+
+    def get_model(self, model_id: int) -> Optional[Dict]:
+        """Return a stored model document, or None"""
+        row = self.db.execute("SELECT raw FROM models WHERE id = ?", (model_id,)).fetchone()
+        return json.loads(row["raw"]) if row else None
+
+    def find_by_hash(self, sha256: str) -> Optional[Dict]:
+        """
+        Look up the model version that ships a file with this SHA-256
+
+        Returns:
+            Dict with model_id, version_id, model_name, version_name,
+            base_model, file_name and size_bytes, or None
+        """
+        row = self.db.execute(
+            "SELECT m.id AS model_id, v.id AS version_id, m.name AS model_name, "
+            "v.name AS version_name, v.base_model, f.name AS file_name, f.size_bytes "
+            "FROM files f JOIN versions v ON v.id = f.version_id JOIN models m ON m.id = v.model_id "
+            "WHERE f.sha256 = ?", (sha256.lower(),)).fetchone()
+        return dict(row) if row else None
+
+    def stats(self) -> Dict:
+        """Row counts and last sync time"""
+        counts = {table: self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                  for table in ("models", "versions", "files")}
+        counts["last_sync"] = self.db.execute("SELECT MAX(synced_at) FROM sync_state").fetchone()[0]
+        return counts
+
+
+def load_fixture(path: str) -> List[Dict]:
+    """Read recorded API JSON: a /models page ({"items": [...]}), a list, or one model"""
+    with open(path, "r") as f:
+        data = json.load(f)
+    if isinstance(data, dict) and "items" in data:
+        return data["items"]
+    return data if isinstance(data, list) else [data]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline CivitAI catalogue")
+    parser.add_argument("--db", default=os.getenv("CIVITAI_CATALOG", DEFAULT_CATALOG),
+                        help=f"Catalogue database (default: {DEFAULT_CATALOG})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sync = sub.add_parser("sync", help="Fetch new and changed models from the API")
+    sync.add_argument("--types", nargs="*", default=["LORA", "Checkpoint"])
+    sync.add_argument("--base-model", nargs="*", default=None, dest="base_models")
+    sync.add_argument("--query", default=None)
+    sync.add_argument("--limit", type=int, default=None)
+    sync.add_argument("--full", action="store_true",
+                      help="Walk every page, refreshing the stats of all indexed models")
+
+    imp = sub.add_parser("import", help="Load recorded API JSON files")
+    imp.add_argument("files", nargs="+")
+
+    search = sub.add_parser("search", help="Search the catalogue")
+    search.add_argument("query", nargs="?", default=None)
+    search.add_argument("--types", nargs="*", default=None)
+    search.add_argument("--base-model", nargs="*", default=None, dest="base_models")
+    search.add_argument("--sort", choices=list(SORT_COLUMNS), default="Highest Rated")
+    search.add_argument("--limit", type=int, default=20)
+
+    sub.add_parser("stats", help="Show catalogue size")
+    args = parser.parse_args()
+
+    catalog = ModelCatalog(args.db)
+
+    if args.command == "sync":
+        from civitai_api import CivitAIAPI
+        start = time.monotonic()
+        counts = catalog.sync(CivitAIAPI(), types=args.types, base_models=args.base_models,
+                              query=args.query, limit=args.limit, full=args.full)
+        print(f"✅ Synced {counts['updated']} model(s) "
+              f"({counts['unchanged']} unchanged with refreshed stats, "
+              f"{counts['fetched']} fetched) in {time.monotonic() - start:.1f}s")
+    elif args.command == "import":
+        total = 0
+        for path in args.files:
+            if not os.path.exists(path):
+                print(f"❌ File not found: {path}")
+                sys.exit(1)
+            total += catalog.ingest(load_fixture(path))
+        print(f"✅ Imported {total} model(s) into {args.db}")
+    elif args.command == "search":
+        start = time.monotonic()
+        items = catalog.search(args.query, types=args.types, sort=args.sort,
+                               limit=args.limit, base_models=args.base_models)
+        elapsed = (time.monotonic() - start) * 1000
+        for item in items:
+            stats = item.get("stats", {})
+            print(f"  📦 {item['name']}")
+            print(f"     ID: {item['id']} | Type: {item.get('type')} | "
+                  f"Downloads: {stats.get('downloadCount', 0):,}")
+        print(f"\n{len(items)} result(s) in {elapsed:.1f} ms")
+    else:
+        counts = catalog.stats()
+        last = time.strftime("%Y-%m-%d %H:%M", time.localtime(counts["last_sync"])) \
+            if counts["last_sync"] else "never"
+        print(f"Models: {counts['models']} | Versions: {counts['versions']} | "
+              f"Files: {counts['files']} | Last sync: {last}")
+
+    catalog.close()
+
+
+if __name__ == "__main__":
+    main()
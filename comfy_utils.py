@@ -6,7 +6,7 @@ Provides unified GPU detection and configuration management
 import subprocess
 import os
 import yaml
-from typing import Tuple, Optional, Dict
+from typing import Tuple, Optional, Dict, List
 
 # Platform detection
 def _detect_platform():
@@ -23,57 +23,84 @@ def _detect_platform():
 WORK_DIR = _detect_platform()
 
 
-def detect_gpu() -> Tuple[str, int]:
+def gpu_tier(name: str, mem_mb: int) -> str:
     """
-    Unified GPU detection across installer and launcher
-    
-    Returns:
-        tuple: (tier_name, vram_mb)
-            tier_name: One of '4090', '3090', 'p100', 't4'
-            vram_mb: VRAM in megabytes
-    
+    Map a GPU name and VRAM size to a tier
+
     Tier Priority:
         4090: >= 24GB VRAM or name contains "4090"
         3090: >= 22GB VRAM or name contains "3090"
         P100: name contains "P100"
         t4: Default for all others
     """
+    if "4090" in name or mem_mb >= 24000:
+        return "4090"
+    elif "3090" in name or mem_mb >= 22000:
+        return "3090"
+    elif "P100" in name:
+        return "p100"
+    else:
+        return "t4"
+
+
+def detect_gpus() -> List[Dict]:
+    """
+    List every GPU nvidia-smi reports (Kaggle's 2x T4, multi-GPU Vast.ai hosts)
+    
+    Returns:
+        One dict per device, in nvidia-smi order:
+            index: CUDA device index (for CUDA_VISIBLE_DEVICES)
+            name: Device name
+            vram_mb: VRAM in megabytes
+            tier: GPU tier of this device (see gpu_tier)
+        Empty if nvidia-smi is missing or fails
+    """
     try:
         output = subprocess.check_output([
             "nvidia-smi",
-            "--query-gpu=name,memory.total",
-            "--format=csv,noheader"
-        ], stderr=subprocess.DEVNULL).decode().strip()
-        
-        if not output:
-            return "t4", 0
-        
-        # Parse GPU name and memory
-        parts = output.split(",", 1)
-        if len(parts) != 2:
-            return "t4", 0
-            
-        name = parts[0].strip()
-        mem_str = parts[1].strip().replace(" MiB", "")
-        
+            "--query-gpu=index,name,memory.total",
+            "--format=csv,noheader,nounits"
+        ], stderr=subprocess.DEVNULL).decode()
+    except (subprocess.CalledProcessError, OSError):
+        # nvidia-smi not available or failed
+        return []
+    
+    gpus = []
+    for line in output.splitlines():
+        parts = [part.strip() for part in line.split(",")]
+        if len(parts) < 3:
+            continue
         try:
-            mem_mb = int(mem_str)
+            index = int(parts[0])
+        except ValueError:
+            continue
+        name = ", ".join(parts[1:-1])
+        try:
+            mem_mb = int(parts[-1].replace(" MiB", ""))
         except ValueError:
             mem_mb = 0
-        
-        # Tier detection (unified logic)
-        if "4090" in name or mem_mb >= 24000:
-            return "4090", mem_mb
-        elif "3090" in name or mem_mb >= 22000:
-            return "3090", mem_mb
-        elif "P100" in name:
-            return "p100", mem_mb
-        else:
-            return "t4", mem_mb
-            
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        # nvidia-smi not available or failed
+        gpus.append({"index": index, "name": name, "vram_mb": mem_mb,
+                     "tier": gpu_tier(name, mem_mb)})
+    return gpus
+
+
+def detect_gpu() -> Tuple[str, int]:
+    """
+    Unified GPU detection across installer and launcher
+    
+    On multi-GPU hosts the device with the least VRAM decides, so the
+    selected config is safe for a worker on any of the GPUs.
+    
+    Returns:
+        tuple: (tier_name, vram_mb)
+            tier_name: One of '4090', '3090', 'p100', 't4'
+            vram_mb: VRAM in megabytes
+    """
+    gpus = detect_gpus()
+    if not gpus:
         return "t4", 0
+    smallest = min(gpus, key=lambda gpu: gpu["vram_mb"])
+    return smallest["tier"], smallest["vram_mb"]
 
 
 def load_gpu_config(tier: str, search_paths: Optional[list] = None) -> Optional[Dict]:
@@ -167,6 +194,8 @@ def format_bytes(bytes_value: int) -> str:
 
 if __name__ == "__main__":
     # Test GPU detection
+    for gpu in detect_gpus():
+        print(f"GPU {gpu['index']}: {gpu['name']} ({gpu['vram_mb']} MB, tier {gpu['tier']})")
     tier, vram_mb = detect_gpu()
     print(f"GPU Tier: {tier}")
     print(f"VRAM: {vram_mb} MB ({format_bytes(vram_mb * 1024 * 1024)})")
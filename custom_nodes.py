@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Custom Node Installer
+Clones or updates custom node repositories in parallel with shallow fetches,
+merges their requirements.txt files with ComfyUI's own and the pinned
+torch/xformers/numpy set, reports conflicts, then runs a single pip install.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import metadata
+from typing import Dict, List, Optional, Tuple
+
+from install_profile import record
+from install_state import InstallState, digest, git_head, remote_head, skipped
+
+try:
+    from packaging.requirements import InvalidRequirement, Requirement
+    from packaging.utils import canonicalize_name
+    from packaging.version import Version
+except ImportError:  # pip always vendors packaging
+    from pip._vendor.packaging.requirements import InvalidRequirement, Requirement
+    from pip._vendor.packaging.utils import canonicalize_name
+    from pip._vendor.packaging.version import Version
+
+CLONE_WORKERS = 6
+GIT_TIMEOUT = 300
+
+# Versions installed by the "Stabilizing Python environment" step of
+# install_comfyui_auto.sh (and safe_update.sh); node requirements may not move them
+PINNED_PACKAGES = {
+    "torch": "2.6.0",
+    "torchvision": "0.21.0",
+    "torchaudio": "2.6.0",
+    "xformers": "0.0.33.post2",
+    "numpy": "1.26.4",
+    "protobuf": "4.25.3",
+}
+
+MERGED_FILE = ".requirements.merged.txt"
+CONSTRAINTS_FILE = ".requirements.pins.txt"
+
+
+def git(args: List[str], cwd: Optional[str] = None) -> subprocess.CompletedProcess:
+    env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+    return subprocess.run(["git"] + args, cwd=cwd, env=env, capture_output=True, text=True,
+                          timeout=GIT_TIMEOUT)
+
+
+def _error(result: subprocess.CompletedProcess) -> str:
+    lines = result.stderr.strip().splitlines()
+    fatal = [line for line in lines if line.startswith(("fatal:", "error:"))]
+    return (fatal or lines or [f"exit code {result.returncode}"])[0]
+
+
+def sync_repo(repo: str, dest: str) -> Tuple[str, bool, str]:
+    """
+    Shallow-clone a node repository, or fast-update an existing checkout
+
+    Existing checkouts fetch only the remote HEAD commit and move to it, and
+    are not touched at all when they already are at it; checkouts with
+    modified tracked files are left alone.
+
+    Returns:
+        (directory name, usable, message)
+    """
+    name = repo.rstrip("/").rsplit("/", 1)[-1]
+    if name.endswith(".git"):
+        name = name[:-4]
+    path = os.path.join(dest, name)
+    try:
+        if not os.path.isdir(os.path.join(path, ".git")):
+            result = git(["clone", "--quiet", "--depth", "1", "--recursive",
+                          "--shallow-submodules", repo, path])
+            if result.returncode != 0:
+                return name, False, f"clone failed: {_error(result)}"
+            return name, True, "installed"
+
+        if git(["status", "--porcelain", "--untracked-files=no"], cwd=path).stdout.strip():
+            return name, True, "local changes - not updated"
+        head = git_head(path)
+        if head and remote_head(path) == head:
+            return name, True, "up to date"
+        result = git(["fetch", "--quiet", "--depth", "1", "origin", "HEAD"], cwd=path)
+        if result.returncode != 0:
+            return name, True, f"update failed: {_error(result)}"
+        git(["reset", "--quiet", "--hard", "FETCH_HEAD"], cwd=path)
+        git(["submodule", "update", "--quiet", "--init", "--recursive", "--depth", "1"], cwd=path)
+        return name, True, "updated"
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return name, os.path.isdir(path), f"git error: {e}"
+
+
+def sync_repos(repos: List[str], dest: str, workers: int = CLONE_WORKERS) -> List[str]:
+    """
+    Sync all repositories concurrently, printing one line per repo
+
+    Returns:
+        Directory names of the repositories that are usable
+    """
+    os.makedirs(dest, exist_ok=True)
+
+    def timed_sync(repo):
+        started = time.monotonic()
+        name, ok, message = sync_repo(repo, dest)
+        seconds = round(time.monotonic() - started, 3)
+        record("node", name, seconds=seconds, git_seconds=seconds,
+               status=message if ok else "failed")
+        return name, ok, message
+
+    usable, current = [], 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for name, ok, message in pool.map(timed_sync, repos):
+            if ok:
+                usable.append(name)
+                current += message == "up to date"
+                tag = "[WARN]" if "fail" in message or "changes" in message else "[OK]"
+                print(f"{tag} {name}: {message}")
+            else:
+                print(f"[WARN] Skipping {name}: {message}")
+    if current:
+        skipped("custom node updates", f"{current} of {len(repos)} repo(s) already at the remote HEAD")
+    return usable
+
+
+def read_requirements(path: str, seen: Optional[set] = None) -> List[str]:
+    """Requirement lines of a requirements file, following -r includes"""
+    seen = set() if seen is None else seen
+    real = os.path.realpath(path)
+    if real in seen or not os.path.isfile(path):
+        return []
+    seen.add(real)
+
+    lines = []
+    with open(path, "r", errors="replace") as f:
+        for line in f:
+            line = line.split(" #", 1)[0].strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith(("-r ", "--requirement ")):
+                include = os.path.join(os.path.dirname(path), line.split(None, 1)[1])
+                lines += read_requirements(include, seen)
+                continue
+            lines.append(line)
+    return lines
+
+
+def merge_requirements(sources: List[Tuple[str, str]]) -> Tuple[Dict[str, List], List[str]]:
+    """
+    Parse and group the requirements of several files
+
+    Args:
+        sources: (label, requirements.txt path) pairs, highest priority first
+
+    Returns:
+        (requirements by canonical name as [(label, Requirement)],
+         lines passed through as-is, e.g. VCS URLs)
+    """
+    merged: Dict[str, List] = {}
+    passthrough = []
+    for label, path in sources:
+        for line in read_requirements(path):
+            if line.startswith("-"):
+                # Index/option lines would apply to the whole merged install
+                print(f"[WARN] {label}: ignoring pip option '{line}'")
+                continue
+            try:
+                req = Requirement(line)
+            except InvalidRequirement:
+                if line not in passthrough:
+                    passthrough.append(line)
+                continue
+            if req.marker and not req.marker.evaluate():
+                continue
+            merged.setdefault(canonicalize_name(req.name), []).append((label, req))
+    return merged, passthrough
+
+
+def find_conflicts(merged: Dict[str, List], pins: Dict[str, str]) -> List[str]:
+    """
+    Report requirements that cannot hold together, dropping them from merged
+
+    A requirement conflicts if it excludes a pinned version, or if it excludes
+    the exact version (==) asked for by an earlier source. Range-only clashes
+    are left to pip, whose resolver fails before installing anything.
+
+    Returns:
+        One message per dropped requirement
+    """
+    conflicts = []
+    for name, reqs in merged.items():
+        if name in pins:
+            chosen, owner = Version(pins[name]), "pinned"
+        else:
+            exact = [(label, spec.version) for label, req in reqs
+                     for spec in req.specifier if spec.operator == "=="]
+            if not exact:
+                continue
+            label, version = exact[0]
+            owner = f"required by {label}"
+            try:
+                chosen = Version(version)
+            except ValueError:
+                continue
+
+        kept = []
+        for label, req in reqs:
+            if req.url is None and req.specifier and not req.specifier.contains(chosen, prereleases=True):
+                conflicts.append(f"{label} wants {req}, but {name}=={chosen} is {owner}")
+            else:
+                kept.append((label, req))
+        merged[name] = kept
+    return conflicts
+
+
+def requirement_lines(merged: Dict[str, List], passthrough: List[str]) -> List[str]:
+    """One combined requirement line per package (extras and specifiers merged)"""
+    lines = []
+    for name, reqs in sorted(merged.items()):
+        if not reqs:
+            continue
+        urls = [req for _, req in reqs if req.url]
+        if urls:
+            lines.append(str(urls[0]))
+            continue
+        extras = sorted({extra for _, req in reqs for extra in req.extras})
+        specs = sorted({str(spec) for _, req in reqs for spec in req.specifier})
+        line = name + (f"[{','.join(extras)}]" if extras else "") + ",".join(specs)
+        lines.append(line)
+    return lines + passthrough
+
+
+def requirements_installed(merged: Dict[str, List]) -> bool:
+    """True if an installed distribution satisfies every merged requirement (metadata only)"""
+    for reqs in merged.values():
+        for _, req in reqs:
+            try:
+                version = Version(metadata.version(req.name))
+            except (metadata.PackageNotFoundError, ValueError):
+                return False
+            if req.url is None and not req.specifier.contains(version, prereleases=True):
+                return False
+    return True
+
+
+def install_requirements(dest: str, sources: List[Tuple[str, str]],
+                         pins: Dict[str, str] = PINNED_PACKAGES,
+                         strict: bool = False, check_only: bool = False,
+                         wheelhouse: Optional[str] = None,
+                         state: Optional[InstallState] = None) -> int:
+    """
+    Resolve all requirement sources together and install them with one pip run
+
+    Args:
+        dest: Directory the merged requirements/constraints files are written to
+        sources: (label, requirements.txt path) pairs, highest priority first
+        pins: Package versions the install must keep
+        strict: Abort on conflicts instead of dropping the conflicting lines
+        check_only: Report only; do not run pip
+        wheelhouse: Local wheel directory (see env_snapshot.py) tried offline first
+        state: Install state; pip is skipped when the merged requirements are
+            the ones last installed and all of them are still satisfied
+
+    Returns:
+        Process exit code (0 on success)
+    """
+    merged, passthrough = merge_requirements(sources)
+    conflicts = find_conflicts(merged, pins)
+    for message in conflicts:
+        print(f"[CONFLICT] {message}")
+    if conflicts and strict:
+        print(f"❌ {len(conflicts)} requirement conflict(s) - nothing installed")
+        return 1
+    if conflicts:
+        print(f"⚠️ Dropped {len(conflicts)} conflicting requirement(s); pinned and exact versions win")
+
+    lines = requirement_lines(merged, passthrough)
+    merged_path = os.path.join(dest, MERGED_FILE)
+    constraints_path = os.path.join(dest, CONSTRAINTS_FILE)
+    with open(merged_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    with open(constraints_path, "w") as f:
+        f.write("".join(f"{name}=={version}\n" for name, version in pins.items()))
+
+    print(f"[PIP] {len(lines)} requirement(s) from {len(sources)} file(s) -> {merged_path}")
+    if check_only:
+        return 0
+
+    fingerprint = digest(lines, pins, sys.version)
+    if state and state.unchanged("node_requirements", fingerprint) and requirements_installed(merged):
+        skipped("node requirements", f"{len(lines)} requirement(s) unchanged and installed")
+        return 0
+
+    cmd = [sys.executable, "-m", "pip", "install", "-q", "-r", merged_path, "-c", constraints_path]
+    started = time.monotonic()
+    code = None
+    if wheelhouse and os.path.isdir(wheelhouse):
+        offline = subprocess.run(cmd + ["--no-index", "--find-links", wheelhouse],
+                                 capture_output=True, text=True)
+        if offline.returncode == 0:
+            print(f"[PIP] Installed from wheelhouse {wheelhouse}")
+            record("pip", "custom node requirements (wheelhouse)",
+                   seconds=round(time.monotonic() - started, 3), rc=0)
+            code = 0
+        else:
+            print("[PIP] Wheelhouse incomplete - resolving against the package index")
+            cmd += ["--find-links", wheelhouse]
+    if code is None:
+        code = subprocess.run(cmd).returncode
+        record("pip", "custom node requirements", seconds=round(time.monotonic() - started, 3),
+               rc=code)
+    if code != 0:
+        print("❌ pip could not install the merged requirements")
+    elif state:
+        state.mark("node_requirements", fingerprint, requirements=len(lines))
+    return code
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Install custom nodes and their requirements")
+    parser.add_argument("repos", nargs="+", help="Git URLs of the custom node repositories")
+    parser.add_argument("--dest", default="custom_nodes", help="custom_nodes directory")
+    parser.add_argument("--comfyui-dir", default=None,
+                        help="ComfyUI directory whose requirements.txt is merged in")
+    parser.add_argument("--workers", type=int, default=CLONE_WORKERS,
+                        help=f"Concurrent git operations (default: {CLONE_WORKERS})")
+    parser.add_argument("--strict", action="store_true",
+                        help="Abort on requirement conflicts instead of dropping them")
+    parser.add_argument("--check-only", action="store_true",
+                        help="Sync repositories and report conflicts without running pip")
+    parser.add_argument("--wheelhouse", default=None,
+                        help="Local wheels to install from first (default: $PIP_CACHE_DIR/wheelhouse)")
+    args = parser.parse_args()
+
+    print(f"=== Syncing {len(args.repos)} custom node repositories ===")
+    names = sync_repos(args.repos, args.dest, args.workers)
+
+    # Last-applied node commits, for incremental reruns and troubleshooting
+    state = InstallState()
+    commits = {name: git_head(os.path.join(args.dest, name)) for name in names}
+    state.mark("custom_nodes", digest(commits), commits=commits)
+
+    sources = []
+    if args.comfyui_dir:
+        sources.append(("ComfyUI", os.path.join(args.comfyui_dir, "requirements.txt")))
+    sources += [(name, os.path.join(args.dest, name, "requirements.txt")) for name in names]
+    sources = [(label, path) for label, path in sources if os.path.isfile(path)]
+
+    print("=== Resolving custom node requirements ===")
+    from env_snapshot import default_wheelhouse
+    sys.exit(install_requirements(args.dest, sources, strict=args.strict,
+                                  check_only=args.check_only,
+                                  wheelhouse=args.wheelhouse or default_wheelhouse(),
+                                  state=state))
+
+
+if __name__ == "__main__":
+    main()
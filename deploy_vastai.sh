@@ -234,8 +234,8 @@ export NGROK_AUTHTOKEN="${NGROK_AUTHTOKEN}"
 echo "[INFO] Launching ComfyUI - tunnel URL will appear below..."
 python launch_with_tunnel.py 2>&1 | tee /workspace/comfy_tunnel.log &
 
-# Give it time to start and print ngrok URL
-sleep 15
+# Wait until ComfyUI answers (the tunnel URL follows right after)
+python launcher_core.py --port 8188 --timeout 300 || echo "[WARN] ComfyUI not ready yet - see /workspace/comfy_tunnel.log"
 
 # Start Jupyter Lab
 echo "[JUPYTER] Starting Jupyter Lab..."
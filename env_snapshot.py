@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Environment Snapshot
+Fingerprints the pinned torch/xformers/numpy/protobuf set so the installer can
+skip the "Stabilizing Python environment" phase when it already matches, and
+keeps a local wheelhouse under $PIP_CACHE_DIR to reinstall it without the network.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from importlib import metadata
+from typing import Dict, List, Optional
+
+from custom_nodes import PINNED_PACKAGES
+
+try:
+    from packaging.version import Version
+except ImportError:  # pip always vendors packaging
+    from pip._vendor.packaging.version import Version
+
+TORCH_INDEX = "https://download.pytorch.org/whl/cu118"
+TORCH_CUDA = "cu118"        # Local version tag the torch family must carry
+TORCH_FAMILY = ("torch", "torchvision", "torchaudio")
+NO_DEPS = ("xformers",)     # Installed without dependencies (it would pull another torch)
+EXTRA_PACKAGES = ("torchsde",)  # Unpinned, but part of the phase
+PREPARED_FILE = ".prepared.json"
+
+
+def default_wheelhouse() -> str:
+    cache = os.getenv("PIP_CACHE_DIR") or os.path.join(os.getenv("WORK_DIR", "/content"), "pip-cache")
+    return os.path.join(cache, "wheelhouse")
+
+
+def pinned_specs() -> List[str]:
+    """Requirement strings for the pinned set (torch family with its CUDA tag)"""
+    specs = []
+    for name, version in PINNED_PACKAGES.items():
+        local = f"+{TORCH_CUDA}" if name in TORCH_FAMILY else ""
+        specs.append(f"{name}=={version}{local}")
+    return specs
+
+
+def installed_version(name: str) -> Optional[str]:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def check_pins() -> List[str]:
+    """
+    Compare installed package metadata against the pins (no imports, so it is fast)
+
+    Returns:
+        One message per mismatch (empty when the environment matches)
+    """
+    problems = []
+    for name, pin in PINNED_PACKAGES.items():
+        found = installed_version(name)
+        if found is None:
+            problems.append(f"{name} not installed (want {pin})")
+            continue
+        version = Version(found)
+        if version.public != pin:
+            problems.append(f"{name} {found} installed (want {pin})")
+        elif name in TORCH_FAMILY and version.local != TORCH_CUDA:
+            problems.append(f"{name} {found} installed (want +{TORCH_CUDA} build)")
+    for name in EXTRA_PACKAGES:
+        if installed_version(name) is None:
+            problems.append(f"{name} not installed")
+    return problems
+
+
+def fingerprint() -> str:
+    """Short hash of the interpreter, platform and pinned set a wheelhouse is built for"""
+    key = json.dumps({
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "pins": pinned_specs(),
+    }, sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def file_sha(path: str) -> Optional[str]:
+    if not os.path.isfile(path):
+        return None
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_prepared(wheelhouse: str) -> Dict:
+    try:
+        with open(os.path.join(wheelhouse, PREPARED_FILE), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_prepared(wheelhouse: str, state: Dict):
+    path = os.path.join(wheelhouse, PREPARED_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def pip(args: List[str]) -> int:
+    return subprocess.run([sys.executable, "-m", "pip"] + args).returncode
+
+
+def install_from_wheelhouse(wheelhouse: str) -> int:
+    """
+    Install the pinned set from the wheelhouse only (no index access)
+
+    Returns:
+        pip exit code; non-zero when the wheelhouse is missing or incomplete
+    """
+    if load_prepared(wheelhouse).get("fingerprint") != fingerprint():
+        print(f"[SNAPSHOT] No wheelhouse for this environment at {wheelhouse}")
+        return 1
+    specs = pinned_specs()
+    offline = ["install", "-q", "--no-index", "--find-links", wheelhouse]
+    code = pip(offline + [spec for spec in specs if spec.split("==")[0] not in NO_DEPS]
+               + list(EXTRA_PACKAGES))
+    no_deps = [spec for spec in specs if spec.split("==")[0] in NO_DEPS]
+    if code == 0 and no_deps:
+        code = pip(offline + ["--no-deps"] + no_deps)
+    return code
+
+
+def prepare_wheelhouse(wheelhouse: str, requirements: Optional[str] = None,
+                       constraints: Optional[str] = None) -> int:
+    """
+    Fill the wheelhouse with the pinned set and, optionally, custom node wheels
+
+    Work already recorded in the wheelhouse for this fingerprint (and the same
+    requirements file contents) is skipped.
+
+    Returns:
+        Exit code (0 on success)
+    """
+    os.makedirs(wheelhouse, exist_ok=True)
+    state = load_prepared(wheelhouse)
+    if state.get("fingerprint") != fingerprint():
+        state = {"fingerprint": fingerprint()}
+
+    if not state.get("pins"):
+        print(f"[SNAPSHOT] Downloading pinned wheels into {wheelhouse}...")
+        specs = pinned_specs()
+        torch_specs = [s for s in specs if s.split("==")[0] in TORCH_FAMILY]
+        other_specs = [s for s in specs if s not in torch_specs and s.split("==")[0] not in NO_DEPS]
+        steps = [
+            (["--index-url", TORCH_INDEX], torch_specs),
+            (["--no-deps"], [s for s in specs if s.split("==")[0] in NO_DEPS]),
+            ([], other_specs + list(EXTRA_PACKAGES)),
+        ]
+        for options, step_specs in steps:
+            if step_specs and pip(["download", "-q", "-d", wheelhouse] + options + step_specs) != 0:
+                print("[SNAPSHOT] Pinned wheel download failed")
+                return 1
+        state["pins"] = pinned_specs()
+        state["pins_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        save_prepared(wheelhouse, state)
+
+    digest = file_sha(requirements) if requirements else None
+    if digest and state.get("requirements") != digest:
+        print(f"[SNAPSHOT] Building custom node wheels from {requirements}...")
+        args = ["wheel", "-q", "-w", wheelhouse, "--find-links", wheelhouse, "-r", requirements]
+        if constraints and os.path.isfile(constraints):
+            args += ["-c", constraints]
+        if pip(args) != 0:
+            print("[SNAPSHOT] Some custom node wheels could not be built")
+            return 1
+        state["requirements"] = digest
+        state["requirements_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        save_prepared(wheelhouse, state)
+
+    wheels = [f for f in os.listdir(wheelhouse) if f.endswith(".whl")]
+    print(f"✅ Wheelhouse ready: {len(wheels)} wheel(s), fingerprint {state['fingerprint']}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check, snapshot and restore the pinned Python environment")
+    parser.add_argument("command", choices=["check", "install", "prepare"],
+                        help="check: exit 0 if the pins are installed; install: from the wheelhouse; "
+                             "prepare: fill the wheelhouse")
+    parser.add_argument("--wheelhouse", default=default_wheelhouse(),
+                        help="Local wheel directory (default: $PIP_CACHE_DIR/wheelhouse)")
+    parser.add_argument("--requirements", default=None,
+                        help="prepare: also build wheels for this requirements file")
+    parser.add_argument("--constraints", default=None,
+                        help="prepare: constraints applied while building them")
+    args = parser.parse_args()
+
+    if args.command == "check":
+        problems = check_pins()
+        for problem in problems:
+            print(f"[SNAPSHOT] {problem}")
+        if problems:
+            sys.exit(1)
+        print(f"[SNAPSHOT] Pinned environment matches (fingerprint {fingerprint()})")
+    elif args.command == "install":
+        code = install_from_wheelhouse(args.wheelhouse)
+        if code == 0 and check_pins():
+            code = 1
+        sys.exit(code)
+    else:
+        sys.exit(prepare_wheelhouse(args.wheelhouse, args.requirements, args.constraints))
+
+
+if __name__ == "__main__":
+    main()
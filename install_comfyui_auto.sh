@@ -23,6 +23,8 @@ for arg in "$@"; do
     --hf-token=*) HF_TOKEN="${arg#*=}" ;;
     --civitai-token=*) CIVITAI_API_TOKEN="${arg#*=}" ;;
     --refresh-models) REFRESH_MODELS=1 ;;
+    --cache-budget=*) MODEL_CACHE_BUDGET="${arg#*=}" ;;
+    --workflows=*) WORKFLOWS="${arg#*=}" ;;
     *)
       echo "Unknown argument: $arg"
       exit 1
@@ -63,11 +65,14 @@ echo "Work dir: $WORK_DIR"
 
 COMFYUI_DIR="$WORK_DIR/ComfyUI"
 CACHE_ROOT="$WORK_DIR/model-cache"
-MANIFEST="$(dirname "$0")/configs/models_manifest.json"
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+MANIFEST="$SCRIPT_DIR/configs/models_manifest.json"
 
 # === PIP WHEELS CACHE (ULTRA-FAST RE-RUNS) ===
 PIP_CACHE_DIR="$WORK_DIR/pip-cache"
 export PIP_CACHE_DIR
+# Local wheels of the pinned set and node requirements (see env_snapshot.py)
+WHEELHOUSE="$PIP_CACHE_DIR/wheelhouse"
 export PIP_NO_WARN_SCRIPT_LOCATION=1
 export PIP_NO_WARN_CONFLICTS=1  # Suppress dependency warnings
 
@@ -78,39 +83,64 @@ echo "Model cache : $CACHE_ROOT"
 echo "Pip cache   : $PIP_CACHE_DIR"
 
 # ==========================================================
-# === FIX: DEPENDENCY STABILITY =============================
+# === INSTALL PROFILING =====================================
 # ==========================================================
-echo "=== Stabilizing Python environment ==="
+# Phase and command timings go to a JSON-lines log; install_profile.py (and
+# the Python tools, via $INSTALL_PROFILE) add to it, and it is summarized in
+# install-profile.json plus a table when the installer exits
+INSTALL_PROFILE="$WORK_DIR/install-profile.jsonl"
+INSTALL_PHASE=""
+export INSTALL_PROFILE INSTALL_PHASE
+: > "$INSTALL_PROFILE"
+
+profile_event() {
+  echo "$1" >> "$INSTALL_PROFILE"
+}
 
-pip uninstall -y torch torchvision torchaudio xformers numpy protobuf 2>/dev/null || true
+# phase <name>: close the running phase and start timing the next one
+phase() {
+  local now
+  now=$(date +%s.%N)
+  [[ -n "$INSTALL_PHASE" ]] && profile_event "{\"event\": \"phase_end\", \"name\": \"$INSTALL_PHASE\", \"time\": $now}"
+  INSTALL_PHASE="$1"
+  [[ -n "$INSTALL_PHASE" ]] && profile_event "{\"event\": \"phase_start\", \"name\": \"$INSTALL_PHASE\", \"time\": $now}"
+  return 0
+}
 
-pip install -q \
-  torch==2.6.0 \
-  torchvision==0.21.0 \
-  torchaudio==2.6.0 \
-  --index-url https://download.pytorch.org/whl/cu118 \
-  --use-deprecated=legacy-resolver 2>&1 | grep -v "ERROR: pip" || true
+# timed <pip|git> <label> <command...>: run a command and record its wall time
+timed() {
+  local kind="$1" label="$2" start rc=0
+  shift 2
+  start=$(date +%s.%N)
+  "$@" || rc=$?
+  profile_event "{\"event\": \"$kind\", \"name\": \"$label\", \"phase\": \"$INSTALL_PHASE\", \"start\": $start, \"end\": $(date +%s.%N), \"rc\": $rc}"
+  return $rc
+}
 
+finish_profile() {
+  phase ""
+  python "$SCRIPT_DIR/install_profile.py" --events "$INSTALL_PROFILE" \
+    --json "$WORK_DIR/install-profile.json" --platform "$PLATFORM" --gpu "${GPU_NAME:-unknown}" || true
+}
+trap finish_profile EXIT
 
-pip install -q xformers==0.0.33.post2 --no-deps
-pip install -q numpy==1.26.4 protobuf==4.25.3 --force-reinstall 2>&1 | grep -v "ERROR: pip" || true
-pip install -q torchsde  # Required by ComfyUI samplers
-
-# ==========================================================
-# === SANITY CHECK (ADDITIVE) ===============================
-# ==========================================================
-python - << 'EOF'
-import torch, numpy
-print("[CHECK] Torch:", torch.__version__)
-print("[CHECK] CUDA available:", torch.cuda.is_available())
-print("[CHECK] NumPy:", numpy.__version__)
-assert torch.cuda.is_available(), "CUDA NOT AVAILABLE"
-EOF
+# What the last run applied (commits, requirement/manifest hashes, workflow
+# checksums); steps whose inputs are unchanged are skipped (see install_state.py)
+INSTALL_STATE="$WORK_DIR/.install_state.json"
+export INSTALL_STATE
 
 # ------------------ GPU DETECTION (MOVED EARLY) ------------------
+phase "Detecting GPU"
 echo "=== Detecting GPU ==="
-GPU_NAME=$(nvidia-smi --query-gpu=name --format=csv,noheader | head -n 1 2>/dev/null || echo "Unknown")
-GPU_MEM=$(nvidia-smi --query-gpu=memory.total --format=csv,noheader,nounits | head -n 1 2>/dev/null || echo "0")
+# One line per GPU; on multi-GPU hosts the one with the least VRAM picks the
+# config, so it suits a ComfyUI worker on any device (see comfy_utils.detect_gpu)
+GPU_LIST=$(nvidia-smi --query-gpu=memory.total,name --format=csv,noheader,nounits 2>/dev/null || true)
+GPU_COUNT=$(grep -c . <<< "$GPU_LIST" || true)
+GPU_SMALLEST=$(sort -n <<< "$GPU_LIST" | grep . | head -n 1)
+GPU_MEM=${GPU_SMALLEST%%,*}
+GPU_NAME=${GPU_SMALLEST#*, }
+[[ "$GPU_MEM" =~ ^[0-9]+$ ]] || GPU_MEM=0
+[[ -n "$GPU_SMALLEST" ]] || GPU_NAME="Unknown"
 
 INSTALL_MODE="lite"
 CONFIG_FILE="comfy_t4.yaml"
@@ -136,12 +166,13 @@ else
   USE_ANIMATEDIFF=0
 fi
 
-CONFIG_PATH="$(dirname "$0")/configs/$CONFIG_FILE"
+CONFIG_PATH="$SCRIPT_DIR/configs/$CONFIG_FILE"
 
 export INSTALL_MODE
 export MANIFEST  # Pre-export for later use
 
 echo "GPU     : $GPU_NAME"
+(( GPU_COUNT > 1 )) && echo "GPUS    : $GPU_COUNT (COMFYUI_WORKERS=auto python launch_auto.py runs one ComfyUI per GPU)"
 echo "VRAM    : ${GPU_MEM} MB"
 echo "MODE    : $INSTALL_MODE"
 echo "CONFIG  : $CONFIG_FILE"
@@ -241,6 +272,11 @@ clean_corrupted_cache() {
   #   echo "⚠️ Removed $header_bad_count invalid safetensors (bad header)"
   # fi
   
+  # Verify manifest sha256 values; files recorded in the hash index are
+  # trusted without being re-read
+  python "$SCRIPT_DIR/model_cache.py" verify --manifest "$MANIFEST" --cache-root "$CACHE_ROOT" \
+    || echo "⚠️ Hash verification skipped"
+
   if [[ $cleaned -gt 0 ]]; then
     echo "✅ Cleaned $cleaned corrupted file(s) out of $total total"
   else
@@ -263,177 +299,170 @@ if [[ ! -f "$MANIFEST" ]]; then
   exit 1
 fi
 
-# Auto-clean corrupted cache files before downloading
-if [[ -d "$CACHE_ROOT" ]]; then
-  clean_corrupted_cache
-fi
-
-echo "=== Applying model manifest ==="
-
-# Export variables for Python script (INSTALL_MODE now set)
+# Export variables for the install tasks and the Python tools they run
 export HF_TOKEN
 export CIVITAI_API_TOKEN
 export WORK_DIR
+export SCRIPT_DIR COMFYUI_DIR CACHE_ROOT WHEELHOUSE CONFIG_PATH
+export REFRESH_MODELS WORKFLOWS MODEL_CACHE_BUDGET
 
+# ==========================================================
+# === INSTALL TASKS =========================================
+# ==========================================================
+# Each step is a function that task_graph.py runs in its own bash process
+# (errexit on), so steps that do not depend on each other run concurrently:
+#
+#   stabilize_env ───┐
+#   install_comfyui ─┴─ install_nodes ─┐
+#   download_models ───────────────────┴─ link_install
+#
+# Model downloads are network-only and touch nothing under $COMFYUI_DIR, so
+# they overlap the git clone and every pip install; only the final link
+# step waits for them.
+
+stabilize_env() {
+  echo "=== Stabilizing Python environment ==="
+
+  # Skip the whole step when the pinned versions are already installed (repeat
+  # boots of the same volume); otherwise restore them from the local wheelhouse
+  if python "$SCRIPT_DIR/env_snapshot.py" check; then
+    echo "✅ Pinned torch/xformers/numpy/protobuf already installed - skipping"
+    profile_event "{\"event\": \"skip\", \"name\": \"pinned environment\", \"phase\": \"$INSTALL_PHASE\", \"status\": \"already installed\"}"
+  elif timed pip "wheelhouse install" python "$SCRIPT_DIR/env_snapshot.py" install --wheelhouse "$WHEELHOUSE"; then
+    echo "✅ Pinned packages installed from wheelhouse"
+  else
+    timed pip "uninstall pinned set" pip uninstall -y torch torchvision torchaudio xformers numpy protobuf 2>/dev/null || true
+
+    timed pip "torch/torchvision/torchaudio" pip install -q \
+      torch==2.6.0 \
+      torchvision==0.21.0 \
+      torchaudio==2.6.0 \
+      --index-url https://download.pytorch.org/whl/cu118 \
+      --use-deprecated=legacy-resolver 2>&1 | grep -v "ERROR: pip" || true
 
-python - << 'EOF'
-import json, os, sys
-import subprocess
-from pathlib import Path
-
-manifest_path = os.getenv("MANIFEST")
-if not manifest_path:
-    print("ERROR: MANIFEST environment variable not set")
-    sys.exit(1)
-
-if not os.path.exists(manifest_path):
-    print(f"ERROR: Manifest file not found: {manifest_path}")
-    sys.exit(1)
-
-manifest = json.load(open(manifest_path))
-install_mode = os.getenv("INSTALL_MODE", "lite")
-hf_token = os.getenv("HF_TOKEN", "")
-civitai_token = os.getenv("CIVITAI_API_TOKEN", "")
-work_dir = os.getenv("WORK_DIR", "/content")
-cache_root = f"{work_dir}/model-cache"
-
-# Category to directory mapping
-category_dirs = {
-    "checkpoints": "models/checkpoints",
-    "vae": "models/vae",
-    "controlnet": "models/controlnet",
-    "ipadapter": "models/ipadapter",
-    "loras": "models/loras",
-    "loras_style": "models/loras",  # Style LoRAs go to main loras folder
-    "loras_nsfw": "models/loras",   # NSFW LoRAs go to main loras folder
-    "upscale_models": "models/upscale_models",
-    "insightface": "models/insightface/models",
-    "animatediff": "models/animatediff",
-    "checkpoints_sd15": "models/checkpoints",  # SD1.5 checkpoints go to main checkpoints
-    "video": "models/checkpoints"  # Video models (SVD) go to checkpoints
-}
 
-def download_model(name, url, target_dir, auth_header="", min_size=1000000):
-    """Download model with caching and validation"""
-    cache_file = f"{cache_root}/{name}"
-    final_path = f"{target_dir}/{name}"
-    
-    # Create directories
-    os.makedirs(cache_root, exist_ok=True)
-    os.makedirs(target_dir, exist_ok=True)
-    
-    # Check if already cached and valid
-    if os.path.exists(cache_file):
-        size = os.path.getsize(cache_file)
-        if size >= min_size:
-            print(f"[CACHED] {name} ({size} bytes)")
-            # Create symlink if doesn't exist
-            if not os.path.exists(final_path):
-                try:
-                    os.symlink(cache_file, final_path)
-                except:
-                    import shutil
-                    shutil.copy2(cache_file, final_path)
-            return True
-    
-    # Download
-    print(f"[DOWNLOAD] {name}")
-    wget_cmd = ["wget", "-q", "--show-progress", "-O", cache_file, url]
-    
-    # Add authentication headers
-    if auth_header:
-        wget_cmd.insert(1, f"--header={auth_header}")
-    elif "civitai.com" in url and civitai_token:
-        # CivitAI requires token in URL parameter, not header
-        if "?" in url:
-            url = f"{url}&token={civitai_token}"
-        else:
-            url = f"{url}?token={civitai_token}"
-        wget_cmd[-1] = url  # Update URL in command
-    
-    try:
-        result = subprocess.run(wget_cmd, check=True, capture_output=False)
-        
-        # Validate size
-        size = os.path.getsize(cache_file)
-        if size < min_size:
-            print(f"[ERROR] {name} too small ({size} bytes), expected >{min_size}")
-            os.remove(cache_file)
-            return False
-        
-        # Create symlink
-        if not os.path.exists(final_path):
-            try:
-                os.symlink(cache_file, final_path)
-            except:
-                import shutil
-                shutil.copy2(cache_file, final_path)
-        
-        print(f"[OK] {name} ({size} bytes)")
-        return True
-        
-    except subprocess.CalledProcessError as e:
-        print(f"[ERROR] Failed to download {name}: {e}")
-        if os.path.exists(cache_file):
-            os.remove(cache_file)
-        return False
-
-# Process all models
-downloaded = 0
-skipped = 0
-failed = 0
-
-for category, models in manifest.items():
-    target_dir = category_dirs.get(category, f"models/{category}")
-    
-    for name, meta in models.items():
-        modes = meta.get("modes", [])
-        if install_mode not in modes:
-            print(f"[SKIP] {name} (not in {install_mode} mode)")
-            skipped += 1
-            continue
-        
-        url = meta["url"]
-        auth = meta.get("auth", "none")
-        min_size = meta.get("min_size", 1000000)
-        
-        # Build auth header
-        auth_header = ""
-        if auth == "hf" and hf_token:
-            auth_header = f"Authorization: Bearer {hf_token}"
-        
-        # Download
-        if download_model(name, url, target_dir, auth_header, min_size):
-            downloaded += 1
-        else:
-            failed += 1
-
-print(f"\n✅ Model downloads complete: {downloaded} downloaded, {skipped} skipped, {failed} failed")
+    timed pip "xformers" pip install -q xformers==0.0.33.post2 --no-deps
+    timed pip "numpy/protobuf" pip install -q numpy==1.26.4 protobuf==4.25.3 --force-reinstall 2>&1 | grep -v "ERROR: pip" || true
+    timed pip "torchsde" pip install -q torchsde  # Required by ComfyUI samplers
+
+    # Keep the wheels for the next boot (mostly served from the pip cache just filled)
+    timed pip "wheelhouse prepare" python "$SCRIPT_DIR/env_snapshot.py" prepare --wheelhouse "$WHEELHOUSE" \
+      || echo "[WARN] Could not prepare wheelhouse - next boot will download again"
+  fi
+
+  # === SANITY CHECK (ADDITIVE) ===
+  python - << 'EOF'
+import torch, numpy
+print("[CHECK] Torch:", torch.__version__)
+print("[CHECK] CUDA available:", torch.cuda.is_available())
+print("[CHECK] NumPy:", numpy.__version__)
+assert torch.cuda.is_available(), "CUDA NOT AVAILABLE"
 EOF
+}
 
+download_models() {
+  # Auto-clean corrupted cache files before downloading
+  if [[ -d "$CACHE_ROOT" ]]; then
+    clean_corrupted_cache
+  fi
 
-# Create symlink to active config (now after mode set, but before ComfyUI install)
-ln -sf "$CONFIG_PATH" "$COMFYUI_DIR/active_config.yaml" 2>/dev/null || true
+  echo "=== Applying model manifest ==="
 
-# ------------------ COMFYUI INSTALL ------------------
-echo "=== Installing / Updating ComfyUI ==="
-if [[ -d "$COMFYUI_DIR" ]]; then
-  cd "$COMFYUI_DIR"
-  git pull --quiet
-else
-  git clone https://github.com/comfyanonymous/ComfyUI.git "$COMFYUI_DIR"
-  cd "$COMFYUI_DIR"
-fi
+  # Pin CivitAI entries to exact version/size/sha256 (only new URLs hit the API)
+  python "$SCRIPT_DIR/manifest_lock.py" --manifest "$MANIFEST" \
+    || echo "⚠️  Could not update model lockfile - CivitAI downloads fall back to min_size checks"
 
-# === Install ComfyUI requirements ===
-pip install -q -r requirements.txt || echo "[WARN] No requirements.txt found"
+  local DOWNLOAD_ARGS=(--manifest "$MANIFEST" --mode "$INSTALL_MODE" --cache-root "$CACHE_ROOT")
+  [[ "$REFRESH_MODELS" == "1" ]] && DOWNLOAD_ARGS+=(--refresh)
+  # Only fetch the models the selected workflows load (instead of the whole mode)
+  if [[ -n "$WORKFLOWS" ]]; then
+    python "$SCRIPT_DIR/workflow_deps.py" --manifest "$MANIFEST" "$WORKFLOWS"
+    DOWNLOAD_ARGS+=(--workflows "$WORKFLOWS")
+  fi
+  # Evict least-recently-used models outside this mode to stay within budget
+  [[ -n "$MODEL_CACHE_BUDGET" ]] && DOWNLOAD_ARGS+=(--cache-budget "$MODEL_CACHE_BUDGET")
 
-# === CREATE EXTRA MODEL PATHS CONFIG ===
-# This tells ComfyUI where to find models in our cache
-echo "[INFO] Configuring model paths for ComfyUI..."
-cat > "$COMFYUI_DIR/extra_model_paths.yaml" <<EOF_PATHS
+  # Concurrent downloader: bounded pool, per-host limits, one progress line
+  python "$SCRIPT_DIR/model_downloader.py" "${DOWNLOAD_ARGS[@]}"
+}
+
+install_comfyui() {
+  echo "=== Installing / Updating ComfyUI ==="
+  # No pull when the checkout is at the commit last applied and upstream has not moved
+  if [[ -d "$COMFYUI_DIR" ]] && python "$SCRIPT_DIR/install_state.py" check comfyui --git "$COMFYUI_DIR"; then
+    return 0
+  fi
+
+  if [[ -d "$COMFYUI_DIR" ]]; then
+    cd "$COMFYUI_DIR"
+    timed git "ComfyUI pull" git pull --quiet
+  else
+    timed git "ComfyUI clone" git clone https://github.com/comfyanonymous/ComfyUI.git "$COMFYUI_DIR"
+  fi
+  python "$SCRIPT_DIR/install_state.py" mark comfyui --git "$COMFYUI_DIR"
+
+  # === ComfyUI requirements ===
+  # Installed together with the custom node requirements (see install_nodes)
+}
+
+install_nodes() {
+  echo "=== Installing Custom Nodes ==="
+
+  local NODES=(
+    https://github.com/ltdrdata/ComfyUI-Manager
+    https://github.com/ltdrdata/ComfyUI-Impact-Pack
+    https://github.com/ltdrdata/ComfyUI-Impact-Subpack
+    https://github.com/kijai/ComfyUI-KJNodes
+    https://github.com/Fannovel16/comfyui_controlnet_aux
+    https://github.com/cubiq/ComfyUI_IPAdapter_plus
+    https://github.com/pythongosssss/ComfyUI-Custom-Scripts
+    https://github.com/WASasquatch/was-node-suite-comfyui
+    https://github.com/rgthree/rgthree-comfy
+    # Note: ComfyUI-ReActor-Node requires additional setup (authentication/model downloads)
+    # Skipping automatic installation - users can install manually if needed
+    # https://github.com/Gourieff/ComfyUI-ReActor-Node
+    https://github.com/ssitu/ComfyUI_UltimateSDUpscale
+    https://github.com/jags111/efficiency-nodes-comfyui
+  )
+
+  # Add workflow-specific nodes for full mode
+  if [[ "$INSTALL_MODE" == "full" ]]; then
+    NODES+=(https://github.com/Kosinkadink/ComfyUI-VideoHelperSuite)
+    NODES+=(https://github.com/Kosinkadink/ComfyUI-AnimateDiff-Evolved)
+  fi
+
+  # With --workflows, install only the Manager plus the nodes those workflows use
+  if [[ -n "$WORKFLOWS" ]]; then
+    local WORKFLOW_NODES
+    WORKFLOW_NODES="$(python "$SCRIPT_DIR/workflow_deps.py" --manifest "$MANIFEST" --nodes "$WORKFLOWS")"
+    NODES=(https://github.com/ltdrdata/ComfyUI-Manager)
+    [[ -n "$WORKFLOW_NODES" ]] && mapfile -t -O 1 NODES <<< "$WORKFLOW_NODES"
+  fi
+
+  # Shallow clones/updates in parallel, then one pip resolution over ComfyUI's
+  # and every node's requirements, constrained to the pinned torch/numpy set
+  python "$SCRIPT_DIR/custom_nodes.py" --dest "$COMFYUI_DIR/custom_nodes" \
+    --comfyui-dir "$COMFYUI_DIR" "${NODES[@]}" \
+    || echo "[WARN] Custom node requirements did not install cleanly - see messages above"
+
+  # Add custom node wheels to the wheelhouse (only when the merged requirements changed)
+  timed pip "wheelhouse prepare (nodes)" python "$SCRIPT_DIR/env_snapshot.py" prepare --wheelhouse "$WHEELHOUSE" \
+    --requirements "$COMFYUI_DIR/custom_nodes/.requirements.merged.txt" \
+    --constraints "$COMFYUI_DIR/custom_nodes/.requirements.pins.txt" \
+    || echo "[WARN] Could not cache custom node wheels"
+}
+
+link_install() {
+  # Create symlink to active config (ComfyUI is checked out by now)
+  ln -sf "$CONFIG_PATH" "$COMFYUI_DIR/active_config.yaml" 2>/dev/null || true
+
+  # === CREATE EXTRA MODEL PATHS CONFIG ===
+  # This tells ComfyUI where to find models in our cache
+  echo "[INFO] Configuring model paths for ComfyUI..."
+  cat > "$COMFYUI_DIR/extra_model_paths.yaml" <<EOF_PATHS
 # ComfyUI Model Paths Configuration
-# Points ComfyUI to our centralized model cache
+# Points ComfyUI to our centralized model cache (folders hold links into
+# the content-addressed store at blobs/sha256)
 
 comfyui:
   base_path: $CACHE_ROOT
@@ -443,6 +472,8 @@ comfyui:
   configs: configs
   controlnet: controlnet
   embeddings: embeddings
+  ipadapter: ipadapter
+  insightface: insightface
   loras: loras
   upscale_models: upscale_models
   vae: vae
@@ -455,87 +486,63 @@ comfyui:
   video_formats: video
 EOF_PATHS
 
-echo "✅ Model paths configured: $CACHE_ROOT"
-
-# ------------------ CUSTOM NODES ------------------
-echo "=== Installing Custom Nodes ==="
-cd custom_nodes
-
-NODES=(
-  https://github.com/ltdrdata/ComfyUI-Manager
-  https://github.com/ltdrdata/ComfyUI-Impact-Pack
-  https://github.com/ltdrdata/ComfyUI-Impact-Subpack
-  https://github.com/kijai/ComfyUI-KJNodes
-  https://github.com/Fannovel16/comfyui_controlnet_aux
-  https://github.com/cubiq/ComfyUI_IPAdapter_plus
-  https://github.com/pythongosssss/ComfyUI-Custom-Scripts
-  https://github.com/WASasquatch/was-node-suite-comfyui
-  https://github.com/rgthree/rgthree-comfy
-  # Note: ComfyUI-ReActor-Node requires additional setup (authentication/model downloads)
-  # Skipping automatic installation - users can install manually if needed
-  # https://github.com/Gourieff/ComfyUI-ReActor-Node
-  https://github.com/ssitu/ComfyUI_UltimateSDUpscale
-  https://github.com/jags111/efficiency-nodes-comfyui
-)
-
-# Add workflow-specific nodes for full mode
-if [[ "$INSTALL_MODE" == "full" ]]; then
-  NODES+=(https://github.com/Kosinkadink/ComfyUI-VideoHelperSuite)
-  NODES+=(https://github.com/Kosinkadink/ComfyUI-AnimateDiff-Evolved)
-fi
+  echo "✅ Model paths configured: $CACHE_ROOT"
 
-# Disable git prompts for non-interactive environments (Kaggle/Colab)
-export GIT_TERMINAL_PROMPT=0
+  # ------------------ DEPLOY WORKFLOWS ------------------
+  echo "=== Deploying Workflows ==="
 
-for repo in "${NODES[@]}"; do
-  name="${repo##*/}"
-  if [[ -d "$name" ]]; then
-    echo "Updating $name..."
-    (cd "$name" && git pull --quiet) || echo "[WARN] Failed to update $name"
-  else
-    echo "Installing $name..."
-    if git clone --quiet --recursive "$repo" 2>/dev/null; then
-      echo "✓ Installed $name"
+  local WORKFLOWS_SRC="$SCRIPT_DIR/workflows"
+  local WORKFLOWS_DEST="$COMFYUI_DIR/user/default/workflows"
+
+  if [[ -d "$WORKFLOWS_SRC" ]]; then
+    mkdir -p "$WORKFLOWS_DEST"
+
+    # Copy all workflow JSON files
+    local WORKFLOW_COUNT
+    WORKFLOW_COUNT=$(find "$WORKFLOWS_SRC" -name "*.json" | wc -l)
+
+    if [[ $WORKFLOW_COUNT -gt 0 ]]; then
+      # Copy only when the workflow files changed since the last deploy
+      local STATE_ARGS=(workflows --exists "$WORKFLOWS_DEST")
+      for f in "$WORKFLOWS_SRC"/*.json; do STATE_ARGS+=(--file "$f"); done
+      if ! python "$SCRIPT_DIR/install_state.py" check "${STATE_ARGS[@]}"; then
+        cp "$WORKFLOWS_SRC"/*.json "$WORKFLOWS_DEST"/
+        python "$SCRIPT_DIR/install_state.py" mark "${STATE_ARGS[@]}"
+        echo "✅ Deployed $WORKFLOW_COUNT workflows to ComfyUI"
+        echo "   Location: $WORKFLOWS_DEST"
+      fi
     else
-      echo "[WARN] Failed to install $name (may require authentication or be unavailable)"
-      echo "[INFO] Skipping $name - installation will continue"
-      continue
+      echo "⚠️  No workflow files found in "$WORKFLOWS_SRC""
     fi
+  else
+    echo "⚠️  Workflows directory not found: "$WORKFLOWS_SRC""
   fi
-  [[ -f "$name/requirements.txt" ]] && pip install -q -r "$name/requirements.txt"
-done
 
-# ------------------ DEPLOY WORKFLOWS ------------------
-echo "=== Deploying Workflows ==="
+  # === Models managed by manifest (see download_models) ===
+  echo "✅ Models loaded via manifest system"
+}
 
-# Get absolute path to script directory first (before we cd around)
-SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
-WORKFLOWS_SRC="$SCRIPT_DIR/workflows"
-WORKFLOWS_DEST="$COMFYUI_DIR/user/default/workflows"
+export -f profile_event timed clean_corrupted_cache
+export -f stabilize_env download_models install_comfyui install_nodes link_install
 
-if [[ -d "$WORKFLOWS_SRC" ]]; then
-  mkdir -p "$WORKFLOWS_DEST"
-  
-  # Copy all workflow JSON files
-  WORKFLOW_COUNT=$(find "$WORKFLOWS_SRC" -name "*.json" | wc -l)
-  
-  if [[ $WORKFLOW_COUNT -gt 0 ]]; then
-    cp "$WORKFLOWS_SRC"/*.json "$WORKFLOWS_DEST"/
-    echo "✅ Deployed $WORKFLOW_COUNT workflows to ComfyUI"
-    echo "   Location: $WORKFLOWS_DEST"
-  else
-    echo "⚠️  No workflow files found in "$WORKFLOWS_SRC""
-  fi
-else
-  echo "⚠️  Workflows directory not found: "$WORKFLOWS_SRC""
-fi
+# Disable git prompts for non-interactive environments (Kaggle/Colab)
+export GIT_TERMINAL_PROMPT=0
 
-# === Models managed by manifest (see lines 121-146) ===
-echo "✅ Models loaded via manifest system"
+# Each task is recorded as its own profile phase; a failed task skips its
+# dependents and fails the install once the independent tasks have finished
+phase ""
+echo "=== Running install tasks ==="
+python "$SCRIPT_DIR/task_graph.py" \
+  stabilize_env \
+  install_comfyui \
+  download_models \
+  install_nodes:stabilize_env,install_comfyui \
+  link_install:install_nodes,download_models
 
 # ==========================================================
 # === CACHE STATISTICS & HEALTH CHECKS =====================
 # ==========================================================
+phase "System Health Checks"
 echo ""
 echo "=== System Health Checks ==="
 
@@ -557,7 +564,8 @@ fi
 if [[ -d "$CACHE_ROOT" ]]; then
   CACHE_SIZE=$(du -sh "$CACHE_ROOT" 2>/dev/null | cut -f1 || echo "unknown")
   CACHE_FILES=$(find "$CACHE_ROOT" -type f 2>/dev/null | wc -l || echo "unknown")
-  echo "✅ Model cache: $CACHE_SIZE ($CACHE_FILES files)"
+  CACHE_RECLAIMED=$(python "$SCRIPT_DIR/model_cache.py" reclaimed --cache-root "$CACHE_ROOT" 2>/dev/null || echo "0.0 B")
+  echo "✅ Model cache: $CACHE_SIZE ($CACHE_FILES files, $CACHE_RECLAIMED reclaimed by eviction)"
 else
   echo "⚠️ Model cache: NOT FOUND"
 fi
@@ -604,6 +612,9 @@ echo "     Local:  http://localhost:8188"
 echo ""
 echo "Tips:"
 echo "  • Use --refresh-models to force re-download"
+echo "  • Use --cache-budget=150G to cap the model cache (LRU eviction)"
 echo "  • Cache persists across restarts"
+echo "  • Pin hashes: python model_cache.py backfill-hashes"
 echo "  • Config auto-selected based on GPU"
+echo "  • Install timings: $WORK_DIR/install-profile.json"
 echo "================================================"
\ No newline at end of file
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Install Profiler
+Collects timing events from install_comfyui_auto.sh and the Python tools it
+runs (phases, pip/git commands, model downloads, custom nodes) and turns them
+into a JSON report plus sorted summary tables.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from comfy_utils import format_bytes
+
+# Event log (JSON lines) the installer exports; unset disables recording
+PROFILE_ENV = "INSTALL_PROFILE"
+# Name of the installer phase currently running, used to attribute events
+PHASE_ENV = "INSTALL_PHASE"
+
+TOP_ITEMS = 15
+
+_lock = threading.Lock()
+
+
+def record(event: str, name: str, **fields):
+    """
+    Append one event to the profile log (no-op unless $INSTALL_PROFILE is set)
+
+    Args:
+        event: Event kind, e.g. 'model', 'node', 'pip', 'git'
+        name: What the event is about (model file, node repo, command label)
+        fields: Extra data such as seconds, bytes or status
+    """
+    path = os.getenv(PROFILE_ENV)
+    if not path:
+        return
+    row = {"event": event, "name": name, "phase": os.getenv(PHASE_ENV, ""), "time": time.time()}
+    row.update(fields)
+    line = json.dumps(row) + "\n"
+    try:
+        # One small O_APPEND write per event keeps lines intact across processes
+        with _lock, open(path, "a") as f:
+            f.write(line)
+    except OSError:
+        pass
+
+
+def load_events(path: str) -> List[Dict]:
+    events = []
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue  # A line cut short by an interrupted installer
+    return events
+
+
+def build_report(events: List[Dict], platform: Optional[str] = None,
+                 gpu: Optional[str] = None) -> Dict:
+    """
+    Aggregate raw events into per-phase and per-item timings
+
+    Returns:
+        Dict with 'phases' (wall time, pip/git seconds, bytes per phase, in run
+        order) and 'items' (every timed command, model and node)
+    """
+    now = max((e.get("end") or e.get("time") or 0 for e in events), default=time.time())
+    phases: Dict[str, Dict] = {}
+    items = []
+
+    for e in events:
+        kind, name = e.get("event"), e.get("name", "")
+        if kind == "phase_start":
+            phases[name] = {"name": name, "start": e["time"], "end": None, "seconds": 0.0,
+                            "pip_seconds": 0.0, "git_seconds": 0.0, "bytes": 0, "items": 0}
+            continue
+        if kind == "phase_end":
+            if name in phases:
+                phases[name]["end"] = e["time"]
+                phases[name]["status"] = e.get("status", "ok")
+            continue
+
+        seconds = e.get("seconds")
+        if seconds is None and "start" in e and "end" in e:
+            seconds = e["end"] - e["start"]
+        item = {
+            "kind": kind,
+            "name": name,
+            "phase": e.get("phase", ""),
+            "seconds": round(seconds or 0.0, 3),
+            "bytes": e.get("bytes", 0),
+            "status": e.get("status") or ("ok" if e.get("rc", 0) == 0 else f"exit {e['rc']}"),
+        }
+        items.append(item)
+
+        phase = phases.get(item["phase"])
+        if phase is None:
+            continue
+        phase["items"] += 1
+        phase["bytes"] += item["bytes"]
+        if kind == "pip":
+            phase["pip_seconds"] += item["seconds"]
+        elif kind == "git":
+            phase["git_seconds"] += item["seconds"]
+        elif kind == "node":
+            phase["git_seconds"] += e.get("git_seconds", 0.0)
+
+    for phase in phases.values():
+        if phase["end"] is None:
+            phase["status"] = "incomplete"
+            phase["end"] = now
+        phase["seconds"] = round(phase["end"] - phase["start"], 3)
+        phase["pip_seconds"] = round(phase["pip_seconds"], 3)
+        phase["git_seconds"] = round(phase["git_seconds"], 3)
+
+    starts = [p["start"] for p in phases.values()]
+    ends = [p["end"] for p in phases.values()]
+    return {
+        "platform": platform,
+        "gpu": gpu,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(min(starts)))
+        if starts else None,
+        "total_seconds": round(max(ends) - min(starts), 3) if starts else 0.0,
+        "bytes_downloaded": sum(item["bytes"] for item in items),
+        "phases": list(phases.values()),
+        "items": items,
+    }
+
+
+def format_seconds(seconds: float) -> str:
+    if seconds >= 60:
+        return f"{int(seconds // 60)}m{seconds % 60:04.1f}s"
+    return f"{seconds:.1f}s"
+
+
+def print_report(report: Dict, top: int = TOP_ITEMS):
+    """Print the phases and the slowest items, longest first"""
+    total = report["total_seconds"] or 1e-9
+    print("\n=== Install profile ===")
+    print(f"{'Phase':<32} {'Wall':>9} {'Share':>6} {'pip':>8} {'git':>8} {'Downloaded':>11}")
+    for phase in sorted(report["phases"], key=lambda p: p["seconds"], reverse=True):
+        flag = f" ({phase['status']})" if phase["status"] != "ok" else ""
+        print(f"{phase['name'][:32]:<32} {format_seconds(phase['seconds']):>9} "
+              f"{phase['seconds'] / total:>6.0%} {format_seconds(phase['pip_seconds']):>8} "
+              f"{format_seconds(phase['git_seconds']):>8} {format_bytes(phase['bytes']):>11}{flag}")
+    print(f"{'Total':<32} {format_seconds(report['total_seconds']):>9} "
+          f"{'':>6} {'':>8} {'':>8} {format_bytes(report['bytes_downloaded']):>11}")
+
+    steps = [item for item in report["items"] if item["kind"] != "skip"]
+    items = sorted(steps, key=lambda i: i["seconds"], reverse=True)[:top]
+    if items:
+        print(f"\n{'Slowest steps':<40} {'Kind':<6} {'Time':>9} {'Bytes':>10}  Status")
+        for item in items:
+            size = format_bytes(item["bytes"]) if item["bytes"] else "-"
+            print(f"{item['name'][:40]:<40} {item['kind']:<6} {format_seconds(item['seconds']):>9} "
+                  f"{size:>10}  {item['status']}")
+
+    skips = [item for item in report["items"] if item["kind"] == "skip"]
+    if skips:
+        print(f"\nSkipped (inputs unchanged since the last install): {len(skips)}")
+        for item in skips:
+            print(f"  • {item['name']}: {item['status']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize an installer profile")
+    parser.add_argument("--events", default=os.getenv(PROFILE_ENV),
+                        help="Event log written during the install (default: $INSTALL_PROFILE)")
+    parser.add_argument("--json", default=None, help="Write the aggregated report to this file")
+    parser.add_argument("--platform", default=os.getenv("PLATFORM"))
+    parser.add_argument("--gpu", default=None)
+    parser.add_argument("--top", type=int, default=TOP_ITEMS,
+                        help=f"Slowest steps to list (default: {TOP_ITEMS})")
+    args = parser.parse_args()
+
+    if not args.events or not os.path.exists(args.events):
+        print(f"ERROR: Profile event log not found: {args.events}")
+        sys.exit(1)
+
+    report = build_report(load_events(args.events), args.platform, args.gpu)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    print_report(report, args.top)
+    if args.json:
+        print(f"\n📋 Profile report: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Incremental Install State
+Remembers what the installer last applied (ComfyUI and custom node commits,
+requirement hashes, the model set from the manifest, workflow checksums) in
+$WORK_DIR/.install_state.json so a rerun on a warm volume skips every step
+whose inputs are unchanged.
+"""
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, Iterable, List, Optional
+
+from install_profile import record
+
+# State file the installer exports; defaults to $WORK_DIR/.install_state.json
+STATE_ENV = "INSTALL_STATE"
+STATE_FILE = ".install_state.json"
+GIT_TIMEOUT = 30
+
+
+def default_state_path() -> str:
+    return os.getenv(STATE_ENV) or os.path.join(os.getenv("WORK_DIR", "/content"), STATE_FILE)
+
+
+def digest(*parts) -> str:
+    """SHA-256 of JSON-serializable parts (order matters)"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def files_digest(paths: Iterable[str]) -> str:
+    """SHA-256 over the names and contents of the existing files among paths"""
+    h = hashlib.sha256()
+    for path in sorted(p for p in paths if os.path.isfile(p)):
+        h.update(os.path.basename(path).encode() + b"\0")
+        with open(path, "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+def _git(path: str, args: List[str]) -> Optional[str]:
+    env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+    try:
+        result = subprocess.run(["git", "-C", path] + args, env=env, capture_output=True,
+                                text=True, timeout=GIT_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    output = result.stdout.split()
+    return output[0] if result.returncode == 0 and output else None
+
+
+def git_head(path: str) -> Optional[str]:
+    """Commit checked out in a repository"""
+    return _git(path, ["rev-parse", "HEAD"])
+
+
+def remote_head(path: str) -> Optional[str]:
+    """Commit the remote's default branch points to (one ls-remote round trip, no fetch)"""
+    return _git(path, ["ls-remote", "origin", "HEAD"])
+
+
+def skipped(step: str, reason: str):
+    """Announce a skipped step and add it to the install profile"""
+    print(f"[SKIP] {step}: {reason}")
+    record("skip", step, status=reason)
+
+
+class InstallState:
+    """
+    Fingerprints of the inputs each install step last completed with
+
+    Install tasks run concurrently in separate processes, so every update
+    re-reads the file under an exclusive lock before writing it back.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or default_state_path()
+        self._entries = self._load()
+
+    def _load(self) -> Dict:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, step: str) -> Optional[Dict]:
+        return self._entries.get(step)
+
+    def entries(self) -> Dict:
+        return dict(self._entries)
+
+    def unchanged(self, step: str, fingerprint: str) -> bool:
+        entry = self._entries.get(step)
+        return bool(entry) and entry.get("fingerprint") == fingerprint
+
+    def since(self, step: str) -> str:
+        """When a step was last applied, for skip messages"""
+        return (self._entries.get(step) or {}).get("applied_at", "an earlier run")
+
+    def mark(self, step: str, fingerprint: str, **details):
+        """Record that a step completed with the given inputs"""
+        self._update(step, dict(details, fingerprint=fingerprint,
+                                applied_at=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())))
+
+    def forget(self, step: str):
+        self._update(step, None)
+
+    def _update(self, step: str, entry: Optional[Dict]):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._entries = self._load()
+            if entry is None:
+                self._entries.pop(step, None)
+            else:
+                self._entries[step] = entry
+            with open(self.path + ".tmp", "w") as f:
+                json.dump(self._entries, f, indent=2, sort_keys=True)
+            os.replace(self.path + ".tmp", self.path)
+
+
+def step_fingerprint(files: List[str], values: List[str], git_dir: Optional[str]) -> str:
+    return digest(files_digest(files), values, git_head(git_dir) if git_dir else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Skip install steps whose inputs are unchanged")
+    parser.add_argument("command", choices=["check", "mark", "forget", "show"],
+                        help="check: exit 0 if STEP can be skipped; mark: record STEP as applied")
+    parser.add_argument("step", nargs="?", help="Step name, e.g. comfyui or workflows")
+    parser.add_argument("--state", default=default_state_path(),
+                        help="State file (default: $INSTALL_STATE or $WORK_DIR/.install_state.json)")
+    parser.add_argument("--file", action="append", default=[], dest="files",
+                        help="Input file whose contents the step depends on (repeatable)")
+    parser.add_argument("--value", action="append", default=[], dest="values",
+                        help="Input value the step depends on, e.g. the install mode (repeatable)")
+    parser.add_argument("--git", default=None,
+                        help="Repository the step keeps up to date: its commit is recorded, and "
+                             "check also requires the remote HEAD to match it")
+    parser.add_argument("--exists", action="append", default=[],
+                        help="Output path that must still exist for the step to be skipped (repeatable)")
+    args = parser.parse_args()
+
+    state = InstallState(args.state)
+    if args.command == "show":
+        print(json.dumps(state.entries(), indent=2, sort_keys=True))
+        return
+    if not args.step:
+        parser.error(f"{args.command} needs a step name")
+    if args.command == "forget":
+        state.forget(args.step)
+        return
+
+    fingerprint = step_fingerprint(args.files, args.values, args.git)
+    if args.command == "mark":
+        details = {"commit": git_head(args.git)} if args.git else {}
+        state.mark(args.step, fingerprint, **details)
+        return
+
+    missing = [path for path in args.exists if not os.path.exists(path)]
+    if not state.unchanged(args.step, fingerprint) or missing:
+        sys.exit(1)
+    if args.git:
+        head = state.get(args.step).get("commit")
+        if head is None or remote_head(args.git) != head:
+            sys.exit(1)  # New upstream commits (or the remote is unreachable)
+        skipped(args.step, f"already at {head[:10]} (remote unchanged)")
+    else:
+        skipped(args.step, f"unchanged since {state.since(args.step)}")
+
+
+if __name__ == "__main__":
+    main()
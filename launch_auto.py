@@ -3,7 +3,9 @@
 ComfyUI Auto Launcher
 Detects GPU tier and launches ComfyUI with the appropriate workflow and configuration
 """
+import argparse
 import os
+import signal
 import subprocess
 import sys
 import yaml
@@ -36,38 +38,33 @@ WORK_DIR = detect_platform()
 def detect_gpu():
     """
     Unified GPU detection - returns tier name and VRAM in MB
-    Tier priority: 4090 > 3090 > P100 > T4 (default)
+    Tier priority: 4090 > 3090 > P100 > T4 (default); on multi-GPU hosts the
+    device with the least VRAM decides (see comfy_utils.detect_gpu)
     """
-    try:
-        output = subprocess.check_output([
-            "nvidia-smi",
-            "--query-gpu=name,memory.total",
-            "--format=csv,noheader"
-        ]).decode().strip()
-        
-        if not output:
-            return "t4", 0  # Default to T4 if no output
-        
-        # Handle multiple GPUs - use first line only
-        first_line = output.split('\n')[0]
-        name, mem_str = first_line.split(",", 1)
-        name = name.strip()
-        mem_mb = int(mem_str.strip().replace(" MiB", ""))
-        
-        # Unified tier detection (matches installer logic)
-        if "4090" in name or mem_mb >= 24000:
-            return "4090", mem_mb
-        elif "3090" in name or mem_mb >= 22000:
-            return "3090", mem_mb
-        elif "P100" in name:
-            return "p100", mem_mb
-        else:  # T4 or unknown - default to T4
-            return "t4", mem_mb
-            
-    except Exception as e:
-        print(f"⚠️ GPU detection failed: {e}")
+    from comfy_utils import detect_gpu as detect
+    
+    tier, mem_mb = detect()
+    if not mem_mb:
+        print("⚠️ GPU detection failed: nvidia-smi reported no devices")
         print("Defaulting to T4 profile")
-        return "t4", 0
+    return tier, mem_mb
+
+
+def worker_count(requested, gpu_count):
+    """
+    Number of ComfyUI workers to run
+    'auto' uses every GPU; a number is capped at the GPUs present
+    """
+    if requested == "auto":
+        return max(1, gpu_count)
+    try:
+        count = int(requested)
+    except ValueError:
+        print(f"⚠️ Invalid worker count: {requested} - using 1")
+        return 1
+    if count > gpu_count > 0:
+        print(f"⚠️ {count} workers requested but only {gpu_count} GPU(s) found")
+    return max(1, min(count, gpu_count or 1))
 
 
 def detect_comfyui():
@@ -150,18 +147,95 @@ def find_workflow(tier):
     )
 
 
+def start_warmup(workflow_path, comfyui_dir):
+    """
+    Read the workflow's model files into the page cache in a background process
+    Runs alongside ComfyUI's boot; set MODEL_WARMUP=0 to disable
+    """
+    if os.getenv("MODEL_WARMUP", "1") == "0":
+        return None
+    
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_warmup.py")
+    try:
+        process = subprocess.Popen(
+            [sys.executable, script, "--workflow", workflow_path, "--comfyui-dir", comfyui_dir,
+             "--cache-root", f"{WORK_DIR}/model-cache"],
+            stdin=subprocess.DEVNULL,
+            start_new_session=True
+        )
+    except OSError as e:
+        print(f"⚠️ Model warm-up not started: {e}")
+        return None
+    
+    print(f"🔥 Warming models for {os.path.basename(workflow_path)} in background (PID {process.pid})")
+    return process
+
+
+def run_workers(comfyui_dir, gpus, port):
+    """
+    Start one ComfyUI per GPU and serve them all through a proxy on port
+    Prompts go to the least busy worker; blocks until interrupted
+    """
+    from launcher_core import await_workers, start_workers
+    from prompt_proxy import LazyFetcher, MANIFEST, make_server
+    from supervisor import stop_process
+    
+    def interrupt(signum, frame):
+        raise KeyboardInterrupt
+    
+    # Workers run in their own sessions; stop them when the launcher is terminated
+    signal.signal(signal.SIGTERM, interrupt)
+    workers = start_workers(comfyui_dir, gpus, extra_args=["--force-fp16"])
+    try:
+        ready = await_workers(workers)
+        if not ready:
+            print("❌ No ComfyUI worker started")
+            sys.exit(1)
+        
+        fetcher = None
+        if os.getenv("LAZY_MODELS", "0") == "1":
+            fetcher = LazyFetcher(MANIFEST, comfyui_dir, f"{WORK_DIR}/model-cache")
+        server = make_server(port, [worker["port"] for worker in ready], fetcher)
+        print(f"\n✅ {len(ready)} worker(s) serving on http://0.0.0.0:{port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n🛑 Stopping workers...")
+        finally:
+            server.server_close()
+    finally:
+        for worker in workers:
+            stop_process(worker["process"])
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Detect the GPU tier and launch ComfyUI")
+    parser.add_argument("--workers", default=os.getenv("COMFYUI_WORKERS", "1"),
+                        help="ComfyUI workers, one per GPU: a number or 'auto' for every GPU "
+                             "(default: $COMFYUI_WORKERS or 1)")
+    parser.add_argument("--port", type=int, default=8188,
+                        help="Port ComfyUI (or the front proxy for several workers) listens on")
+    options = parser.parse_args()
+    
     print("=" * 60)
     print("ComfyUI Auto Launcher")
     print("=" * 60)
     
     # Detect GPU
+    from comfy_utils import detect_gpus
+    
+    gpus = detect_gpus()
     tier, vram_mb = detect_gpu()
     vram_gb = vram_mb / 1024 if vram_mb > 0 else 0
+    workers = worker_count(options.workers, len(gpus))
     
     print(f"\n📊 GPU Detection:")
+    for gpu in gpus:
+        print(f"  GPU {gpu['index']}      : {gpu['name']} ({gpu['vram_mb']} MB, {gpu['tier'].upper()})")
     print(f"  Tier       : {tier.upper()}")
     print(f"  VRAM       : {vram_gb:.1f} GB ({vram_mb} MB)")
+    if len(gpus) > 1 and workers == 1:
+        print(f"  💡 {len(gpus)} GPUs found - COMFYUI_WORKERS=auto runs one ComfyUI per GPU")
     
     # Load config
     config = load_config(tier)
@@ -184,7 +258,7 @@ def main():
     args = [
         "python", "main.py",
         "--listen",
-        "--port", "8188",
+        "--port", str(options.port),
         "--force-fp16"
     ]
     
@@ -193,11 +267,22 @@ def main():
     print(f"\n🚀 Launching ComfyUI...")
     print(f"  Directory  : {comfyui_dir}")
     print(f"  Workflow   : {workflow_path or 'Load from UI'}")
-    print(f"  Port       : 8188")
-    print(f"  Command    : {' '.join(args)}")
+    print(f"  Port       : {options.port}")
+    if workers > 1:
+        from launcher_core import WORKER_BASE_PORT
+        print(f"  Workers    : {workers} (one per GPU, ports from {WORKER_BASE_PORT})")
+    else:
+        print(f"  Command    : {' '.join(args)}")
     print("=" * 60)
     print()
     
+    # Prime the page cache while ComfyUI starts up
+    start_warmup(workflow_path, comfyui_dir)
+    
+    if workers > 1:
+        run_workers(comfyui_dir, gpus[:workers], options.port)
+        return
+    
     # Change to ComfyUI directory
     os.chdir(comfyui_dir)
     
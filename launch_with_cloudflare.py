@@ -6,8 +6,12 @@ Alternative to ngrok - no authentication required!
 import os
 import subprocess
 import sys
-import time
 import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from launcher_core import await_comfyui, spawn_comfyui
+from supervisor import ManagedProcess, Supervisor, comfyui_service
 import urllib.request
 import stat
 
@@ -29,52 +33,17 @@ def detect_platform():
         return "/content"
 
 WORK_DIR = detect_platform()
+CLOUDFLARED_LOG = "/tmp/cloudflared.log"
+# LAZY_MODELS=1: tunnel to prompt_proxy.py, which fetches missing models per prompt
+LAZY_MODELS = os.getenv("LAZY_MODELS", "0") == "1"
 
-def cleanup_port():
-    """Kill any process using port 8188"""
-    print(f"\n🧹 Cleaning up port {COMFYUI_PORT}...")
+def verify_cloudflared(path):
+    """True if the binary at path runs (catches truncated or corrupt downloads)"""
     try:
-        subprocess.run(
-            f"fuser -k {COMFYUI_PORT}/tcp 2>/dev/null || true",
-            shell=True,
-            timeout=5
-        )
-        print(f"✅ Port {COMFYUI_PORT} is now free")
-    except Exception as e:
-        print(f"⚠️ Port cleanup: {e} (probably already free)")
-    
-    time.sleep(1)
-
-def start_comfyui():
-    """Start ComfyUI in background"""
-    print("\n🚀 Starting ComfyUI...")
-    
-    comfyui_dir = f"{WORK_DIR}/ComfyUI"
-    if not os.path.exists(comfyui_dir):
-        print(f"❌ ComfyUI not found at {comfyui_dir}")
-        print(f"💡 Run the installer first: bash install_comfyui_auto.sh")
-        sys.exit(1)
-    
-    cleanup_port()
-    
-    bash_cmd = f"""
-cd {comfyui_dir}
-nohup python main.py --listen 0.0.0.0 --port {COMFYUI_PORT} > /tmp/comfy.log 2>&1 &
-sleep 20
-tail -n 3 /tmp/comfy.log
-"""
-    
-    print(f"⏳ Launching ComfyUI (this will take ~20 seconds)...")
-    
-    subprocess.run(
-        bash_cmd,
-        shell=True,
-        executable='/bin/bash',
-        capture_output=False
-    )
-    
-    print("\n✅ ComfyUI started in background")
-    print("📋 Check logs: tail -f /tmp/comfy.log")
+        result = subprocess.run([path, "--version"], capture_output=True, timeout=10)
+        return result.returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        return False
 
 def setup_cloudflare():
     """Download and setup cloudflared"""
@@ -82,14 +51,23 @@ def setup_cloudflare():
     
     cloudflared_path = f"{WORK_DIR}/cloudflared"
     
+    if os.path.exists(cloudflared_path) and not verify_cloudflared(cloudflared_path):
+        print("⚠️ Existing cloudflared is broken - downloading again")
+        os.remove(cloudflared_path)
+    
     if not os.path.exists(cloudflared_path):
         print("⏳ Downloading cloudflared...")
         url = "https://github.com/cloudflare/cloudflared/releases/latest/download/cloudflared-linux-amd64"
         
         try:
-            urllib.request.urlretrieve(url, cloudflared_path)
+            # Download beside the target so an interrupted fetch never looks installed
+            urllib.request.urlretrieve(url, cloudflared_path + ".part")
             # Make executable
-            os.chmod(cloudflared_path, os.stat(cloudflared_path).st_mode | stat.S_IEXEC)
+            os.chmod(cloudflared_path + ".part",
+                     os.stat(cloudflared_path + ".part").st_mode | stat.S_IEXEC)
+            if not verify_cloudflared(cloudflared_path + ".part"):
+                raise RuntimeError("downloaded binary does not run")
+            os.replace(cloudflared_path + ".part", cloudflared_path)
             print("✅ cloudflared downloaded")
         except Exception as e:
             print(f"❌ Download failed: {e}")
@@ -99,14 +77,14 @@ def setup_cloudflare():
     
     return cloudflared_path
 
-def create_tunnel(cloudflared_path):
+def create_tunnel(cloudflared_path, port=COMFYUI_PORT):
     """Create Cloudflare tunnel"""
-    print(f"\n🌐 Creating Cloudflare tunnel to port {COMFYUI_PORT}...")
+    print(f"\n🌐 Creating Cloudflare tunnel to port {port}...")
     
     try:
         # Start cloudflared tunnel
         process = subprocess.Popen(
-            [cloudflared_path, "tunnel", "--url", f"http://localhost:{COMFYUI_PORT}"],
+            [cloudflared_path, "tunnel", "--url", f"http://localhost:{port}"],
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
             text=True,
@@ -115,8 +93,9 @@ def create_tunnel(cloudflared_path):
         
         # Wait for URL to appear in output
         url = None
+        log = open(CLOUDFLARED_LOG, "a")
         for line in process.stdout:
-            print(line.strip())
+            log.write(line)
             if "https://" in line and "trycloudflare.com" in line:
                 # Extract URL
                 url = line.split("https://")[1].split()[0]
@@ -124,18 +103,13 @@ def create_tunnel(cloudflared_path):
                 break
         
         if url:
-            print("\n" + "=" * 60)
-            print("✅ ComfyUI Ready!")
-            print("=" * 60)
-            print(f"\n🌐 URL: {url}")
-            print("\n" + "=" * 60)
-            print("\n💡 This URL is temporary and will change on restart")
-            print("💡 No authentication required!")
-            print("🛑 Press Ctrl+C to stop\n")
-            
+            # Keep draining output so cloudflared never blocks on a full pipe
+            threading.Thread(target=drain_output, args=(process, log), daemon=True).start()
+            print("✅ Cloudflare tunnel established")
             return process, url
         else:
-            print("❌ Failed to get tunnel URL from output")
+            log.close()
+            print(f"❌ Failed to get tunnel URL from output (see {CLOUDFLARED_LOG})")
             process.kill()
             return None, None
             
@@ -143,51 +117,85 @@ def create_tunnel(cloudflared_path):
         print(f"❌ Cloudflare tunnel creation failed: {e}")
         return None, None
 
+def drain_output(process, log):
+    """Copy the rest of a process's output into an open log file"""
+    with log:
+        for line in process.stdout:
+            log.write(line)
+            log.flush()
+
+def print_ready(url, elapsed):
+    print("\n" + "=" * 60)
+    print(f"✅ ComfyUI Ready! ({elapsed:.1f}s after launch)")
+    print("=" * 60)
+    print(f"\n🌐 URL: {url}")
+    print("\n" + "=" * 60)
+    print("\n💡 This URL is temporary and will change on restart")
+    print("💡 No authentication required!")
+    print("🛑 Press Ctrl+C to stop\n")
+
 def main():
     """Main launcher"""
     print("=" * 60)
     print("ComfyUI Launcher with Cloudflare Tunnel")
     print("(No authentication required!)")
     print("=" * 60)
-    
-    # Step 1: Start ComfyUI
-    start_comfyui()
-    
-    # Step 2: Setup Cloudflare
-    cloudflared_path = setup_cloudflare()
-    
-    # Step 3: Create tunnel
-    tunnel_process, url = create_tunnel(cloudflared_path)
+    started = time.monotonic()
+    
+    # Step 1: Start ComfyUI (model loading continues in the background)
+    comfy_process = spawn_comfyui(WORK_DIR, COMFYUI_PORT)
+    tunnel_port = COMFYUI_PORT
+    if LAZY_MODELS:
+        from prompt_proxy import start_proxy
+        tunnel_port = start_proxy(WORK_DIR, COMFYUI_PORT)
+    
+    # Step 2: Fetch cloudflared and open the tunnel while ComfyUI boots;
+    # cloudflared connects to the origin lazily, so it can come up first
+    pool = ThreadPoolExecutor(max_workers=1)
+    tunnel_future = pool.submit(lambda: create_tunnel(setup_cloudflare(), tunnel_port))
+    pool.shutdown(wait=False)
+    
+    # Step 3: Publish the URL once both sides are ready
+    try:
+        await_comfyui(comfy_process, COMFYUI_PORT)
+    except SystemExit:
+        tunnel_process, _ = tunnel_future.result()
+        if tunnel_process:
+            tunnel_process.kill()
+        raise
+    tunnel_process, url = tunnel_future.result()
     
     if not tunnel_process:
         print("\n❌ Failed to create tunnel")
         print(f"💡 ComfyUI is still running at: http://localhost:{COMFYUI_PORT}")
         sys.exit(1)
     
-    # Keep running until interrupted
-    def cleanup(signum, frame):
-        print("\n\n🛑 Shutting down...")
-        try:
-            tunnel_process.kill()
-            print("✅ Cloudflare tunnel closed")
-        except:
-            pass
-        
-        # Kill ComfyUI
-        subprocess.run(f"fuser -k {COMFYUI_PORT}/tcp 2>/dev/null || true", shell=True)
-        print("✅ ComfyUI stopped")
-        print("✅ Shutdown complete")
-        sys.exit(0)
+    print_ready(url, time.monotonic() - started)
     
-    signal.signal(signal.SIGINT, cleanup)
-    signal.signal(signal.SIGTERM, cleanup)
+    def restart_tunnel():
+        # A new quick tunnel gets a new URL, so publish it again
+        process, new_url = create_tunnel(f"{WORK_DIR}/cloudflared", tunnel_port)
+        if not process:
+            raise RuntimeError("no tunnel URL")
+        print(f"\n🌐 New URL: {new_url}\n")
+        return process
     
-    # Wait for tunnel process
-    try:
-        print("🔄 Running... (Ctrl+C to stop)")
-        tunnel_process.wait()
-    except KeyboardInterrupt:
-        cleanup(None, None)
+    # Keep running until interrupted, restarting ComfyUI or the tunnel if they die
+    supervisor = Supervisor()
+    supervisor.add(comfyui_service(WORK_DIR, COMFYUI_PORT, comfy_process))
+    supervisor.add(ManagedProcess("Cloudflare tunnel", start=restart_tunnel, process=tunnel_process))
+    
+    signal.signal(signal.SIGINT, lambda signum, frame: supervisor.shutdown())
+    signal.signal(signal.SIGTERM, lambda signum, frame: supervisor.shutdown())
+    
+    print("🔄 Running... (Ctrl+C to stop)")
+    exit_code = supervisor.run()
+    
+    print("\n\n🛑 Shutting down...")
+    print("✅ Cloudflare tunnel closed")
+    print("✅ ComfyUI stopped")
+    print("✅ Shutdown complete")
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
@@ -9,6 +9,9 @@ import subprocess
 import sys
 import time
 import signal
+from concurrent.futures import ThreadPoolExecutor
+from launcher_core import await_comfyui, spawn_comfyui
+from supervisor import ManagedProcess, Supervisor, comfyui_service
 
 # Try to load config from config.py
 try:
@@ -38,54 +41,8 @@ def detect_platform():
 
 # Detect platform
 WORK_DIR = detect_platform()
-
-def cleanup_port():
-    """Kill any process using port 8188"""
-    print(f"\n🧹 Cleaning up port {COMFYUI_PORT}...")
-    try:
-        subprocess.run(
-            f"fuser -k {COMFYUI_PORT}/tcp 2>/dev/null || true",
-            shell=True,
-            timeout=5
-        )
-        print(f"✅ Port {COMFYUI_PORT} is now free")
-    except Exception as e:
-        print(f"⚠️ Port cleanup: {e} (probably already free)")
-    
-    time.sleep(1)
-
-def start_comfyui():
-    """Start ComfyUI in background using nohup (Kaggle-proven method)"""
-    print("\n🚀 Starting ComfyUI...")
-    
-    comfyui_dir = f"{WORK_DIR}/ComfyUI"
-    if not os.path.exists(comfyui_dir):
-        print(f"❌ ComfyUI not found at {comfyui_dir}")
-        print(f"💡 Run the installer first: bash install_comfyui_auto.sh")
-        sys.exit(1)
-    
-    # Clean up any existing process
-    cleanup_port()
-    
-    # Start ComfyUI using bash with nohup (exactly as in working Kaggle code)
-    bash_cmd = f"""
-cd {comfyui_dir}
-nohup python main.py --listen 0.0.0.0 --port {COMFYUI_PORT} > /tmp/comfy.log 2>&1 &
-sleep 20
-tail -n 3 /tmp/comfy.log
-"""
-    
-    print(f"⏳ Launching ComfyUI (this will take ~20 seconds)...")
-    
-    result = subprocess.run(
-        bash_cmd,
-        shell=True,
-        executable='/bin/bash',
-        capture_output=False
-    )
-    
-    print("\n✅ ComfyUI started in background")
-    print("📋 Check logs: tail -f /tmp/comfy.log")
+# LAZY_MODELS=1: tunnel to prompt_proxy.py, which fetches missing models per prompt
+LAZY_MODELS = os.getenv("LAZY_MODELS", "0") == "1"
 
 def setup_ngrok():
     """Install pyngrok and configure authtoken"""
@@ -114,31 +71,16 @@ def setup_ngrok():
             print(f"⚠️ Authtoken config warning: {e}")
             print("💡 Continuing - will set via pyngrok API")
 
-def create_tunnel():
+def create_tunnel(port=COMFYUI_PORT):
     """Create ngrok tunnel (based on working Kaggle code)"""
-    print(f"\n🌐 Creating ngrok tunnel to port {COMFYUI_PORT}...")
+    print(f"\n🌐 Creating ngrok tunnel to port {port}...")
     
     try:
         from pyngrok import ngrok
         
         # Create tunnel with bind_tls=True for HTTPS
-        url = ngrok.connect(COMFYUI_PORT)
-        
-        print("\n" + "=" * 60)
-        print("✅ ComfyUI Ready!")
-        print("=" * 60)
-        print(f"\n🌐 URL: {url}")
-        print("\n" + "=" * 60)
-        print("\n💡 This URL is valid for 8 hours")
-        print("=" * 60)
-        print("\n📌 Ngrok Features:")
-        print("   • Works from anywhere in the world")
-        print("   • Free tier: 1 online ngrok process")
-        print("   • Free tier: 40 connections/minute")
-        print("   • Free tier: Random URL (changes on restart)")
-        print("   • Pro tier: Custom domains, reserved URLs")
-        print("\n🛑 Press Ctrl+C to stop\n")
-        
+        url = ngrok.connect(port)
+        print("✅ Ngrok tunnel established")
         return url
         
     except Exception as e:
@@ -149,52 +91,96 @@ def create_tunnel():
         print("   3. Verify port 8188 is accessible")
         return None
 
+def open_tunnel(port=COMFYUI_PORT):
+    """Install/configure ngrok, then create the tunnel"""
+    setup_ngrok()
+    return create_tunnel(port)
+
+def print_ready(url, elapsed):
+    print("\n" + "=" * 60)
+    print(f"✅ ComfyUI Ready! ({elapsed:.1f}s after launch)")
+    print("=" * 60)
+    print(f"\n🌐 URL: {url}")
+    print("\n" + "=" * 60)
+    print("\n💡 This URL is valid for 8 hours")
+    print("=" * 60)
+    print("\n📌 Ngrok Features:")
+    print("   • Works from anywhere in the world")
+    print("   • Free tier: 1 online ngrok process")
+    print("   • Free tier: 40 connections/minute")
+    print("   • Free tier: Random URL (changes on restart)")
+    print("   • Pro tier: Custom domains, reserved URLs")
+    print("\n🛑 Press Ctrl+C to stop\n")
+
 def main():
     """Main launcher"""
     print("=" * 60)
     print("ComfyUI Launcher with Ngrok Tunnel")
     print("=" * 60)
     
-    # Step 1: Start ComfyUI
-    start_comfyui()
+    started = time.monotonic()
     
-    # Step 2: Setup ngrok
-    setup_ngrok()
+    # Step 1: Start ComfyUI (model loading continues in the background)
+    comfy_process = spawn_comfyui(WORK_DIR, COMFYUI_PORT)
+    tunnel_port = COMFYUI_PORT
+    if LAZY_MODELS:
+        from prompt_proxy import start_proxy
+        tunnel_port = start_proxy(WORK_DIR, COMFYUI_PORT)
     
-    # Step 3: Create tunnel
-    url = create_tunnel()
+    # Step 2: Set up ngrok and open the tunnel while ComfyUI boots
+    pool = ThreadPoolExecutor(max_workers=1)
+    tunnel_future = pool.submit(open_tunnel, tunnel_port)
+    pool.shutdown(wait=False)
+    
+    # Step 3: Publish the URL once both sides are ready
+    try:
+        await_comfyui(comfy_process, COMFYUI_PORT)
+    except SystemExit:
+        if tunnel_future.result():
+            from pyngrok import ngrok
+            ngrok.kill()
+        raise
+    url = tunnel_future.result()
     
     if not url:
         print("\n❌ Failed to create tunnel")
         print(f"💡 ComfyUI is still running at: http://localhost:{COMFYUI_PORT}")
         sys.exit(1)
     
-    # Keep running until interrupted
-    def cleanup(signum, frame):
-        print("\n\n🛑 Shutting down...")
-        try:
-            from pyngrok import ngrok
-            ngrok.kill()
-            print("✅ Ngrok tunnel closed")
-        except:
-            pass
-        
-        # Kill ComfyUI
-        subprocess.run(f"fuser -k {COMFYUI_PORT}/tcp 2>/dev/null || true", shell=True)
-        print("✅ ComfyUI stopped")
-        print("✅ Shutdown complete")
-        sys.exit(0)
+    print_ready(url, time.monotonic() - started)
+    
+    from pyngrok import ngrok
+    
+    def restart_tunnel():
+        # Free-tier URLs change when the agent restarts, so publish it again
+        ngrok.kill()
+        new_url = create_tunnel(tunnel_port)
+        if not new_url:
+            raise RuntimeError("ngrok did not return a URL")
+        print(f"\n🌐 New URL: {new_url}\n")
+        return ngrok.get_ngrok_process().proc
+    
+    # Keep running until interrupted, restarting ComfyUI or ngrok if they die
+    supervisor = Supervisor()
+    supervisor.add(comfyui_service(WORK_DIR, COMFYUI_PORT, comfy_process))
+    supervisor.add(ManagedProcess("Ngrok tunnel", start=restart_tunnel,
+                                  process=ngrok.get_ngrok_process().proc))
+    
+    signal.signal(signal.SIGINT, lambda signum, frame: supervisor.shutdown())
+    signal.signal(signal.SIGTERM, lambda signum, frame: supervisor.shutdown())
     
-    signal.signal(signal.SIGINT, cleanup)
-    signal.signal(signal.SIGTERM, cleanup)
+    print("🔄 Running... (Ctrl+C to stop)")
+    exit_code = supervisor.run()
     
-    # Wait indefinitely
+    print("\n\n🛑 Shutting down...")
     try:
-        print("🔄 Running... (Ctrl+C to stop)")
-        while True:
-            time.sleep(60)
-    except KeyboardInterrupt:
-        cleanup(None, None)
+        ngrok.kill()
+    except Exception:
+        pass
+    print("✅ Ngrok tunnel closed")
+    print("✅ ComfyUI stopped")
+    print("✅ Shutdown complete")
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+ComfyUI Launcher Core
+Shared startup for the tunnel launchers: runs ComfyUI as a managed subprocess
+and waits on its HTTP endpoint instead of sleeping a fixed time.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional
+
+COMFY_LOG = "/tmp/comfy.log"
+READY_PATH = "/system_stats"
+READY_TIMEOUT = float(os.getenv("COMFYUI_READY_TIMEOUT", "300"))
+
+# Readiness polling: first retry after POLL_INITIAL seconds, doubling up to POLL_MAX
+POLL_INITIAL = 0.25
+POLL_MAX = 1.0
+
+# Multi-GPU fan-out: worker N listens on WORKER_BASE_PORT + N behind the front port
+WORKER_BASE_PORT = int(os.getenv("COMFYUI_WORKER_PORT", "8190"))
+WORKER_LOG = "/tmp/comfy-gpu{index}.log"
+
+
+def cleanup_port(port: int):
+    """Kill any process using the ComfyUI port"""
+    print(f"\n🧹 Cleaning up port {port}...")
+    try:
+        subprocess.run(
+            f"fuser -k {port}/tcp 2>/dev/null || true",
+            shell=True,
+            timeout=5
+        )
+        print(f"✅ Port {port} is now free")
+    except Exception as e:
+        print(f"⚠️ Port cleanup: {e} (probably already free)")
+
+
+def tail_log(path: str = COMFY_LOG, lines: int = 3) -> str:
+    """Last lines of a log file ('' if it does not exist)"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 64 * 1024))
+            return b"\n".join(f.read().splitlines()[-lines:]).decode("utf-8", "replace")
+    except OSError:
+        return ""
+
+
+def is_ready(port: int, host: str = "127.0.0.1", path: str = READY_PATH,
+             timeout: float = 2.0) -> bool:
+    """True if ComfyUI answers its readiness endpoint with HTTP 200"""
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}{path}", timeout=timeout) as response:
+            return response.status == 200
+    except (urllib.error.URLError, OSError, ValueError):
+        return False
+
+
+def wait_until_ready(port: int,
+                     process: Optional[subprocess.Popen] = None,
+                     host: str = "127.0.0.1",
+                     path: str = READY_PATH,
+                     timeout: float = READY_TIMEOUT,
+                     log_path: str = COMFY_LOG) -> float:
+    """
+    Poll the readiness endpoint with exponential backoff
+
+    Args:
+        port: ComfyUI port
+        process: ComfyUI process; if it exits while waiting, fail immediately
+        host: Host to probe
+        path: Endpoint that answers once ComfyUI is serving
+        timeout: Seconds before giving up
+        log_path: Log quoted in error messages
+
+    Returns:
+        Seconds until the endpoint answered
+
+    Raises:
+        RuntimeError: The process exited before becoming ready
+        TimeoutError: No answer within timeout
+    """
+    start = time.monotonic()
+    delay = POLL_INITIAL
+    while True:
+        if is_ready(port, host, path):
+            return time.monotonic() - start
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"ComfyUI exited with code {process.returncode}:\n"
+                               f"{tail_log(log_path, 10)}")
+        elapsed = time.monotonic() - start
+        if elapsed >= timeout:
+            raise TimeoutError(f"ComfyUI did not answer {path} within {timeout:.0f}s")
+        time.sleep(min(delay, timeout - elapsed))
+        delay = min(delay * 2, POLL_MAX)
+
+
+def start_comfyui(comfyui_dir: str, port: int, log_path: str = COMFY_LOG,
+                  extra_args: Optional[List[str]] = None,
+                  env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    """
+    Start ComfyUI as a background subprocess logging to log_path
+
+    The process gets its own session, so it keeps running like the old
+    nohup launch but can still be signalled through the returned handle.
+    env entries (e.g. CUDA_VISIBLE_DEVICES) are added to the inherited environment.
+    """
+    cmd = [sys.executable, "main.py", "--listen", "0.0.0.0", "--port", str(port)]
+    cmd += extra_args or []
+    with open(log_path, "ab") as log:
+        return subprocess.Popen(cmd, cwd=comfyui_dir, stdout=log, stderr=subprocess.STDOUT,
+                                stdin=subprocess.DEVNULL, start_new_session=True,
+                                env=dict(os.environ, **(env or {})))
+
+
+def start_workers(comfyui_dir: str, gpus: List[Dict], base_port: int = WORKER_BASE_PORT,
+                  extra_args: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Start one ComfyUI per GPU, each pinned to its device with CUDA_VISIBLE_DEVICES
+
+    Args:
+        comfyui_dir: ComfyUI installation shared by all workers
+        gpus: Devices from comfy_utils.detect_gpus()
+        base_port: Port of the first worker; the others follow consecutively
+        extra_args: Additional ComfyUI arguments for every worker
+
+    Returns:
+        One dict per worker: gpu, port, log and process
+    """
+    workers = []
+    for offset, gpu in enumerate(gpus):
+        port = base_port + offset
+        log_path = WORKER_LOG.format(index=gpu["index"])
+        cleanup_port(port)
+        process = start_comfyui(comfyui_dir, port, log_path, extra_args,
+                                env={"CUDA_VISIBLE_DEVICES": str(gpu["index"])})
+        print(f"🚀 Worker GPU {gpu['index']} ({gpu['name']}) on port {port} (PID {process.pid})")
+        workers.append({"gpu": gpu, "port": port, "log": log_path, "process": process})
+    return workers
+
+
+def await_workers(workers: List[Dict], timeout: float = READY_TIMEOUT) -> List[Dict]:
+    """
+    Wait for started workers; the ones that crash or time out are dropped
+
+    Returns:
+        The workers that are serving requests
+    """
+    ready = []
+    for worker in workers:
+        try:
+            elapsed = wait_until_ready(worker["port"], worker["process"], timeout=timeout,
+                                       log_path=worker["log"])
+        except (RuntimeError, TimeoutError) as e:
+            print(f"⚠️ Worker GPU {worker['gpu']['index']} failed: {e}")
+            print(f"📋 Check logs: tail -f {worker['log']}")
+            if worker["process"].poll() is None:
+                worker["process"].terminate()
+            continue
+        print(f"✅ Worker GPU {worker['gpu']['index']} ready on port {worker['port']} in {elapsed:.1f}s")
+        ready.append(worker)
+    return ready
+
+
+def spawn_comfyui(work_dir: str, port: int, log_path: str = COMFY_LOG) -> subprocess.Popen:
+    """
+    Free the port and start ComfyUI without waiting for it
+
+    Exits the launcher if ComfyUI is not installed.
+
+    Returns:
+        The starting ComfyUI process (see await_comfyui)
+    """
+    print("\n🚀 Starting ComfyUI...")
+
+    comfyui_dir = f"{work_dir}/ComfyUI"
+    if not os.path.exists(comfyui_dir):
+        print(f"❌ ComfyUI not found at {comfyui_dir}")
+        print("💡 Run the installer first: bash install_comfyui_auto.sh")
+        sys.exit(1)
+
+    cleanup_port(port)
+    process = start_comfyui(comfyui_dir, port, log_path)
+    print(f"⏳ Waiting for ComfyUI on port {port} (PID {process.pid})...")
+    return process
+
+
+def await_comfyui(process: subprocess.Popen, port: int, log_path: str = COMFY_LOG,
+                  timeout: float = READY_TIMEOUT) -> float:
+    """
+    Block until a spawned ComfyUI serves requests
+
+    Exits the launcher if ComfyUI crashes or never becomes ready.
+
+    Returns:
+        Seconds the readiness wait took
+    """
+    try:
+        elapsed = wait_until_ready(port, process, timeout=timeout, log_path=log_path)
+    except (RuntimeError, TimeoutError) as e:
+        print(f"❌ {e}")
+        print(f"📋 Check logs: tail -f {log_path}")
+        if process.poll() is None:
+            process.terminate()
+        sys.exit(1)
+
+    print(tail_log(log_path))
+    print(f"\n✅ ComfyUI ready in {elapsed:.1f}s")
+    print(f"📋 Check logs: tail -f {log_path}")
+    return elapsed
+
+
+def launch_comfyui(work_dir: str, port: int, log_path: str = COMFY_LOG,
+                   timeout: float = READY_TIMEOUT) -> subprocess.Popen:
+    """
+    Free the port, start ComfyUI and block until it serves requests
+
+    Returns:
+        The running ComfyUI process
+    """
+    process = spawn_comfyui(work_dir, port, log_path)
+    await_comfyui(process, port, log_path, timeout)
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wait for a ComfyUI server to become ready")
+    parser.add_argument("--port", type=int, default=int(os.getenv("COMFYUI_PORT", "8188")))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--timeout", type=float, default=READY_TIMEOUT)
+    args = parser.parse_args()
+
+    try:
+        elapsed = wait_until_ready(args.port, host=args.host, timeout=args.timeout)
+    except TimeoutError as e:
+        print(f"⚠️ {e}")
+        sys.exit(1)
+    print(f"✅ ComfyUI ready on port {args.port} after {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Manifest Lockfile
+Resolves CivitAI entries in models_manifest.json to pinned version IDs, exact
+file sizes and SHA-256s, recorded in models_manifest.lock.json for the downloader.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from civitai_api import RESOLVE_WORKERS, CivitAIAPI
+from comfy_utils import format_bytes
+from model_cache import manifest_sha
+
+LOCK_VERSION = 1
+
+# https://civitai.com/api/download/models/<version id>[?type=..&format=..]
+CIVITAI_DOWNLOAD_RE = re.compile(r"/api/download/models/(\d+)")
+
+
+def lockfile_path(manifest_path: str) -> str:
+    """configs/models_manifest.json -> configs/models_manifest.lock.json"""
+    return os.path.splitext(manifest_path)[0] + ".lock.json"
+
+
+def civitai_version_id(url: str) -> Optional[int]:
+    """Model version ID of a civitai.com download URL, or None for other URLs"""
+    parsed = urlparse(url)
+    if not parsed.netloc.endswith("civitai.com"):
+        return None
+    match = CIVITAI_DOWNLOAD_RE.search(parsed.path)
+    if match:
+        return int(match.group(1))
+    version = parse_qs(parsed.query).get("modelVersionId")
+    return int(version[0]) if version else None
+
+
+def load_lock(path: str) -> Dict:
+    """
+    Read a lockfile
+
+    Returns:
+        Dict of lock entries keyed by manifest source URL (empty if missing or unreadable)
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (ValueError, OSError):
+        return {}
+    if data.get("version") != LOCK_VERSION:
+        return {}
+    return data.get("entries", {})
+
+
+def save_lock(path: str, entries: Dict):
+    data = {
+        "version": LOCK_VERSION,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "entries": dict(sorted(entries.items())),
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def resolve_manifest(manifest: Dict, api: CivitAIAPI, entries: Optional[Dict] = None,
+                     refresh: bool = False, workers: int = RESOLVE_WORKERS) -> Dict:
+    """
+    Pin every CivitAI entry of a manifest (all modes) in the lock entries
+
+    Entries already locked for the same URL are kept unless refresh is set,
+    so only new or changed manifest URLs cost an API call.
+
+    Args:
+        manifest: Parsed models_manifest.json
+        api: CivitAIAPI client (its pooled session and 429 backoff are shared)
+        entries: Existing lock entries, updated in place
+        refresh: Re-resolve entries that are already locked
+        workers: Concurrent version lookups
+
+    Returns:
+        Dict with resolved, kept and failed counts
+    """
+    entries = {} if entries is None else entries
+    wanted = {}
+    for models in manifest.values():
+        for name, meta in models.items():
+            url = meta.get("url", "")
+            version_id = civitai_version_id(url)
+            if version_id is None or url in wanted:
+                continue
+            if url in entries and not refresh:
+                continue
+            wanted[url] = (name, version_id, meta)
+
+    def resolve(item):
+        url, (name, version_id, meta) = item
+        query = parse_qs(urlparse(url).query)
+        try:
+            info = api.version_info(api.get_model_version(version_id),
+                                    file_type=query.get("type", [None])[0],
+                                    file_format=query.get("format", [None])[0])
+        except (requests.RequestException, ValueError) as e:
+            return url, name, meta, None, str(e)
+        if not info["sha256"] or not info["size_bytes"]:
+            return url, name, meta, None, "API returned no file hash/size"
+        return url, name, meta, info, None
+
+    counts = {"resolved": 0, "kept": 0 if refresh else len(entries), "failed": 0}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(wanted) or 1))) as pool:
+        for url, name, meta, info, error in pool.map(resolve, wanted.items()):
+            if error:
+                print(f"[ERROR] {name}: could not resolve CivitAI version ({error})")
+                counts["failed"] += 1
+                continue
+
+            pinned = manifest_sha(meta)
+            if pinned and pinned != info["sha256"]:
+                print(f"[WARN] {name}: manifest sha256 differs from CivitAI ({info['sha256']})")
+            if info["size_bytes"] < meta.get("min_size", 0):
+                print(f"[WARN] {name}: file is {format_bytes(info['size_bytes'])}, "
+                      f"below manifest min_size {format_bytes(meta['min_size'])}")
+
+            entries[url] = {
+                "name": name,
+                "model_id": info["model_id"],
+                "version_id": info["version_id"],
+                "file_name": info["file_name"],
+                "size": info["size_bytes"],
+                "sha256": info["sha256"],
+                "resolved_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
+            counts["resolved"] += 1
+            print(f"[LOCK] {name} -> version {info['version_id']} "
+                  f"({format_bytes(info['size_bytes'])}, sha256 {info['sha256'][:12]}...)")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pin CivitAI manifest entries in a lockfile")
+    parser.add_argument("--manifest", default=os.getenv("MANIFEST", "configs/models_manifest.json"),
+                        help="Path to models_manifest.json")
+    parser.add_argument("--lockfile", default=None,
+                        help="Lockfile to update (default: <manifest>.lock.json)")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Re-resolve entries that are already locked")
+    parser.add_argument("--workers", type=int, default=RESOLVE_WORKERS,
+                        help=f"Concurrent API lookups (default: {RESOLVE_WORKERS})")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.manifest):
+        print(f"ERROR: Manifest file not found: {args.manifest}")
+        sys.exit(1)
+
+    with open(args.manifest, "r") as f:
+        manifest = json.load(f)
+
+    lock_path = args.lockfile or lockfile_path(args.manifest)
+    entries = load_lock(lock_path)
+
+    # Drop entries whose URL is no longer in the manifest
+    urls = {meta.get("url") for models in manifest.values() for meta in models.values()}
+    for url in [u for u in entries if u not in urls]:
+        del entries[url]
+
+    counts = resolve_manifest(manifest, CivitAIAPI(), entries, refresh=args.refresh,
+                              workers=args.workers)
+    save_lock(lock_path, entries)
+    print(f"✅ Lockfile {lock_path}: {counts['resolved']} resolved, "
+          f"{counts['kept']} already locked, {counts['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
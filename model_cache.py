@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Model Cache Utilities
+Content-addressed blob store and persistent SHA-256 index for
+$WORK_DIR/model-cache, so each model's bytes are stored once and verified
+files are trusted on later runs without being re-hashed.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from comfy_utils import format_bytes
+
+HASH_INDEX_FILE = ".hash_index.json"
+STORE_INDEX_FILE = "store.json"
+EVICTION_REPORT_FILE = ".eviction.json"
+BLOB_DIR = os.path.join("blobs", "sha256")
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def sha256_file(path: str) -> str:
+    """Hash a file with large sequential reads"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(HASH_CHUNK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_size(value: str) -> int:
+    """Parse a byte budget such as '150G', '500M' or '2000000000'"""
+    value = value.strip().upper().rstrip("B")
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def manifest_sha(meta: Dict) -> Optional[str]:
+    """Return the manifest's sha256 for an entry, or None if it is 'IGNORE'/missing"""
+    sha = (meta.get("sha256") or "").strip().lower()
+    return None if sha in ("", "ignore") else sha
+
+
+class HashIndex:
+    """
+    SHA-256 results keyed by (path, size, mtime)
+
+    An entry is only trusted while the file's size and mtime still match
+    what was recorded, so any rewrite of the file invalidates it.
+    """
+
+    def __init__(self, cache_root: str):
+        self.cache_root = cache_root
+        self.path = os.path.join(cache_root, HASH_INDEX_FILE)
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    self._entries = json.load(f)
+            except (ValueError, OSError):
+                self._entries = {}
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.realpath(path)
+
+    def get(self, path: str) -> Optional[str]:
+        """Return the recorded hash if the file is unchanged since it was hashed"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(self._key(path))
+        if entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime_ns:
+            return entry["sha256"]
+        return None
+
+    def put(self, path: str, sha256: str):
+        """Record a hash for the file's current size and mtime, then save"""
+        st = os.stat(path)
+        with self._lock:
+            self._entries[self._key(path)] = {
+                "size": st.st_size,
+                "mtime": st.st_mtime_ns,
+                "sha256": sha256,
+            }
+        self.save()
+
+    def hash(self, path: str) -> str:
+        """Return the file's hash, computing and recording it only if not indexed"""
+        sha = self.get(path)
+        if sha is None:
+            sha = sha256_file(path)
+            self.put(path, sha)
+        return sha
+
+    def prune(self):
+        """Drop entries for files that no longer exist"""
+        with self._lock:
+            self._entries = {k: v for k, v in self._entries.items() if os.path.exists(k)}
+        self.save()
+
+    def save(self):
+        with self._lock:
+            os.makedirs(self.cache_root, exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self._entries, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+
+
+class BlobStore:
+    """
+    Content-addressed model store under the cache root
+
+    Model bytes live once at blobs/sha256/<hex>; store.json maps manifest
+    names and source URLs to blob hashes, so renamed or aliased manifest
+    entries resolve to the same blob instead of being downloaded again.
+    It also records when each blob was last used, for LRU eviction.
+    """
+
+    def __init__(self, cache_root: str):
+        self.cache_root = cache_root
+        self.blob_root = os.path.join(cache_root, BLOB_DIR)
+        self.path = os.path.join(cache_root, STORE_INDEX_FILE)
+        self._lock = threading.Lock()
+        self.names = {}
+        self.urls = {}
+        self.last_used = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+                self.names = data.get("names", {})
+                self.urls = data.get("urls", {})
+                self.last_used = data.get("last_used", {})
+            except (ValueError, OSError):
+                pass
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.blob_root, sha256)
+
+    def has(self, sha256: Optional[str]) -> bool:
+        return bool(sha256) and os.path.isfile(self.blob_path(sha256))
+
+    def lookup(self, name: str, url: Optional[str] = None, sha256: Optional[str] = None) -> Optional[str]:
+        """
+        Find a stored blob for a manifest entry
+
+        A known sha256 wins; otherwise the entry's name, then its source URL
+        is resolved. A name/URL hit that contradicts a known sha256 is ignored.
+
+        Returns:
+            Blob hash, or None if the entry must be downloaded
+        """
+        if sha256:
+            return sha256 if self.has(sha256) else None
+        with self._lock:
+            candidates = [self.names.get(name), self.urls.get(url) if url else None]
+        for sha in candidates:
+            if self.has(sha):
+                return sha
+        return None
+
+    def add(self, path: str, sha256: str, name: str, url: Optional[str] = None) -> str:
+        """
+        Move a verified file into the store (dropping it if the blob exists)
+
+        Returns:
+            Path of the blob
+        """
+        blob = self.blob_path(sha256)
+        os.makedirs(self.blob_root, exist_ok=True)
+        if os.path.isfile(blob):
+            if os.path.realpath(path) != os.path.realpath(blob):
+                os.remove(path)
+        else:
+            os.replace(path, blob)
+        self.record(sha256, name, url)
+        return blob
+
+    def record(self, sha256: str, name: str, url: Optional[str] = None):
+        """Point a manifest name (and source URL) at a blob and mark it used"""
+        with self._lock:
+            self.names[name] = sha256
+            if url:
+                self.urls[url] = sha256
+            self.last_used[sha256] = time.time()
+        self.save()
+
+    def forget(self, name: str):
+        """Drop a name mapping; the blob stays until gc()"""
+        with self._lock:
+            self.names.pop(name, None)
+        self.save()
+
+    def gc(self) -> int:
+        """
+        Delete blobs no longer referenced by any name
+
+        Returns:
+            Bytes reclaimed
+        """
+        if not os.path.isdir(self.blob_root):
+            return 0
+        with self._lock:
+            referenced = set(self.names.values())
+        freed = 0
+        for sha in os.listdir(self.blob_root):
+            if sha not in referenced:
+                freed += self._remove_blob(sha)
+        self.save()
+        return freed
+
+    def usage(self) -> int:
+        """Total bytes held in blobs"""
+        if not os.path.isdir(self.blob_root):
+            return 0
+        return sum(os.path.getsize(self.blob_path(sha)) for sha in os.listdir(self.blob_root))
+
+    def evict(self, budget: int, keep: Iterable[str], incoming: int = 0) -> Tuple[int, List[str]]:
+        """
+        Evict least-recently-used blobs until usage + incoming fits the budget
+
+        Args:
+            budget: Byte budget for the store
+            keep: Manifest names that must not be evicted (current mode's set)
+            incoming: Bytes about to be downloaded
+
+        Returns:
+            (bytes reclaimed, evicted manifest names)
+        """
+        with self._lock:
+            protected = {self.names[n] for n in keep if n in self.names}
+        candidates = [sha for sha in (os.listdir(self.blob_root) if os.path.isdir(self.blob_root) else [])
+                      if sha not in protected]
+        candidates.sort(key=lambda sha: self.last_used.get(sha, 0))
+
+        usage = self.usage()
+        freed, evicted = 0, []
+        for sha in candidates:
+            if usage + incoming - freed <= budget:
+                break
+            with self._lock:
+                names = [n for n, s in self.names.items() if s == sha]
+                for n in names:
+                    del self.names[n]
+            size = self._remove_blob(sha)
+            freed += size
+            evicted.extend(names)
+            print(f"[EVICT] {', '.join(names) or sha[:12]} ({format_bytes(size)})")
+        self.save()
+        self._prune_links()
+        return freed, evicted
+
+    def _remove_blob(self, sha: str) -> int:
+        blob = self.blob_path(sha)
+        size = os.path.getsize(blob) if os.path.exists(blob) else 0
+        if os.path.exists(blob):
+            os.remove(blob)
+        with self._lock:
+            self.urls = {u: s for u, s in self.urls.items() if s != sha}
+            self.last_used.pop(sha, None)
+        return size
+
+    def _prune_links(self):
+        """Remove view links in the cache left dangling by evicted blobs"""
+        for root, dirs, files in os.walk(self.cache_root):
+            dirs[:] = [d for d in dirs if d != "blobs"]
+            for f in files:
+                path = os.path.join(root, f)
+                if os.path.islink(path) and not os.path.exists(path):
+                    os.remove(path)
+
+    def save(self):
+        with self._lock:
+            os.makedirs(self.cache_root, exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({"names": self.names, "urls": self.urls, "last_used": self.last_used},
+                          f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+
+
+def verify_cache(manifest: Dict, cache_root: str, index: Optional[HashIndex] = None) -> Dict[str, int]:
+    """
+    Check cached files against manifest hashes, deleting mismatches
+
+    Store entries are addressed by their hash and never re-read; legacy flat
+    files already in the index are trusted without being re-read. Entries
+    whose manifest sha256 is 'IGNORE' are skipped.
+
+    Returns:
+        Counts dict with 'verified', 'removed' and 'unchecked'
+    """
+    index = index or HashIndex(cache_root)
+    store = BlobStore(cache_root)
+    counts = {"verified": 0, "removed": 0, "unchecked": 0}
+
+    for models in manifest.values():
+        for name, meta in models.items():
+            expected = manifest_sha(meta)
+            stored = store.names.get(name)
+            cache_file = os.path.join(cache_root, name)
+            if stored:
+                if expected is None:
+                    counts["unchecked"] += 1
+                elif stored == expected:
+                    counts["verified"] += 1
+                else:
+                    print(f"[CACHE] Stale (hash) - unlinking {name}")
+                    store.forget(name)
+                    counts["removed"] += 1
+                continue
+            if not os.path.isfile(cache_file):
+                continue
+            if expected is None:
+                counts["unchecked"] += 1
+                continue
+            if index.hash(cache_file) == expected:
+                counts["verified"] += 1
+            else:
+                print(f"[CACHE] Corrupt (hash) - deleting {name}")
+                os.remove(cache_file)
+                counts["removed"] += 1
+
+    store.gc()
+    index.prune()
+    return counts
+
+
+def backfill_manifest(manifest: Dict, cache_root: str, index: Optional[HashIndex] = None) -> int:
+    """
+    Fill 'IGNORE' sha256 fields from the blob store and hash index
+
+    Returns:
+        Number of manifest entries updated
+    """
+    index = index or HashIndex(cache_root)
+    store = BlobStore(cache_root)
+    updated = 0
+    for models in manifest.values():
+        for name, meta in models.items():
+            if manifest_sha(meta) is not None:
+                continue
+            sha = store.names.get(name) or index.get(os.path.join(cache_root, name))
+            if sha:
+                meta["sha256"] = sha
+                updated += 1
+                print(f"[HASH] {name}: {sha}")
+    return updated
+
+
+def write_eviction_report(cache_root: str, freed: int, evicted: List[str]):
+    """Persist the last eviction result for the installer's health check"""
+    os.makedirs(cache_root, exist_ok=True)
+    with open(os.path.join(cache_root, EVICTION_REPORT_FILE), "w") as f:
+        json.dump({"reclaimed_bytes": freed, "evicted": evicted, "time": time.time()}, f)
+
+
+def read_eviction_report(cache_root: str) -> Dict:
+    try:
+        with open(os.path.join(cache_root, EVICTION_REPORT_FILE), "r") as f:
+            return json.load(f)
+    except (ValueError, OSError):
+        return {"reclaimed_bytes": 0, "evicted": []}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model cache tools")
+    parser.add_argument("command", choices=["verify", "backfill-hashes", "reclaimed"],
+                        help="verify: check cached files against manifest hashes; "
+                             "backfill-hashes: write indexed hashes into the manifest; "
+                             "reclaimed: print bytes freed by the last eviction")
+    parser.add_argument("--manifest", default=os.getenv("MANIFEST", "configs/models_manifest.json"),
+                        help="Path to models_manifest.json")
+    parser.add_argument("--cache-root", default=None,
+                        help="Model cache directory (default: $WORK_DIR/model-cache)")
+    args = parser.parse_args()
+
+    cache_root = args.cache_root or f"{os.getenv('WORK_DIR', '/content')}/model-cache"
+
+    if args.command == "reclaimed":
+        print(format_bytes(read_eviction_report(cache_root)["reclaimed_bytes"]))
+        return
+
+    if not os.path.exists(args.manifest):
+        print(f"ERROR: Manifest file not found: {args.manifest}")
+        sys.exit(1)
+
+    with open(args.manifest, "r") as f:
+        manifest = json.load(f)
+
+    if args.command == "verify":
+        counts = verify_cache(manifest, cache_root)
+        print(f"✅ Hash check: {counts['verified']} verified, {counts['removed']} removed, "
+              f"{counts['unchecked']} without manifest hash")
+    else:
+        updated = backfill_manifest(manifest, cache_root)
+        if updated:
+            with open(args.manifest, "w") as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+        print(f"✅ Back-filled {updated} sha256 value(s) into {args.manifest}")
+
+
+if __name__ == "__main__":
+    main()
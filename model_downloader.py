@@ -0,0 +1,993 @@
+#!/usr/bin/env python3
+"""
+Concurrent Model Downloader
+Downloads models_manifest.json entries through a bounded thread pool with
+per-host concurrency limits and a single aggregate progress line.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from comfy_utils import format_bytes
+from install_profile import record
+from install_state import InstallState, digest, files_digest, skipped
+from manifest_lock import load_lock, lockfile_path
+from model_cache import (BlobStore, HashIndex, manifest_sha, parse_size, sha256_file,
+                         write_eviction_report)
+
+# Manifest category -> ComfyUI model directory (relative to models root)
+CATEGORY_DIRS = {
+    "checkpoints": "models/checkpoints",
+    "vae": "models/vae",
+    "controlnet": "models/controlnet",
+    "ipadapter": "models/ipadapter",
+    "loras": "models/loras",
+    "loras_style": "models/loras",  # Style LoRAs go to main loras folder
+    "loras_nsfw": "models/loras",   # NSFW LoRAs go to main loras folder
+    "upscale_models": "models/upscale_models",
+    "insightface": "models/insightface/models",
+    "animatediff": "models/animatediff",
+    "checkpoints_sd15": "models/checkpoints",  # SD1.5 checkpoints go to main checkpoints
+    "video": "models/checkpoints"  # Video models (SVD) go to checkpoints
+}
+
+# Max simultaneous downloads per host (HuggingFace CDN copes with more
+# parallel streams than CivitAI, which throttles aggressively)
+HOST_LIMITS = {
+    "huggingface.co": 4,
+    "civitai.com": 2,
+    "github.com": 2,
+}
+DEFAULT_HOST_LIMIT = 2
+DEFAULT_WORKERS = 6
+
+# Files whose manifest min_size is at least this are fetched as parallel
+# HTTP Range segments, each on its own connection
+SEGMENT_THRESHOLD = 1000000000
+DEFAULT_SEGMENTS = 8
+MIN_SEGMENT_SIZE = 64 * 1024 * 1024
+SEGMENT_RETRIES = 3
+
+# How often the .part journal is flushed while bytes are arriving
+JOURNAL_FLUSH_SECONDS = 2.0
+
+# Max bytes re-read from disk per hashing catch-up, so a resumed prefix is
+# hashed incrementally instead of stalling one segment for a whole pass
+HASH_CATCH_UP_BYTES = 64 * 1024 * 1024
+
+CHUNK_SIZE = 1024 * 1024
+REQUEST_TIMEOUT = (15, 60)  # (connect, read) seconds
+
+
+class RangeIgnored(requests.RequestException):
+    """A Range request was answered with the whole file instead of 206"""
+
+
+def build_jobs(manifest: Dict,
+               install_mode: str,
+               cache_root: str,
+               models_root: str = ".",
+               hf_token: str = "",
+               civitai_token: str = "",
+               lock: Optional[Dict] = None) -> List[Dict]:
+    """
+    Turn manifest entries for the given install mode into download jobs
+
+    Args:
+        manifest: Parsed models_manifest.json
+        install_mode: 'lite' or 'full'
+        cache_root: Model cache directory (downloads are staged here as
+            <name>, and a <folder>/<name> view is kept for extra_model_paths.yaml)
+        models_root: Directory containing the ComfyUI 'models' tree
+        hf_token: HuggingFace token for entries with auth 'hf'
+        civitai_token: CivitAI token appended to civitai.com URLs
+        lock: Lockfile entries by URL (see manifest_lock.py); locked entries
+            get an exact 'size' and, unless the manifest pins one, the locked sha256
+
+    Returns:
+        List of job dicts, one per file name ('entry' is the manifest name);
+        entries outside the mode are returned with skip=True
+    """
+    jobs = []
+    for category, models in manifest.items():
+        model_dir = CATEGORY_DIRS.get(category, f"models/{category}")
+        target_dir = os.path.join(models_root, model_dir)
+        view_dir = os.path.join(cache_root, os.path.relpath(model_dir, "models"))
+
+        for name, meta in models.items():
+            url = meta["url"]
+            headers = {}
+            if meta.get("auth", "none") == "hf" and hf_token:
+                headers["Authorization"] = f"Bearer {hf_token}"
+            elif "civitai.com" in url and civitai_token:
+                # CivitAI requires token in URL parameter, not header
+                url = f"{url}{'&' if '?' in url else '?'}token={civitai_token}"
+            locked = (lock or {}).get(meta["url"], {})
+
+            # Aliases are extra file names workflows load the same model by;
+            # they share the source URL, so the file is downloaded once
+            for file_name in [name] + meta.get("aliases", []):
+                jobs.append({
+                    "category": category,
+                    "name": file_name,
+                    "entry": name,
+                    "url": url,
+                    "source_url": meta["url"],
+                    "host": urlparse(meta["url"]).netloc,
+                    "headers": headers,
+                    "min_size": meta.get("min_size", 1000000),
+                    "size": locked.get("size"),
+                    "sha256": manifest_sha(meta) or locked.get("sha256"),
+                    "cache_file": os.path.join(cache_root, file_name),
+                    "target_file": os.path.join(target_dir, file_name),
+                    "view_file": os.path.join(view_dir, file_name),
+                    "skip": install_mode not in meta.get("modes", []),
+                })
+    return jobs
+
+
+def link_model(cache_file: str, target_file: str):
+    """Expose a cached file at target_file (symlink, then hardlink, then copy)"""
+    os.makedirs(os.path.dirname(target_file), exist_ok=True)
+    source = os.path.abspath(cache_file)
+    if os.path.islink(target_file):
+        if os.readlink(target_file) == source:
+            return
+        os.remove(target_file)  # Stale or dangling link from a replaced/evicted blob
+    elif os.path.exists(target_file):
+        if os.path.samefile(target_file, source):
+            return
+        os.remove(target_file)
+    try:
+        os.symlink(source, target_file)
+    except OSError:
+        try:
+            os.link(source, target_file)
+        except OSError:
+            shutil.copy2(source, target_file)
+
+
+def enforce_cache_budget(jobs: List[Dict], store: BlobStore, budget: int) -> int:
+    """
+    Evict least-recently-used models outside the current mode before downloading
+
+    Models needed by the current install mode are never evicted; the bytes
+    still to be downloaded for it are reserved up front so installs do not
+    fail partway through on a full volume.
+
+    Returns:
+        Bytes reclaimed
+    """
+    wanted = [job for job in jobs if not job["skip"]]
+    missing = {job["source_url"]: job["size"] or job["min_size"] for job in wanted
+               if not store.lookup(job["name"], job["source_url"], job["sha256"])}
+    incoming = sum(missing.values())
+    freed, evicted = store.evict(budget, [job["name"] for job in wanted], incoming)
+
+    # Drop ComfyUI links that pointed at evicted blobs
+    evicted_names = set(evicted)
+    for job in jobs:
+        target = job["target_file"]
+        if job["name"] in evicted_names and os.path.islink(target) and not os.path.exists(target):
+            os.remove(target)
+
+    write_eviction_report(store.cache_root, freed, evicted)
+    print(f"[CACHE] Budget {format_bytes(budget)}: {format_bytes(store.usage())} used, "
+          f"{format_bytes(incoming)} to download, {format_bytes(freed)} reclaimed "
+          f"({len(evicted)} model(s) evicted)")
+    return freed
+
+
+class HostLimiter:
+    """Per-host semaphores so one slow host cannot occupy every worker"""
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None, default: int = DEFAULT_HOST_LIMIT):
+        self.limits = dict(HOST_LIMITS if limits is None else limits)
+        self.default = default
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def limit_for(self, host: str) -> int:
+        for suffix, limit in self.limits.items():
+            if host == suffix or host.endswith("." + suffix):
+                return limit
+        return self.default
+
+    def get(self, host: str) -> threading.Semaphore:
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.limit_for(host))
+            return self._semaphores[host]
+
+
+class SessionPool:
+    """One pooled requests.Session per host, sized to that host's limit"""
+
+    def __init__(self, limiter: HostLimiter, connections_per_download: int = 1):
+        self.limiter = limiter
+        self.connections_per_download = max(connections_per_download, 1)
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str) -> requests.Session:
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                size = max(self.limiter.limit_for(host), 1) * self.connections_per_download
+                adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size, max_retries=2)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers["User-Agent"] = "comfy-model-downloader/1.0"
+                self._sessions[host] = session
+            return self._sessions[host]
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+class ProgressReporter:
+    """
+    Aggregate progress/throughput line shared by all download workers
+
+    On a TTY the line is redrawn in place; otherwise (Kaggle/Colab cell
+    output, log files) a snapshot line is printed every `log_interval` seconds.
+    """
+
+    def __init__(self, total_files: int, interval: float = 0.5, log_interval: float = 15.0,
+                 stream=None):
+        self.total_files = total_files
+        self.interval = interval
+        self.log_interval = log_interval
+        self.stream = stream or sys.stdout
+        self.tty = self.stream.isatty()
+        self.done_files = 0
+        self.active = 0
+        self.bytes_done = 0
+        self.bytes_expected = 0
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._line_len = 0
+
+    def start(self):
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        with self._lock:
+            self._draw(final=True)
+
+    def expect(self, nbytes: int):
+        with self._lock:
+            self.bytes_expected += max(nbytes, 0)
+
+    def retract(self, nbytes: int):
+        """Withdraw expected bytes that will not arrive (an abandoned transfer)"""
+        with self._lock:
+            self.bytes_expected = max(self.bytes_expected - max(nbytes, 0), self.bytes_done)
+
+    def advance(self, nbytes: int):
+        with self._lock:
+            self.bytes_done += nbytes
+
+    def file_started(self):
+        with self._lock:
+            self.active += 1
+
+    def file_finished(self):
+        with self._lock:
+            self.active -= 1
+            self.done_files += 1
+
+    def log(self, message: str):
+        """Print a per-file event without tearing the progress line"""
+        with self._lock:
+            self._clear()
+            print(message, file=self.stream, flush=True)
+
+    def status_line(self) -> str:
+        elapsed = max(time.monotonic() - self._started, 1e-6)
+        rate = self.bytes_done / elapsed
+        expected = max(self.bytes_expected, self.bytes_done)
+        return (f"[PROGRESS] {self.done_files}/{self.total_files} files | "
+                f"{format_bytes(self.bytes_done)} / {format_bytes(expected)} | "
+                f"{format_bytes(rate)}/s | {self.active} active | {elapsed:.0f}s")
+
+    def _clear(self):
+        if self.tty and self._line_len:
+            self.stream.write("\r" + " " * self._line_len + "\r")
+            self._line_len = 0
+
+    def _draw(self, final: bool = False):
+        line = self.status_line()
+        if self.tty:
+            self._clear()
+            self.stream.write(line + ("\n" if final else ""))
+            self._line_len = 0 if final else len(line)
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+    def _run(self):
+        last_log = time.monotonic()
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                if self.tty:
+                    self._draw()
+                elif time.monotonic() - last_log >= self.log_interval:
+                    self._draw()
+                    last_log = time.monotonic()
+
+
+class DownloadJournal:
+    """
+    Sidecar journal for a partial download (<name>.part.json)
+
+    Records the byte ranges already written to <name>.part together with the
+    remote size and validators (ETag/Last-Modified), so an interrupted
+    download resumes where it stopped and restarts only if the remote changed.
+    """
+
+    def __init__(self, part_file: str):
+        self.part_file = part_file
+        self.path = part_file + ".json"
+        self.size = 0
+        self.etag = None
+        self.last_modified = None
+        self.ranges = []  # Sorted, merged [start, end) pairs
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self._load()
+
+    def _load(self):
+        if not (os.path.exists(self.path) and os.path.exists(self.part_file)):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self.size = int(data.get("size", 0))
+            self.etag = data.get("etag")
+            self.last_modified = data.get("last_modified")
+            self.ranges = [list(r) for r in data.get("ranges", [])]
+        except (ValueError, OSError, TypeError):
+            self.reset()
+
+    @property
+    def completed(self) -> int:
+        return sum(end - start for start, end in self.ranges)
+
+    def matches(self, probe: Dict) -> bool:
+        """True if the remote described by a probe is the file this journal belongs to"""
+        if not probe["size"] or probe["size"] != self.size:
+            return False
+        if probe.get("pinned"):
+            return True  # Lockfile size matches; the locked sha256 is checked at the end
+        if self.etag and probe["etag"]:
+            return self.etag == probe["etag"]
+        if self.last_modified and probe["last_modified"]:
+            return self.last_modified == probe["last_modified"]
+        return False
+
+    def begin(self, size: int, etag: Optional[str], last_modified: Optional[str]):
+        """Start journaling a new download of a remote file"""
+        with self._lock:
+            self.size = size
+            self.etag = etag
+            self.last_modified = last_modified
+            self.ranges = []
+        self.flush(force=True)
+
+    def prefix_end(self) -> int:
+        """End of the contiguous range written from byte 0"""
+        with self._lock:
+            if self.ranges and self.ranges[0][0] == 0:
+                return self.ranges[0][1]
+            return 0
+
+    def missing(self) -> List[List[int]]:
+        """Byte ranges [start, end) not yet written"""
+        gaps, pos = [], 0
+        for start, end in self.ranges:
+            if start > pos:
+                gaps.append([pos, start])
+            pos = max(pos, end)
+        if pos < self.size:
+            gaps.append([pos, self.size])
+        return gaps
+
+    def mark(self, start: int, end: int):
+        """Record bytes [start, end) as written and flush periodically"""
+        with self._lock:
+            merged = []
+            for r in sorted(self.ranges + [[start, end]]):
+                if merged and r[0] <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], r[1])
+                else:
+                    merged.append(list(r))
+            self.ranges = merged
+        self.flush()
+
+    def flush(self, force: bool = False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_flush < JOURNAL_FLUSH_SECONDS:
+                return
+            self._last_flush = now
+            data = {
+                "size": self.size,
+                "etag": self.etag,
+                "last_modified": self.last_modified,
+                "ranges": self.ranges,
+            }
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+
+    def reset(self):
+        """Forget all progress and delete the partial file"""
+        with self._lock:
+            self.size = 0
+            self.etag = self.last_modified = None
+            self.ranges = []
+        for path in (self.part_file, self.path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def finish(self, target: str):
+        """Move the completed partial file into place and drop the journal"""
+        os.replace(self.part_file, target)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class StreamingHasher:
+    """
+    SHA-256 computed while a file is being written
+
+    Bytes arriving in file order are hashed straight from the network
+    buffer. Segments written ahead of the hash position are picked up later
+    from the freshly written (page-cached) .part file, so no separate full
+    read of the finished file is needed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+        self._digest = hashlib.sha256()
+        self._lock = threading.Lock()
+
+    def update_at(self, offset: int, data: bytes, journal: DownloadJournal):
+        """Feed bytes written at offset; never blocks a download thread"""
+        if not self._lock.acquire(blocking=False):
+            return  # Another thread is hashing; these bytes are caught up from disk
+        try:
+            if offset <= self.offset < offset + len(data):
+                self._digest.update(memoryview(data)[self.offset - offset:])
+                self.offset = offset + len(data)
+            self._catch_up(journal.prefix_end(), HASH_CATCH_UP_BYTES)
+        finally:
+            self._lock.release()
+
+    def hexdigest(self, size: int) -> str:
+        """Finish hashing up to size bytes and return the digest"""
+        with self._lock:
+            self._catch_up(size)
+            return self._digest.hexdigest()
+
+    def _catch_up(self, end: int, budget: Optional[int] = None):
+        if end <= self.offset:
+            return
+        if budget is not None:
+            end = min(end, self.offset + budget)
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            while self.offset < end:
+                block = f.read(min(CHUNK_SIZE * 8, end - self.offset))
+                if not block:
+                    break
+                self._digest.update(block)
+                self.offset += len(block)
+
+
+class ManifestDownloader:
+    """Downloads a list of manifest jobs concurrently"""
+
+    def __init__(self,
+                 workers: int = DEFAULT_WORKERS,
+                 host_limits: Optional[Dict[str, int]] = None,
+                 refresh: bool = False,
+                 segments: int = DEFAULT_SEGMENTS,
+                 segment_threshold: int = SEGMENT_THRESHOLD,
+                 hash_index: Optional[HashIndex] = None,
+                 store: Optional[BlobStore] = None):
+        """
+        Args:
+            workers: Total number of concurrent downloads
+            host_limits: Per-host concurrency overrides (defaults to HOST_LIMITS)
+            refresh: Ignore cached files and download everything again
+            segments: Max Range connections per large file (1 disables segmenting)
+            segment_threshold: min_size at or above which a file is segmented
+            hash_index: Index that receives the SHA-256 of every downloaded file
+            store: Content-addressed store that downloads are moved into
+        """
+        self.workers = max(workers, 1)
+        self.limiter = HostLimiter(host_limits)
+        self.segments = max(segments, 1)
+        self.segment_threshold = segment_threshold
+        self.sessions = SessionPool(self.limiter, self.segments)
+        self.refresh = refresh
+        self.hash_index = hash_index
+        self.store = store
+        self.progress = None
+
+    def run(self, jobs: List[Dict]) -> Dict[str, int]:
+        """
+        Download all non-skipped jobs
+
+        Returns:
+            Counts dict with 'downloaded', 'cached', 'skipped' and 'failed'
+        """
+        counts = {"downloaded": 0, "cached": 0, "skipped": 0, "failed": 0}
+        pending = []
+        by_url = {}
+
+        for job in jobs:
+            if job["skip"]:
+                counts["skipped"] += 1
+                continue
+            cached = self._find_cached(job)
+            if cached:
+                print(f"[CACHED] {job['name']} ({os.path.getsize(cached)} bytes)")
+                self._publish(job, cached)
+                counts["cached"] += 1
+                record("model", job["name"], seconds=0.0, bytes=0, status="cached")
+                continue
+            # Aliased entries (same source URL) ride along with one download
+            first = by_url.get(job["source_url"])
+            if first:
+                first["aliases"].append(job)
+                continue
+            job["aliases"] = []
+            by_url[job["source_url"]] = job
+            pending.append(job)
+
+        if not pending:
+            return counts
+
+        # Large files first so they overlap with the long tail of small ones
+        pending.sort(key=lambda j: j["size"] or j["min_size"], reverse=True)
+
+        self.progress = ProgressReporter(len(pending))
+        self.progress.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(self._download, job): job for job in pending}
+                for future in as_completed(futures):
+                    job = futures[future]
+                    try:
+                        ok = future.result()
+                    except Exception as e:
+                        self.progress.log(f"[ERROR] Failed to download {job['name']}: {e}")
+                        ok = False
+                    counts["downloaded" if ok else "failed"] += 1 + len(job["aliases"])
+        finally:
+            self.progress.stop()
+            self.sessions.close()
+
+        return counts
+
+    def _find_cached(self, job: Dict) -> Optional[str]:
+        """Return the path of a usable cached copy of a job's file, or None"""
+        cache_file = job["cache_file"]
+        if self.refresh:
+            if os.path.exists(cache_file):
+                print(f"[CACHE] Refresh forced - removing {job['name']}")
+                os.remove(cache_file)
+            DownloadJournal(cache_file + ".part").reset()
+            if self.store:
+                self.store.forget(job["name"])
+            return None
+
+        if self.store:
+            sha = self.store.lookup(job["name"], job["source_url"], job["sha256"])
+            if sha:
+                self.store.record(sha, job["name"], job["source_url"])
+                return self.store.blob_path(sha)
+
+        # Flat <cache_root>/<name> file from an older installer run
+        if not (os.path.exists(cache_file) and os.path.getsize(cache_file) >= job["min_size"]):
+            return None
+        if job["sha256"] or self.store:
+            # Trusted from the index when unchanged; hashed once otherwise
+            sha = self.hash_index.hash(cache_file) if self.hash_index else sha256_file(cache_file)
+            if job["sha256"] and sha != job["sha256"]:
+                print(f"[CACHE] Corrupt (hash) - deleting {job['name']}")
+                os.remove(cache_file)
+                return None
+            if self.store:
+                return self.store.add(cache_file, sha, job["name"], job["source_url"])
+        return cache_file
+
+    def _publish(self, job: Dict, path: str):
+        """Link a cached file into the ComfyUI models tree and the cache view"""
+        link_model(path, job["target_file"])
+        if self.store:
+            link_model(path, job["view_file"])
+
+    def _download(self, job: Dict) -> bool:
+        started = time.monotonic()
+        ok = self._download_file(job)
+        # Resumed bytes came over the network in an earlier run
+        size = job.get("downloaded", 0) if ok else 0
+        record("model", job["name"], seconds=round(time.monotonic() - started, 3),
+               bytes=max(size - job.get("resumed", 0), 0),
+               status="downloaded" if ok else "failed")
+        return ok
+
+    def _download_file(self, job: Dict) -> bool:
+        name = job["name"]
+        cache_file = job["cache_file"]
+        os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+
+        with self.limiter.get(job["host"]):
+            self.progress.file_started()
+            self.progress.log(f"[DOWNLOAD] {name}")
+            try:
+                sha = self._fetch(job)
+            except (requests.RequestException, OSError) as e:
+                # The .part file and its journal are kept so a rerun resumes
+                self.progress.log(f"[ERROR] Failed to download {name}: {e}")
+                return False
+            finally:
+                self.progress.file_finished()
+
+        size = os.path.getsize(cache_file)
+        if job["size"] and size != job["size"]:
+            self.progress.log(f"[ERROR] {name} is {size} bytes, lockfile says {job['size']}")
+            os.remove(cache_file)
+            return False
+        if size < job["min_size"]:
+            self.progress.log(f"[ERROR] {name} too small ({size} bytes), expected >{job['min_size']}")
+            os.remove(cache_file)
+            return False
+
+        job["downloaded"] = size
+        path = cache_file
+        if self.store:
+            path = self.store.add(cache_file, sha, name, job["source_url"])
+        if self.hash_index:
+            self.hash_index.put(path, sha)
+
+        for entry in [job] + job["aliases"]:
+            if self.store and entry is not job:
+                self.store.record(sha, entry["name"], entry["source_url"])
+            self._publish(entry, path)
+            self.progress.log(f"[OK] {entry['name']} ({size} bytes)")
+        return True
+
+    def _fetch(self, job: Dict) -> str:
+        """
+        Download a job's URL into its cache file via <name>.part and return its SHA-256
+
+        Large files are fetched as parallel Range segments. A journaled
+        partial download is resumed if the remote validators still match,
+        otherwise it is discarded and the download restarts from zero; the
+        same happens, over a single stream, when a resumed Range request is
+        answered with the whole file.
+        Locked entries (exact size and sha256 known) skip the HEAD probe.
+        """
+        journal = DownloadJournal(job["cache_file"] + ".part")
+        hasher = StreamingHasher(journal.part_file)
+        segmented = self.segments > 1 and (job["size"] or job["min_size"]) >= self.segment_threshold
+
+        probe = None
+        if journal.ranges or segmented:
+            probe = self._pinned_probe(job) if job["size"] and job["sha256"] else self._probe(job)
+
+        if journal.ranges:
+            if probe["ranges"] and journal.matches(probe):
+                job["resumed"] = journal.completed
+                self.progress.log(f"[RESUME] {job['name']} from "
+                                  f"{format_bytes(journal.completed)} / {format_bytes(journal.size)}")
+            else:
+                self.progress.log(f"[RESUME] {job['name']}: remote file changed, restarting")
+                journal.reset()
+
+        if probe and probe["ranges"] and probe["size"]:
+            if not journal.ranges:
+                journal.begin(probe["size"], probe["etag"], probe["last_modified"])
+                self._preallocate(journal.part_file, probe["size"])
+            try:
+                self._fetch_ranges(job, probe, journal, hasher, segmented)
+            except RangeIgnored:
+                # Servers that advertise ranges but answer 200, or a remote file
+                # replaced since the journal was written (If-Range answered with
+                # 200): the partial file cannot be resumed, so restart it over one
+                # stream in this run. A changed file is caught by the sha256/size checks
+                self.progress.log(f"[INFO] {job['name']}: Range not honoured, "
+                                  f"restarting as a single stream")
+                self.progress.retract(sum(end - start for start, end in journal.missing()))
+                journal.reset()
+                job["resumed"] = 0
+                hasher = StreamingHasher(journal.part_file)
+                self._fetch_stream(job, journal, hasher)
+        else:
+            if segmented:
+                self.progress.log(f"[INFO] {job['name']}: no Accept-Ranges, using single stream")
+            self._fetch_stream(job, journal, hasher)
+
+        sha = hasher.hexdigest(os.path.getsize(journal.part_file))
+        if job["sha256"] and sha != job["sha256"]:
+            journal.reset()
+            raise requests.RequestException(f"sha256 mismatch (got {sha}, expected {job['sha256']})")
+
+        journal.finish(job["cache_file"])
+        return sha
+
+    def _probe(self, job: Dict) -> Dict:
+        """
+        HEAD the job URL (following redirects) for range support and validators
+
+        Returns:
+            Dict with final 'url', request 'headers' valid for it, total
+            'size' (0 if unknown), whether byte 'ranges' are advertised,
+            and the 'etag'/'last_modified' validators (None if absent)
+        """
+        session = self.sessions.get(job["host"])
+        response = session.head(job["url"], headers=job["headers"], allow_redirects=True,
+                                timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+
+        # Auth headers must not follow a redirect onto a signed CDN URL
+        headers = job["headers"] if urlparse(response.url).netloc == job["host"] else {}
+        return {
+            "url": response.url,
+            "headers": headers,
+            "size": int(response.headers.get("Content-Length") or 0),
+            "ranges": response.headers.get("Accept-Ranges", "").lower() == "bytes",
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+
+    @staticmethod
+    def _pinned_probe(job: Dict) -> Dict:
+        """
+        Probe result for a locked entry, built without a request
+
+        Range requests go to the original URL and follow its redirect; if the
+        server ignores them the download falls back to a single stream.
+        """
+        return {
+            "url": job["url"],
+            "headers": job["headers"],
+            "size": job["size"],
+            "ranges": True,
+            "etag": None,
+            "last_modified": None,
+            "pinned": True,
+        }
+
+    @staticmethod
+    def _preallocate(path: str, size: int):
+        with open(path, "wb") as f:
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(f.fileno(), 0, size)
+            else:
+                f.truncate(size)
+
+    def _fetch_stream(self, job: Dict, journal: DownloadJournal, hasher: StreamingHasher):
+        """Stream a job's URL into its .part file over a single connection"""
+        session = self.sessions.get(job["host"])
+        with session.get(job["url"], headers=job["headers"], stream=True,
+                         timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            length = int(response.headers.get("Content-Length") or 0)
+            if job["size"] and length and length != job["size"]:
+                raise requests.RequestException(
+                    f"remote size {length} differs from lockfile size {job['size']}")
+            journal.begin(length, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+            self.progress.expect(length or job["size"] or job["min_size"])
+            if job["size"]:
+                self._preallocate(journal.part_file, job["size"])
+            written = 0
+            with open(journal.part_file, "r+b" if job["size"] else "wb", buffering=0) as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    journal.mark(written, written + len(chunk))
+                    hasher.update_at(written, chunk, journal)
+                    written += len(chunk)
+                    self.progress.advance(len(chunk))
+        journal.flush(force=True)
+
+    def _fetch_ranges(self, job: Dict, probe: Dict, journal: DownloadJournal,
+                      hasher: StreamingHasher, segmented: bool):
+        """Fetch the journal's missing ranges, in parallel segments if requested"""
+        gaps = journal.missing()
+        remaining = sum(end - start for start, end in gaps)
+        self.progress.expect(remaining)
+
+        pieces = gaps
+        if segmented:
+            step = max(-(-remaining // self.segments), MIN_SEGMENT_SIZE)
+            pieces = [[start, min(start + step, end)]
+                      for gap_start, end in gaps
+                      for start in range(gap_start, end, step)]
+
+        try:
+            if len(pieces) > 1 and segmented:
+                session = self.sessions.get(job["host"])
+                with ThreadPoolExecutor(max_workers=min(len(pieces), self.segments)) as pool:
+                    futures = [pool.submit(self._fetch_range, session, probe, journal, hasher,
+                                           start, end)
+                               for start, end in pieces]
+                    for future in futures:
+                        future.result()
+            else:
+                session = self.sessions.get(job["host"])
+                for start, end in pieces:
+                    self._fetch_range(session, probe, journal, hasher, start, end)
+        finally:
+            journal.flush(force=True)
+
+        if journal.missing():
+            raise requests.RequestException("download incomplete")
+
+    def _fetch_range(self, session: requests.Session, probe: Dict, journal: DownloadJournal,
+                     hasher: StreamingHasher, start: int, end: int):
+        """Download bytes [start, end) into the .part file, retrying from the last byte written"""
+        pos = start
+        validator = probe["etag"] or probe["last_modified"]
+        for attempt in range(SEGMENT_RETRIES):
+            headers = dict(probe["headers"], Range=f"bytes={pos}-{end - 1}")
+            if validator:
+                headers["If-Range"] = validator
+            try:
+                with session.get(probe["url"], headers=headers, stream=True,
+                                 timeout=REQUEST_TIMEOUT) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise RangeIgnored(
+                            f"server ignored Range request (HTTP {response.status_code}); "
+                            "remote file may have changed")
+                    with open(journal.part_file, "r+b", buffering=0) as f:
+                        f.seek(pos)
+                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                            chunk = chunk[:end - pos]
+                            f.write(chunk)
+                            journal.mark(pos, pos + len(chunk))
+                            hasher.update_at(pos, chunk, journal)
+                            pos += len(chunk)
+                            self.progress.advance(len(chunk))
+            except RangeIgnored:
+                raise
+            except requests.RequestException:
+                if attempt == SEGMENT_RETRIES - 1:
+                    raise
+            if pos >= end:
+                return
+            time.sleep(2 ** attempt)
+        raise requests.RequestException(f"range {start}-{end - 1} incomplete after {SEGMENT_RETRIES} attempts")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download models from models_manifest.json")
+    parser.add_argument("--manifest", default=os.getenv("MANIFEST", "configs/models_manifest.json"),
+                        help="Path to models_manifest.json")
+    parser.add_argument("--mode", default=os.getenv("INSTALL_MODE", "lite"),
+                        help="Install mode to download (lite/full)")
+    parser.add_argument("--cache-root", default=None,
+                        help="Model cache directory (default: $WORK_DIR/model-cache)")
+    parser.add_argument("--models-root", default=".",
+                        help="Directory containing the ComfyUI models tree")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Concurrent downloads (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Re-download models even if cached")
+    parser.add_argument("--cache-budget", default=os.getenv("MODEL_CACHE_BUDGET", ""),
+                        help="Max model cache size, e.g. 150G; LRU models outside this mode are evicted")
+    parser.add_argument("--segments", type=int, default=DEFAULT_SEGMENTS,
+                        help=f"Range connections per large file, 1 disables (default: {DEFAULT_SEGMENTS})")
+    parser.add_argument("--segment-threshold", type=int, default=SEGMENT_THRESHOLD,
+                        help="Segment files whose manifest min_size is at least this many bytes")
+    parser.add_argument("--lockfile", default=None,
+                        help="Pinned sizes/hashes from manifest_lock.py (default: <manifest>.lock.json)")
+    parser.add_argument("--workflows", default=os.getenv("WORKFLOWS", ""),
+                        help="Only fetch models these workflows load, e.g. a.json,b.json (overrides --mode)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.manifest):
+        print(f"ERROR: Manifest file not found: {args.manifest}")
+        sys.exit(1)
+
+    with open(args.manifest, "r") as f:
+        manifest = json.load(f)
+
+    cache_root = args.cache_root or f"{os.getenv('WORK_DIR', '/content')}/model-cache"
+    jobs = build_jobs(
+        manifest,
+        args.mode,
+        cache_root,
+        models_root=args.models_root,
+        hf_token=os.getenv("HF_TOKEN", ""),
+        civitai_token=os.getenv("CIVITAI_API_TOKEN", ""),
+        lock=load_lock(args.lockfile or lockfile_path(args.manifest)),
+    )
+
+    skip_reason = f"not in {args.mode} mode"
+    if args.workflows:
+        from workflow_deps import split_workflows, workflow_closure
+        try:
+            closure = workflow_closure(split_workflows([args.workflows]), manifest)
+        except (OSError, ValueError) as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        wanted = {(model["category"], model["name"]) for model in closure["models"]}
+        for job in jobs:
+            job["skip"] = (job["category"], job["entry"]) not in wanted
+        for missing in closure["missing"]:
+            print(f"[WARN] {missing['workflow']}: {missing['folder']}/{missing['name']} "
+                  f"is not in the manifest")
+        skip_reason = "not used by the selected workflows"
+
+    for job in jobs:
+        if job["skip"]:
+            print(f"[SKIP] {job['name']} ({skip_reason})")
+
+    # Nothing to do when the selected models are the ones last applied and
+    # every one of them is still linked to a cached file
+    state = InstallState()
+    active = [job for job in jobs if not job["skip"]]
+    fingerprint = digest(sorted([job["category"], job["name"], job["source_url"], job["sha256"],
+                                 job["size"], job["min_size"]] for job in active),
+                         args.cache_budget)
+    if (not args.refresh and state.unchanged("models", fingerprint)
+            and all(os.path.exists(job["target_file"]) and os.path.exists(job["view_file"])
+                    for job in active)):
+        skipped("models", f"{len(active)} model(s) unchanged and cached")
+        write_eviction_report(cache_root, 0, [])  # Nothing evicted this run
+        return
+
+    store = BlobStore(cache_root)
+    if args.cache_budget:
+        enforce_cache_budget(jobs, store, parse_size(args.cache_budget))
+    else:
+        write_eviction_report(cache_root, 0, [])
+
+    downloader = ManifestDownloader(
+        workers=args.workers,
+        refresh=args.refresh,
+        segments=args.segments,
+        segment_threshold=args.segment_threshold,
+        hash_index=HashIndex(cache_root),
+        store=store,
+    )
+    counts = downloader.run(jobs)
+    if counts["failed"] == 0:
+        state.mark("models", fingerprint, manifest=files_digest([args.manifest]), models=len(active))
+
+    print(f"\n✅ Model downloads complete: {counts['downloaded']} downloaded, "
+          f"{counts['cached']} cached, {counts['skipped']} skipped, {counts['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
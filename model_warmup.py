@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Model Warm-up
+Reads the model files a workflow loads into the page cache while ComfyUI boots,
+so the first prompt does not stall on cold reads from the model cache disk.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from comfy_utils import format_bytes
+from workflow_deps import workflow_models
+
+READ_SIZE = 16 * 1024 * 1024
+WARMUP_WORKERS = 2
+# Stop warming once this share of MemAvailable is used; beyond it the page
+# cache would evict what was just read
+MEMORY_FRACTION = 0.8
+
+
+def resolve_model(comfyui_dir: str, folder: str, name: str,
+                  cache_root: Optional[str] = None) -> Optional[str]:
+    """Real path of a model in the ComfyUI tree or the model cache view, or None"""
+    candidates = [os.path.join(comfyui_dir, "models", folder, name)]
+    if cache_root:
+        candidates.append(os.path.join(cache_root, folder, name))
+    for path in candidates:
+        if os.path.isfile(path):
+            return os.path.realpath(path)
+    return None
+
+
+def available_memory() -> int:
+    """MemAvailable in bytes (0 if unknown)"""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def warm_file(path: str) -> Tuple[int, float]:
+    """
+    Read a file sequentially with large reads so it lands in the page cache
+
+    Returns:
+        (bytes read, seconds taken)
+    """
+    start = time.monotonic()
+    total = 0
+    buffer = bytearray(READ_SIZE)
+    with open(path, "rb", buffering=0) as f:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            total += n
+    return total, time.monotonic() - start
+
+
+def warm_models(files: List[Tuple[str, str]], workers: int = WARMUP_WORKERS) -> int:
+    """
+    Warm files in parallel, printing throughput per file
+
+    Args:
+        files: (display name, path) pairs, in priority order
+        workers: Files read concurrently
+
+    Returns:
+        Total bytes read
+    """
+    budget = available_memory() * MEMORY_FRACTION
+    selected, planned = [], 0
+    for name, path in files:
+        size = os.path.getsize(path)
+        if budget and planned + size > budget:
+            print(f"[WARMUP] Skipping {name} ({format_bytes(size)}): "
+                  f"would exceed {format_bytes(budget)} of free memory")
+            continue
+        selected.append((name, path))
+        planned += size
+
+    def run(item):
+        name, path = item
+        try:
+            size, seconds = warm_file(path)
+        except OSError as e:
+            print(f"[WARMUP] {name}: {e}", flush=True)
+            return 0
+        rate = size / seconds if seconds > 0 else 0
+        print(f"[WARMUP] {name}: {format_bytes(size)} in {seconds:.1f}s "
+              f"({format_bytes(rate)}/s)", flush=True)
+        return size
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        total = sum(pool.map(run, selected))
+    elapsed = time.monotonic() - start
+    if selected:
+        print(f"[WARMUP] Done: {len(selected)} file(s), {format_bytes(total)} in {elapsed:.1f}s",
+              flush=True)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prime the page cache with a workflow's models")
+    parser.add_argument("--workflow", required=True, help="Workflow JSON to read loaders from")
+    parser.add_argument("--comfyui-dir", required=True, help="ComfyUI installation directory")
+    parser.add_argument("--cache-root", default=None,
+                        help="Model cache directory (default: $WORK_DIR/model-cache)")
+    parser.add_argument("--workers", type=int, default=WARMUP_WORKERS,
+                        help=f"Files read in parallel (default: {WARMUP_WORKERS})")
+    args = parser.parse_args()
+
+    cache_root = args.cache_root or f"{os.getenv('WORK_DIR', '/content')}/model-cache"
+    try:
+        models = workflow_models(args.workflow)
+    except (OSError, ValueError) as e:
+        print(f"[WARMUP] Cannot read workflow {args.workflow}: {e}")
+        sys.exit(1)
+
+    files, seen = [], set()
+    for folder, name in models:
+        path = resolve_model(args.comfyui_dir, folder, name, cache_root)
+        if path is None:
+            print(f"[WARMUP] {folder}/{name} not found - skipping")
+        elif path not in seen:
+            seen.add(path)
+            files.append((name, path))
+
+    # Stay out of the way of ComfyUI's own startup
+    os.nice(10)
+    warm_models(files, args.workers)
+
+
+if __name__ == "__main__":
+    main()
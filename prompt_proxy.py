@@ -0,0 +1,654 @@
+#!/usr/bin/env python3
+"""
+Prompt Proxy
+Reverse proxy in front of ComfyUI that fetches missing models on demand: each
+queued prompt's loader inputs are checked against the ComfyUI models tree and
+absent manifest entries are downloaded into the model cache before the prompt
+is forwarded. Everything else (UI, API, websocket) passes straight through.
+
+With several upstream ports (one ComfyUI worker per GPU) it is also the single
+front door: prompts go to the least busy worker, queue/history views are
+merged, and each websocket receives the events of every worker.
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+from manifest_lock import load_lock, lockfile_path
+from model_cache import BlobStore, HashIndex
+from model_downloader import ManifestDownloader, build_jobs
+from model_warmup import resolve_model
+from workflow_deps import manifest_index, prompt_models
+
+PROXY_PORT = int(os.getenv("COMFYUI_PROXY_PORT", "8189"))
+MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "configs",
+                        "models_manifest.json")
+PROMPT_PATHS = ("/prompt", "/api/prompt")
+UPSTREAM_TIMEOUT = 600      # Seconds; /prompt answers fast, but uploads can be slow
+CHUNK_SIZE = 64 * 1024
+
+# Per-connection headers that must not be forwarded (RFC 7230 section 6.1)
+HOP_BY_HOP = {"connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+              "te", "trailers", "transfer-encoding", "upgrade"}
+
+# Multi-worker routing (paths without the optional /api prefix)
+MERGED_PATHS = ("/queue", "/history", "/prompt")        # GET: combined from all workers
+BROADCAST_PATHS = ("/interrupt", "/queue", "/history", "/free")  # POST: sent to every worker
+PROMPT_OWNERS = 10000       # prompt_id -> worker entries kept for /history/<id>
+WS_CLOSE = b"\x88\x00"      # Websocket close frame without a status code
+
+
+class LazyFetcher:
+    """Downloads the manifest entries a prompt loads that are not installed yet"""
+
+    def __init__(self, manifest_path: str, comfyui_dir: str, cache_root: str,
+                 lockfile: Optional[str] = None):
+        """
+        Args:
+            manifest_path: models_manifest.json to resolve file names against
+            comfyui_dir: ComfyUI installation (its models/ tree receives the links)
+            cache_root: Model cache directory downloads are stored in
+            lockfile: Pinned sizes/hashes (default: <manifest>.lock.json)
+        """
+        with open(manifest_path, "r") as f:
+            self.manifest = json.load(f)
+        self.index = manifest_index(self.manifest)
+        self.comfyui_dir = comfyui_dir
+        self.cache_root = cache_root
+        self.lock = load_lock(lockfile or lockfile_path(manifest_path))
+        # Shared by concurrent fetches; both serialize their index writes
+        self.hash_index = HashIndex(cache_root)
+        self.store = BlobStore(cache_root)
+        # One lock per manifest entry: concurrent prompts for the same model
+        # must not race on its .part file (the second finds it installed),
+        # while prompts needing other models, or none, are not held up
+        self._entry_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._entry_locks_guard = threading.Lock()
+
+    def _entry_lock(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._entry_locks_guard:
+            return self._entry_locks.setdefault(key, threading.Lock())
+
+    def missing(self, prompt: Dict) -> Tuple[List[Tuple[str, str]], List[str]]:
+        """
+        Split a prompt's absent models into manifest entries and unknown files
+
+        Returns:
+            ([(category, manifest name)], ["folder/name" not in the manifest])
+        """
+        entries, unknown = [], []
+        for folder, name in prompt_models(prompt):
+            if resolve_model(self.comfyui_dir, folder, name, self.cache_root):
+                continue
+            key = self.index.get((folder, name))
+            if key is None:
+                unknown.append(f"{folder}/{name}")
+            elif key not in entries:
+                entries.append(key)
+        return entries, unknown
+
+    def ensure(self, prompt: Dict) -> Dict[str, int]:
+        """
+        Download the manifest entries a prompt needs but that are not installed
+
+        Returns:
+            Downloader counts ('downloaded', 'cached', 'skipped', 'failed');
+            all zero when nothing was missing
+        """
+        counts = {"downloaded": 0, "cached": 0, "skipped": 0, "failed": 0}
+        entries, unknown = self.missing(prompt)
+        for name in unknown:
+            print(f"[PROXY] {name} is not installed and not in the manifest - "
+                  f"leaving it to ComfyUI validation", flush=True)
+        if not entries:
+            return counts
+
+        # Sorted acquisition, so two prompts sharing several models cannot deadlock
+        locks = [self._entry_lock(key) for key in sorted(entries)]
+        for lock in locks:
+            lock.acquire()
+        try:
+            # Another prompt may have fetched some of them while we waited
+            entries = [key for key in self.missing(prompt)[0] if key in entries]
+            if not entries:
+                return counts
+
+            print(f"[PROXY] Fetching {len(entries)} missing model(s) before queueing: "
+                  f"{', '.join(name for _, name in entries)}", flush=True)
+            jobs = build_jobs(self.manifest, "", self.cache_root,
+                              models_root=self.comfyui_dir,
+                              hf_token=os.getenv("HF_TOKEN", ""),
+                              civitai_token=os.getenv("CIVITAI_API_TOKEN", ""),
+                              lock=self.lock)
+            jobs = [job for job in jobs if (job["category"], job["entry"]) in entries]
+            for job in jobs:
+                job["skip"] = False
+            downloader = ManifestDownloader(hash_index=self.hash_index, store=self.store)
+            return downloader.run(jobs)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+
+class WorkerPool:
+    """ComfyUI workers (one per GPU, sharing one installation) behind the front port"""
+
+    def __init__(self, upstreams: List[Tuple[str, int]]):
+        self.upstreams = upstreams
+        self._owners: "OrderedDict[str, int]" = OrderedDict()
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def request(self, index: int, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None, timeout: float = UPSTREAM_TIMEOUT
+                ) -> Tuple[int, str, List[Tuple[str, str]], bytes]:
+        """One buffered request to a worker: (status, reason, headers, body)"""
+        connection = http.client.HTTPConnection(*self.upstreams[index], timeout=timeout)
+        try:
+            connection.request(method, path, body=body, headers=headers or {})
+            response = connection.getresponse()
+            return response.status, response.reason, response.getheaders(), response.read()
+        finally:
+            connection.close()
+
+    def queue_remaining(self, index: int) -> Optional[int]:
+        """Prompts running or pending on a worker (None if it does not answer)"""
+        try:
+            status, _, _, data = self.request(index, "GET", "/prompt", timeout=5)
+            return json.loads(data)["exec_info"]["queue_remaining"] if status == 200 else None
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def pick(self) -> int:
+        """Index of the worker with the shortest queue (round robin among equals)"""
+        loads = [self.queue_remaining(i) for i in range(len(self.upstreams))]
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.upstreams)
+        order = [(start + i) % len(self.upstreams) for i in range(len(self.upstreams))]
+        alive = [i for i in order if loads[i] is not None]
+        return min(alive, key=lambda i: loads[i]) if alive else start
+
+    def remember(self, prompt_id: str, index: int):
+        with self._lock:
+            self._owners[prompt_id] = index
+            while len(self._owners) > PROMPT_OWNERS:
+                self._owners.popitem(last=False)
+
+    def owner(self, prompt_id: str) -> Optional[int]:
+        with self._lock:
+            return self._owners.get(prompt_id)
+
+
+def merge_json(path: str, payloads: List[Dict]) -> Dict:
+    """Combine the same GET endpoint's answers from several workers"""
+    if path == "/queue":
+        return {key: [item for payload in payloads for item in payload.get(key, [])]
+                for key in ("queue_running", "queue_pending")}
+    if path == "/prompt":
+        return {"exec_info": {"queue_remaining": sum(
+            payload.get("exec_info", {}).get("queue_remaining", 0) for payload in payloads)}}
+    merged = {}
+    for payload in payloads:  # /history and /history/<prompt_id>: keyed by prompt_id
+        merged.update(payload)
+    return merged
+
+
+def split_frames(buffer: bytes) -> Tuple[List[bytes], bytes]:
+    """Cut complete websocket frames off the front of buffer: (frames, remainder)"""
+    frames, pos = [], 0
+    while len(buffer) - pos >= 2:
+        length = buffer[pos + 1] & 0x7F
+        head = 2
+        if length == 126:
+            head = 4
+        elif length == 127:
+            head = 10
+        if len(buffer) - pos < head:
+            break
+        if head > 2:
+            length = int.from_bytes(buffer[pos + 2:pos + head], "big")
+        if buffer[pos + 1] & 0x80:
+            head += 4  # Masking key
+        end = pos + head + length
+        if end > len(buffer):
+            break
+        frames.append(buffer[pos:end])
+        pos = end
+    return frames, buffer[pos:]
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    """Forwards requests to ComfyUI, fetching models for queued prompts first"""
+
+    upstream: Tuple[str, int] = ("127.0.0.1", 8188)
+    fetcher: Optional[LazyFetcher] = None
+    pool: Optional[WorkerPool] = None     # Set when there is more than one worker
+
+    @property
+    def route(self) -> str:
+        """Request path without query string and /api prefix"""
+        path = self.path.split("?", 1)[0]
+        return path[4:] if path.startswith("/api/") else path
+
+    def do_GET(self):
+        if self.headers.get("Upgrade", "").lower() == "websocket":
+            if self.pool:
+                self.tunnel_all()
+            else:
+                self.tunnel()
+        elif self.pool and self.route.startswith("/history/"):
+            self.fan_out_history(self.route.split("/", 2)[2])
+        elif self.pool and self.route in MERGED_PATHS:
+            self.fan_out_get()
+        else:
+            self.forward()
+
+    def do_POST(self):
+        body = self.read_body()
+        is_prompt = self.path.split("?", 1)[0] in PROMPT_PATHS
+        if is_prompt and self.fetcher:
+            error = self.prefetch(body)
+            if error:
+                self.send_json(503, {
+                    "error": {"type": "model_fetch_failed", "message": error,
+                              "details": "", "extra_info": {}},
+                    "node_errors": {},
+                })
+                return
+        if self.pool and is_prompt:
+            self.dispatch_prompt(body)
+        elif self.pool and self.route in BROADCAST_PATHS:
+            self.broadcast(body)
+        else:
+            self.forward(body)
+
+    def do_PUT(self):
+        self.forward(self.read_body())
+
+    def do_DELETE(self):
+        self.forward(self.read_body())
+
+    def do_PATCH(self):
+        self.forward(self.read_body())
+
+    def do_HEAD(self):
+        self.forward()
+
+    def do_OPTIONS(self):
+        self.forward()
+
+    def read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def prefetch(self, body: bytes) -> Optional[str]:
+        """Fetch a prompt's missing models; returns an error message on failure"""
+        try:
+            prompt = json.loads(body or b"{}").get("prompt")
+        except (ValueError, AttributeError):
+            return None  # Not ours to judge; ComfyUI rejects malformed prompts
+        if not isinstance(prompt, dict):
+            return None
+        try:
+            counts = self.fetcher.ensure(prompt)
+        except Exception as e:
+            return f"Could not fetch missing models: {e}"
+        if counts["failed"]:
+            return f"{counts['failed']} model download(s) failed; see the proxy log"
+        return None
+
+    def upstream_headers(self, body: Optional[bytes] = None) -> Dict[str, str]:
+        headers = {key: value for key, value in self.headers.items()
+                   if key.lower() not in HOP_BY_HOP}
+        if body is not None:
+            headers["Content-Length"] = str(len(body))
+        return headers
+
+    def relay(self, status: int, reason: str, headers: List[Tuple[str, str]], data: bytes):
+        """Send a buffered upstream response to the client"""
+        self.send_response_only(status, reason)
+        for key, value in headers:
+            if key.lower() not in HOP_BY_HOP and key.lower() != "content-length":
+                self.send_header(key, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    def dispatch_prompt(self, body: bytes):
+        """Queue a prompt on the least busy worker and remember where it went"""
+        index = self.pool.pick()
+        try:
+            status, reason, headers, data = self.pool.request(
+                index, "POST", self.path, body, self.upstream_headers(body))
+        except OSError as e:
+            self.send_json(502, {"error": f"ComfyUI worker {index} unreachable: {e}"})
+            return
+        try:
+            prompt_id = json.loads(data).get("prompt_id")
+        except (ValueError, AttributeError):
+            prompt_id = None
+        if status == 200 and prompt_id:
+            self.pool.remember(prompt_id, index)
+        self.relay(status, reason, headers, data)
+
+    def broadcast(self, body: bytes):
+        """Send a control request (interrupt, queue/history edits, free) to every worker"""
+        responses = []
+        for index in range(len(self.pool.upstreams)):
+            try:
+                responses.append(self.pool.request(index, "POST", self.path, body,
+                                                   self.upstream_headers(body)))
+            except OSError:
+                continue
+        if not responses:
+            self.send_json(502, {"error": "No ComfyUI worker reachable"})
+            return
+        self.relay(*responses[0])
+
+    def fan_out_get(self, indexes: Optional[List[int]] = None):
+        """Answer a queue/history/prompt GET with the merged answers of the workers"""
+        payloads = []
+        for index in indexes if indexes is not None else range(len(self.pool.upstreams)):
+            try:
+                status, _, _, data = self.pool.request(index, "GET", self.path,
+                                                       headers=self.upstream_headers())
+                if status == 200:
+                    payloads.append(json.loads(data))
+            except (OSError, ValueError):
+                continue
+        if not payloads:
+            self.send_json(502, {"error": "No ComfyUI worker reachable"})
+            return
+        self.send_json(200, merge_json(self.route if self.route in MERGED_PATHS else "/history",
+                                       payloads))
+
+    def fan_out_history(self, prompt_id: str):
+        """History of one prompt, from the worker that ran it when known"""
+        index = self.pool.owner(prompt_id)
+        self.fan_out_get([index] if index is not None else None)
+
+    def forward(self, body: Optional[bytes] = None):
+        """Replay the request upstream and stream the response back"""
+        headers = self.upstream_headers(body)
+        connection = http.client.HTTPConnection(*self.upstream, timeout=UPSTREAM_TIMEOUT)
+        try:
+            connection.request(self.command, self.path, body=body, headers=headers)
+            response = connection.getresponse()
+        except OSError as e:
+            connection.close()
+            self.send_json(502, {"error": f"ComfyUI unreachable: {e}"})
+            return
+
+        try:
+            self.send_response_only(response.status, response.reason)
+            for key, value in response.getheaders():
+                if key.lower() not in HOP_BY_HOP:
+                    self.send_header(key, value)
+            # HTTP/1.0 handler: the connection closes after the body, so
+            # responses without Content-Length (streams) are delimited too
+            self.send_header("Connection", "close")
+            self.end_headers()
+            if self.command != "HEAD":
+                while True:
+                    chunk = response.read1(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+        except OSError:
+            pass  # Client went away mid-response
+        finally:
+            connection.close()
+
+    def tunnel(self):
+        """Pass a websocket upgrade through as raw bytes in both directions"""
+        try:
+            upstream = socket.create_connection(self.upstream, timeout=10)
+        except OSError as e:
+            self.send_json(502, {"error": f"ComfyUI unreachable: {e}"})
+            return
+        upstream.settimeout(None)
+        lines = [self.requestline] + [f"{key}: {value}" for key, value in self.headers.items()]
+        upstream.sendall(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+        def pump_upstream():
+            try:
+                while True:
+                    data = upstream.recv(CHUNK_SIZE)
+                    if not data:
+                        break
+                    self.connection.sendall(data)
+            except OSError:
+                pass
+            finally:
+                # Wake the client-side reader below
+                try:
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+        reader = threading.Thread(target=pump_upstream, daemon=True)
+        reader.start()
+        try:
+            while True:
+                data = self.rfile.read1(CHUNK_SIZE)
+                if not data:
+                    break
+                upstream.sendall(data)
+        except OSError:
+            pass
+        finally:
+            try:
+                upstream.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            upstream.close()
+            reader.join(5)
+            self.close_connection = True
+
+    def tunnel_all(self):
+        """
+        Connect a websocket to every worker and merge their messages
+
+        All workers get the same clientId, so whichever one runs a prompt
+        sends its progress to this client. Worker frames are relayed whole so
+        messages from different workers never interleave; client frames go to
+        every worker.
+        """
+        split = urlsplit(self.path)
+        path = self.path
+        if not parse_qs(split.query).get("clientId"):
+            # Otherwise each worker would assign the client a different id
+            client_id = uuid.uuid4().hex
+            path = f"{self.path}{'&' if split.query else '?'}clientId={client_id}"
+        request = [f"{self.command} {path} {self.request_version}"]
+        request += [f"{key}: {value}" for key, value in self.headers.items()]
+        request = ("\r\n".join(request) + "\r\n\r\n").encode("latin-1")
+
+        upstreams, handshake = [], None
+        for address in self.pool.upstreams:
+            try:
+                sock = socket.create_connection(address, timeout=10)
+                sock.sendall(request)
+                data = b""
+                while b"\r\n\r\n" not in data:
+                    chunk = sock.recv(CHUNK_SIZE)
+                    if not chunk:
+                        raise OSError("closed during handshake")
+                    data += chunk
+            except OSError:
+                continue
+            head, rest = data.split(b"\r\n\r\n", 1)
+            if b" 101 " not in head.split(b"\r\n", 1)[0]:
+                sock.close()
+                continue
+            sock.settimeout(None)
+            # Same Sec-WebSocket-Key, so every worker's 101 answer is equivalent
+            handshake = handshake or head + b"\r\n\r\n"
+            upstreams.append((sock, rest))
+        if not upstreams:
+            self.send_json(502, {"error": "No ComfyUI worker reachable"})
+            return
+
+        send_lock = threading.Lock()
+        self.connection.sendall(handshake)
+
+        def pump_upstream(sock, pending):
+            buffer = pending
+            try:
+                while True:
+                    frames, buffer = split_frames(buffer)
+                    for frame in frames:
+                        if frame[0] & 0x0F == 0x8:
+                            return  # This worker is closing; the others carry on
+                        with send_lock:
+                            self.connection.sendall(frame)
+                    data = sock.recv(CHUNK_SIZE)
+                    if not data:
+                        return
+                    buffer += data
+            except OSError:
+                pass
+
+        readers = [threading.Thread(target=pump_upstream, args=upstream, daemon=True)
+                   for upstream in upstreams]
+        for reader in readers:
+            reader.start()
+
+        def close_client():
+            for reader in readers:
+                reader.join()
+            try:
+                with send_lock:
+                    self.connection.sendall(WS_CLOSE)
+                self.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        # When every worker is gone, close the client side too
+        threading.Thread(target=close_client, daemon=True).start()
+        try:
+            while True:
+                data = self.rfile.read1(CHUNK_SIZE)
+                if not data:
+                    break
+                for sock, _ in upstreams:
+                    try:
+                        sock.sendall(data)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+        finally:
+            for sock, _ in upstreams:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                sock.close()
+            for reader in readers:
+                reader.join(5)
+            self.close_connection = True
+
+    def send_json(self, status: int, payload: Dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # ComfyUI logs requests itself; keep the launcher output readable
+
+
+def make_server(listen_port: int, upstream_port: Union[int, List[int]],
+                fetcher: Optional[LazyFetcher],
+                listen_host: str = "0.0.0.0", upstream_host: str = "127.0.0.1"
+                ) -> ThreadingHTTPServer:
+    """
+    Build a proxy server (call serve_forever() to run it)
+
+    Args:
+        upstream_port: ComfyUI port, or the ports of several workers; the
+            first one serves the UI and everything that is not routed
+    """
+    ports = upstream_port if isinstance(upstream_port, list) else [upstream_port]
+    handler = type("BoundProxyHandler", (ProxyHandler,), {
+        "upstream": (upstream_host, ports[0]),
+        "fetcher": fetcher,
+        "pool": WorkerPool([(upstream_host, port) for port in ports]) if len(ports) > 1 else None,
+    })
+    server = ThreadingHTTPServer((listen_host, listen_port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_proxy(work_dir: str, comfyui_port: int, listen_port: int = PROXY_PORT,
+                manifest_path: str = MANIFEST) -> int:
+    """
+    Serve the lazy-fetch proxy for a ComfyUI install in a background thread
+
+    Returns:
+        Port the proxy listens on (point tunnels here instead of ComfyUI)
+    """
+    fetcher = LazyFetcher(manifest_path, f"{work_dir}/ComfyUI", f"{work_dir}/model-cache")
+    server = make_server(listen_port, comfyui_port, fetcher)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"🧩 Lazy model proxy on port {listen_port} -> ComfyUI {comfyui_port}")
+    return listen_port
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Proxy ComfyUI and fetch prompt models on demand")
+    parser.add_argument("--port", type=int, default=PROXY_PORT,
+                        help=f"Port to listen on (default: {PROXY_PORT})")
+    parser.add_argument("--comfyui-port", type=int, nargs="+",
+                        default=[int(os.getenv("COMFYUI_PORT", "8188"))],
+                        help="ComfyUI port, or one port per worker to balance prompts across them")
+    parser.add_argument("--comfyui-host", default="127.0.0.1")
+    parser.add_argument("--work-dir", default=os.getenv("WORK_DIR", "/content"),
+                        help="Directory containing ComfyUI and model-cache (default: $WORK_DIR)")
+    parser.add_argument("--comfyui-dir", default=None,
+                        help="ComfyUI installation (default: $WORK_DIR/ComfyUI)")
+    parser.add_argument("--cache-root", default=None,
+                        help="Model cache directory (default: $WORK_DIR/model-cache)")
+    parser.add_argument("--manifest", default=os.getenv("MANIFEST", MANIFEST),
+                        help="Path to models_manifest.json")
+    parser.add_argument("--no-fetch", action="store_true", help="Plain pass-through proxy")
+    args = parser.parse_args()
+
+    fetcher = None
+    if not args.no_fetch:
+        if not os.path.exists(args.manifest):
+            print(f"ERROR: Manifest file not found: {args.manifest}")
+            sys.exit(1)
+        fetcher = LazyFetcher(args.manifest,
+                              args.comfyui_dir or f"{args.work_dir}/ComfyUI",
+                              args.cache_root or f"{args.work_dir}/model-cache")
+
+    server = make_server(args.port, args.comfyui_port, fetcher,
+                         upstream_host=args.comfyui_host)
+    ports = ",".join(str(port) for port in args.comfyui_port)
+    print(f"🧩 Proxying :{args.port} -> {args.comfyui_host}:{ports}"
+          f"{'' if fetcher else ' (fetching disabled)'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -26,7 +26,9 @@ else
   WORK_DIR="/content"
 fi
 
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 COMFYUI_DIR="$WORK_DIR/ComfyUI"
+WHEELHOUSE="${PIP_CACHE_DIR:-$WORK_DIR/pip-cache}/wheelhouse"
 BACKUP_DIR="$WORK_DIR/comfy-backups"
 LOCKFILE="$WORK_DIR/comfy-versions.lock"
 
@@ -184,8 +186,19 @@ rollback_environment() {
 update_core_dependencies() {
     log_info "Updating core dependencies..."
     
+    # Nothing to do when the known-good versions are already installed
+    if python "$SCRIPT_DIR/env_snapshot.py" check; then
+        log_success "Core dependencies already at known-good versions"
+        return 0
+    fi
+    
     create_backup "python-env"
     
+    if python "$SCRIPT_DIR/env_snapshot.py" install --wheelhouse "$WHEELHOUSE" && check_compatibility; then
+        log_success "Core dependencies restored from wheelhouse"
+        return 0
+    fi
+    
     # Uninstall potentially conflicting packages
     pip uninstall -y torch torchvision torchaudio xformers numpy protobuf 2>/dev/null || true
     
@@ -208,6 +221,8 @@ update_core_dependencies() {
     pip install -q torchsde
     
     if check_compatibility; then
+        python "$SCRIPT_DIR/env_snapshot.py" prepare --wheelhouse "$WHEELHOUSE" \
+            || log_warning "Could not prepare wheelhouse"
         log_success "Core dependencies updated successfully"
         return 0
     else
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+ComfyUI Supervisor
+Keeps ComfyUI and its tunnel alive: tracks their PIDs, probes liveness, restarts
+crashed or hung processes with exponential backoff and streams the ComfyUI log.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, List, Optional
+
+from launcher_core import (COMFY_LOG, READY_TIMEOUT, is_ready, launch_comfyui, start_comfyui,
+                           tail_log)
+
+HEALTH_INTERVAL = 10        # Seconds between liveness checks
+FAILURE_THRESHOLD = 3       # Consecutive failed probes before a restart
+BACKOFF_INITIAL = 2.0       # First restart delay (seconds), doubled per restart
+BACKOFF_MAX = 60.0
+STABLE_SECONDS = 300        # Healthy this long resets the backoff
+RESTART_LIMIT = 5           # Give up after this many restarts...
+RESTART_WINDOW = 900        # ...within this many seconds
+STOP_TIMEOUT = 10           # Seconds between SIGTERM and SIGKILL
+
+
+def stop_process(process: Optional[subprocess.Popen], timeout: float = STOP_TIMEOUT):
+    """
+    Terminate a process (and its process group if it leads one), then kill it
+
+    ComfyUI is started in its own session, so signalling the group also
+    stops any worker processes it spawned.
+    """
+    if process is None or process.poll() is not None:
+        return
+    try:
+        own_group = os.getpgid(process.pid) == process.pid
+    except OSError:
+        own_group = False
+
+    def send(sig):
+        try:
+            if own_group:
+                os.killpg(process.pid, sig)
+            else:
+                process.send_signal(sig)
+        except OSError:
+            pass
+
+    send(signal.SIGTERM)
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        send(signal.SIGKILL)
+        process.wait()
+
+
+class ManagedProcess:
+    """A supervised process: how to start it, how to probe it, and its restart state"""
+
+    def __init__(self,
+                 name: str,
+                 start: Callable[[], subprocess.Popen],
+                 probe: Optional[Callable[[], bool]] = None,
+                 process: Optional[subprocess.Popen] = None,
+                 startup_grace: float = READY_TIMEOUT,
+                 failure_threshold: int = FAILURE_THRESHOLD,
+                 critical: bool = False):
+        """
+        Args:
+            name: Label used in messages
+            start: Starts the process and returns its handle (may raise on failure)
+            probe: Liveness check; None means "alive while the PID runs"
+            process: Already running instance to adopt instead of starting one
+            startup_grace: Seconds a (re)started process has to pass its first probe
+            failure_threshold: Consecutive failed probes that count as hung
+            critical: Supervision ends when this process exhausts its restarts
+        """
+        self.name = name
+        self.start = start
+        self.probe = probe
+        self.startup_grace = startup_grace
+        self.failure_threshold = failure_threshold
+        self.critical = critical
+        self.process = process
+        self.started_at = time.monotonic()
+        self.ready = process is not None
+        self.failures = 0
+        self.backoff = BACKOFF_INITIAL
+        self.restarts: List[float] = []
+        self.given_up = False
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process else None
+
+    def launch(self):
+        self.process = self.start()
+        self.started_at = time.monotonic()
+        self.ready = self.probe is None
+        self.failures = 0
+
+    def check(self) -> Optional[str]:
+        """Return why the process is unhealthy, or None if it is fine"""
+        if self.process is None:
+            return "not running"
+        if self.process.poll() is not None:
+            return f"exited with code {self.process.returncode}"
+        if self.probe is None:
+            return None
+
+        if self.probe():
+            self.ready = True
+            self.failures = 0
+            if time.monotonic() - self.started_at > STABLE_SECONDS:
+                self.backoff = BACKOFF_INITIAL
+            return None
+
+        if not self.ready:
+            if time.monotonic() - self.started_at > self.startup_grace:
+                return f"not ready after {self.startup_grace:.0f}s"
+            return None
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            return f"failed {self.failures} liveness probes"
+        return None
+
+
+class LogTail(threading.Thread):
+    """Follows a log file from its current end and prints new lines with a prefix"""
+
+    def __init__(self, path: str, prefix: str = "[comfy] ", interval: float = 1.0):
+        super().__init__(daemon=True)
+        self.path = path
+        self.prefix = prefix
+        self.interval = interval
+        self._halt = threading.Event()
+
+    def run(self):
+        pos = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        partial = ""
+        while not self._halt.wait(self.interval):
+            try:
+                size = os.path.getsize(self.path)
+                if size < pos:
+                    pos = 0  # Truncated or replaced
+                if size == pos:
+                    continue
+                with open(self.path, "r", errors="replace") as f:
+                    f.seek(pos)
+                    data = partial + f.read()
+                    pos = f.tell()
+            except OSError:
+                continue
+            lines = data.split("\n")
+            partial = lines.pop()
+            for line in lines:
+                # Progress bars rewrite one line with \r; show only the latest state
+                line = line.rsplit("\r", 1)[-1]
+                if line.strip():
+                    print(f"{self.prefix}{line}", flush=True)
+
+    def stop(self):
+        self._halt.set()
+
+
+class Supervisor:
+    """Runs liveness checks over managed processes and restarts them with backoff"""
+
+    def __init__(self, interval: float = HEALTH_INTERVAL, log_path: Optional[str] = COMFY_LOG):
+        """
+        Args:
+            interval: Seconds between health checks
+            log_path: Log to stream while supervising (None disables streaming)
+        """
+        self.interval = interval
+        self.log_path = log_path
+        self.services: List[ManagedProcess] = []
+        self._stop = threading.Event()
+
+    def add(self, service: ManagedProcess) -> ManagedProcess:
+        self.services.append(service)
+        return service
+
+    def shutdown(self):
+        """Ask run() to stop; safe to call from a signal handler"""
+        self._stop.set()
+
+    def run(self) -> int:
+        """
+        Supervise until shutdown() or a critical process gives up
+
+        Returns:
+            0 on shutdown, 1 if a critical process could not be kept running
+        """
+        tail = LogTail(self.log_path) if self.log_path else None
+        if tail:
+            tail.start()
+        pids = ", ".join(f"{s.name} PID {s.pid}" for s in self.services)
+        print(f"🩺 Supervising {pids} (health check every {self.interval:.0f}s)")
+
+        exit_code = 0
+        try:
+            while not self._stop.wait(self.interval):
+                for service in self.services:
+                    if service.given_up:
+                        continue
+                    reason = service.check()
+                    if reason and not self._restart(service, reason):
+                        if service.critical:
+                            exit_code = 1
+                            self._stop.set()
+        finally:
+            if tail:
+                tail.stop()
+            for service in reversed(self.services):
+                stop_process(service.process)
+        return exit_code
+
+    def _restart(self, service: ManagedProcess, reason: str) -> bool:
+        """Restart a failed service after its backoff; False if it exceeded its restart limit"""
+        now = time.monotonic()
+        service.restarts = [t for t in service.restarts if now - t < RESTART_WINDOW]
+        if len(service.restarts) >= RESTART_LIMIT:
+            print(f"❌ {service.name} {reason}; {RESTART_LIMIT} restarts in "
+                  f"{RESTART_WINDOW // 60} min - giving up")
+            service.given_up = True
+            return False
+
+        print(f"\n⚠️ {service.name} {reason}; restarting in {service.backoff:.0f}s "
+              f"(restart {len(service.restarts) + 1}/{RESTART_LIMIT})")
+        if self.log_path and service.probe is not None:
+            print(tail_log(self.log_path, 10))
+        stop_process(service.process)
+        if self._stop.wait(service.backoff):
+            return True
+
+        service.restarts.append(time.monotonic())
+        service.backoff = min(service.backoff * 2, BACKOFF_MAX)
+        try:
+            service.launch()
+        except Exception as e:
+            # Leave the dead handle in place; the next check retries with more backoff
+            print(f"⚠️ {service.name} restart failed: {e}")
+            return True
+        print(f"🔁 {service.name} restarted (PID {service.pid})")
+        return True
+
+
+def comfyui_service(work_dir: str, port: int, process: Optional[subprocess.Popen] = None,
+                    log_path: str = COMFY_LOG) -> ManagedProcess:
+    """ManagedProcess for ComfyUI, probed on its /system_stats endpoint"""
+    comfyui_dir = f"{work_dir}/ComfyUI"
+    return ManagedProcess(
+        "ComfyUI",
+        start=lambda: start_comfyui(comfyui_dir, port, log_path),
+        probe=lambda: is_ready(port, timeout=5.0),
+        process=process,
+        critical=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run ComfyUI under a restarting supervisor")
+    parser.add_argument("--work-dir", default=os.getenv("WORK_DIR", "/content"),
+                        help="Directory containing ComfyUI (default: $WORK_DIR)")
+    parser.add_argument("--port", type=int, default=int(os.getenv("COMFYUI_PORT", "8188")))
+    parser.add_argument("--interval", type=float, default=HEALTH_INTERVAL,
+                        help=f"Seconds between health checks (default: {HEALTH_INTERVAL})")
+    parser.add_argument("--no-tail", action="store_true", help="Do not stream the ComfyUI log")
+    args = parser.parse_args()
+
+    process = launch_comfyui(args.work_dir, args.port)
+    supervisor = Supervisor(args.interval, log_path=None if args.no_tail else COMFY_LOG)
+    supervisor.add(comfyui_service(args.work_dir, args.port, process))
+
+    signal.signal(signal.SIGINT, lambda signum, frame: supervisor.shutdown())
+    signal.signal(signal.SIGTERM, lambda signum, frame: supervisor.shutdown())
+    sys.exit(supervisor.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Installer Task Graph
+Runs install steps with declared dependencies on a thread pool: a task starts
+as soon as everything it depends on has succeeded, so independent work (model
+downloads vs. git clones and pip installs) overlaps. Dependents of a failed
+task are skipped, and every task's status and timing is reported.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional
+
+from install_profile import format_seconds, record
+from supervisor import stop_process
+
+_print_lock = threading.Lock()
+
+
+class ShellTask:
+    """
+    Runs a shell command and prints its output line by line with a [name] prefix
+
+    Installer steps are exported bash functions, so the command is usually
+    just the function name. The command runs in its own session so an
+    interrupted graph can stop it together with its children.
+    """
+
+    def __init__(self, name: str, command: str, shell: str = "bash"):
+        self.name = name
+        self.command = command
+        self.shell = shell
+        self.process: Optional[subprocess.Popen] = None
+
+    def __call__(self) -> int:
+        env = dict(os.environ, PYTHONUNBUFFERED="1", INSTALL_PHASE=self.name)
+        self.process = subprocess.Popen(
+            [self.shell, "-e", "-c", self.command],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env,
+            start_new_session=True,
+        )
+        for raw in self.process.stdout:
+            # Progress bars rewrite one line with \r; show only the latest state
+            line = raw.decode(errors="replace").rstrip("\n").rsplit("\r", 1)[-1]
+            if line.strip():
+                with _print_lock:
+                    print(f"[{self.name}] {line}", flush=True)
+        return self.process.wait()
+
+    def stop(self):
+        stop_process(self.process)
+
+
+class TaskGraph:
+    """Dependency graph of named tasks executed concurrently"""
+
+    def __init__(self):
+        self.tasks: Dict[str, Dict] = {}
+
+    def add(self, name: str, action: Callable[[], Optional[int]], deps: Iterable[str] = ()):
+        """
+        Register a task
+
+        Args:
+            name: Unique task name
+            action: Callable run in a worker thread; a non-zero return value
+                or an exception marks the task failed
+            deps: Names of tasks that must succeed first
+        """
+        if name in self.tasks:
+            raise ValueError(f"Duplicate task: {name}")
+        self.tasks[name] = {"name": name, "action": action, "deps": list(deps)}
+
+    def order(self) -> List[str]:
+        """
+        Task names in a valid execution order
+
+        Raises:
+            ValueError: On unknown dependencies or cycles
+        """
+        for task in self.tasks.values():
+            unknown = [dep for dep in task["deps"] if dep not in self.tasks]
+            if unknown:
+                raise ValueError(f"Task {task['name']} depends on unknown task(s): {', '.join(unknown)}")
+
+        ordered, state = [], {}
+
+        def visit(name: str, path: List[str]):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "active":
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+            state[name] = "active"
+            for dep in self.tasks[name]["deps"]:
+                visit(dep, path + [name])
+            state[name] = "done"
+            ordered.append(name)
+
+        for name in self.tasks:
+            visit(name, [])
+        return ordered
+
+    def run(self, workers: Optional[int] = None) -> Dict[str, Dict]:
+        """
+        Execute the graph, starting each task once its dependencies succeeded
+
+        Args:
+            workers: Maximum tasks running at once (default: all of them)
+
+        Returns:
+            Results by task name: status ('ok', 'failed', 'skipped'), start
+            offset and duration in seconds, and an error message
+        """
+        pending = self.order()
+        results: Dict[str, Dict] = {}
+        started = time.monotonic()
+
+        def execute(name: str) -> Dict:
+            task = self.tasks[name]
+            begin = time.monotonic()
+            record("phase_start", name)
+            try:
+                code = task["action"]()
+                error = f"exit {code}" if code else None
+            except Exception as e:  # Any task error is reported, not raised
+                error = str(e) or type(e).__name__
+            end = time.monotonic()
+            status = "failed" if error else "ok"
+            record("phase_end", name, status=status)
+            return {"status": status, "start": begin - started, "seconds": end - begin, "error": error}
+
+        def skip_blocked():
+            for name in list(pending):
+                failed = [dep for dep in self.tasks[name]["deps"]
+                          if results.get(dep, {}).get("status") in ("failed", "skipped")]
+                if failed:
+                    pending.remove(name)
+                    results[name] = {"status": "skipped", "start": None, "seconds": 0.0,
+                                     "error": f"{failed[0]} did not succeed"}
+                    with _print_lock:
+                        print(f"[SKIP] {name}: {failed[0]} did not succeed", flush=True)
+
+        running = {}
+        pool = ThreadPoolExecutor(max_workers=workers or max(1, len(pending)))
+        try:
+            while pending or running:
+                skip_blocked()
+                for name in [n for n in pending
+                             if all(results.get(dep, {}).get("status") == "ok"
+                                    for dep in self.tasks[n]["deps"])]:
+                    pending.remove(name)
+                    running[pool.submit(execute, name)] = name
+                if not running:
+                    continue  # Everything left was just skipped
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    results[name] = future.result()
+                    result = results[name]
+                    tag = "❌" if result["error"] else "✅"
+                    detail = f" ({result['error']})" if result["error"] else ""
+                    with _print_lock:
+                        print(f"{tag} {name} {result['status']} in "
+                              f"{format_seconds(result['seconds'])}{detail}", flush=True)
+        except KeyboardInterrupt:
+            for name in running.values():
+                stop = getattr(self.tasks[name]["action"], "stop", None)
+                if stop:
+                    stop()
+            raise
+        finally:
+            pool.shutdown(wait=True)
+        return results
+
+
+def print_summary(results: Dict[str, Dict]):
+    """Per-task table in start order, then the overall outcome"""
+    print("\n=== Task graph ===")
+    print(f"{'Task':<28} {'Status':<8} {'Start':>8} {'Time':>9}  Detail")
+    ordered = sorted(results.items(), key=lambda item: (item[1]["start"] is None, item[1]["start"] or 0))
+    for name, result in ordered:
+        start = "-" if result["start"] is None else f"+{format_seconds(result['start'])}"
+        print(f"{name[:28]:<28} {result['status']:<8} {start:>8} "
+              f"{format_seconds(result['seconds']):>9}  {result['error'] or ''}")
+
+    ends = [r["start"] + r["seconds"] for r in results.values() if r["start"] is not None]
+    busy = sum(r["seconds"] for r in results.values())
+    wall = max(ends, default=0.0)
+    problems = [name for name, result in results.items() if result["status"] != "ok"]
+    if problems:
+        print(f"❌ {len(problems)} task(s) did not complete: {', '.join(problems)}")
+    else:
+        print(f"✅ {len(results)} task(s) finished in {format_seconds(wall)} "
+              f"({format_seconds(busy)} of work)")
+
+
+def parse_spec(spec: str):
+    """'name' or 'name:dep1,dep2' -> (name, [deps])"""
+    name, _, deps = spec.partition(":")
+    return name.strip(), [dep.strip() for dep in deps.split(",") if dep.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run shell tasks with dependencies concurrently",
+        epilog="Each TASK is 'name' or 'name:dep1,dep2'; the shell runs 'name' as the "
+               "command, so export installer steps as functions (export -f name).")
+    parser.add_argument("tasks", nargs="+", metavar="TASK")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Maximum tasks running at once (default: unlimited)")
+    parser.add_argument("--shell", default="bash", help="Shell used to run each task")
+    args = parser.parse_args()
+
+    graph = TaskGraph()
+    try:
+        for spec in args.tasks:
+            name, deps = parse_spec(spec)
+            graph.add(name, ShellTask(name, name, args.shell), deps)
+        graph.order()
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(2)
+
+    try:
+        results = graph.run(args.workers)
+    except KeyboardInterrupt:
+        print("\n⚠️ Interrupted - running tasks stopped")
+        sys.exit(130)
+    print_summary(results)
+    sys.exit(0 if all(r["status"] == "ok" for r in results.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
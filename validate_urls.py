@@ -4,12 +4,17 @@ Comprehensive URL validation for models_manifest.json
 Tests all model URLs for accessibility, auth requirements, and correctness
 """
 
+import argparse
 import json
 import sys
 import os
+import threading
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List, Tuple
+from requests.adapters import HTTPAdapter
+from typing import Callable, Dict, List, Optional, TextIO, Tuple
 from urllib.parse import urlparse
 
 # Fix Windows encoding issues
@@ -28,34 +33,143 @@ class Colors:
     BOLD = '\033[1m'
 
 
-def check_url(name: str, url: str, auth: str, min_size: int) -> Tuple[str, str, dict]:
+DEFAULT_JOBS = 8
+PER_HOST_CONNECTIONS = 4
+DEFAULT_MAX_AGE = 24 * 3600  # Seconds a cached OK/WARNING result is trusted without a request
+DEFAULT_CACHE_FILE = os.path.join(
+    os.getenv('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'comfy', 'url_validation.json')
+
+
+class ResultCache:
+    """
+    On-disk validation results keyed by URL
+
+    Stores the last status/message with the response's ETag, Last-Modified
+    and Content-Length, so fresh entries can be reused outright and stale
+    ones revalidated with a conditional HEAD.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self._entries = json.load(f)
+            except (ValueError, OSError):
+                self._entries = {}
+
+    def get(self, url: str, auth: str, min_size: int) -> Optional[dict]:
+        """Cached entry for a URL, if it was validated with the same auth/min_size"""
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry and entry.get('auth') == auth and entry.get('min_size') == min_size:
+            return entry
+        return None
+
+    def put(self, url: str, auth: str, min_size: int, status: str, message: str, details: dict):
+        with self._lock:
+            self._entries[url] = {
+                'checked_at': time.time(),
+                'auth': auth,
+                'min_size': min_size,
+                'status': status,
+                'message': message,
+                'status_code': details['status_code'],
+                'content_length': details['content_length'],
+                'etag': details.get('etag'),
+                'last_modified': details.get('last_modified'),
+            }
+
+    def touch(self, url: str):
+        with self._lock:
+            if url in self._entries:
+                self._entries[url]['checked_at'] = time.time()
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self._entries, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+
+
+class HostSessions:
+    """Keep-alive requests.Session per host, shared by validation workers"""
+
+    def __init__(self, pool_size: int = PER_HOST_CONNECTIONS):
+        self.pool_size = pool_size
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> requests.Session:
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[host] = session
+            return self._sessions[host]
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+def check_url(name: str, url: str, auth: str, min_size: int,
+              session: Optional[requests.Session] = None,
+              extra_headers: Optional[dict] = None) -> Tuple[str, str, dict]:
     """
     Check if URL is accessible
+    Uses the given pooled session if provided, otherwise a one-off request
     Returns: (status, message, details)
     """
     details = {
         'status_code': None,
         'content_length': None,
         'content_type': None,
-        'redirects': 0
+        'redirects': 0,
+        'etag': None,
+        'last_modified': None,
+        'latency_ms': None,
+        'final_host': None
     }
+    headers = {'User-Agent': 'Mozilla/5.0'}
+    headers.update(extra_headers or {})
+    started = time.monotonic()
     
     try:
         # Make HEAD request to avoid downloading the file
-        response = requests.head(
-            url, 
-            allow_redirects=True, 
-            timeout=15,
-            headers={'User-Agent': 'Mozilla/5.0'}
-        )
+        try:
+            response = (session or requests).head(
+                url, 
+                allow_redirects=True, 
+                timeout=15,
+                headers=headers
+            )
+        finally:
+            details['latency_ms'] = round((time.monotonic() - started) * 1000, 1)
         
+        details['final_host'] = urlparse(response.url).netloc
         details['status_code'] = response.status_code
         details['content_length'] = response.headers.get('Content-Length')
         details['content_type'] = response.headers.get('Content-Type')
         details['redirects'] = len(response.history)
+        details['etag'] = response.headers.get('ETag')
+        details['last_modified'] = response.headers.get('Last-Modified')
         
         # Check status code
-        if response.status_code == 200:
+        if response.status_code == 304:
+            # Only returned for conditional requests (see check_url_cached)
+            return "OK", "Not modified since last check", details
+            
+        elif response.status_code == 200:
             # Verify content length if available
             if details['content_length']:
                 size = int(details['content_length'])
@@ -93,8 +207,111 @@ def check_url(name: str, url: str, auth: str, min_size: int) -> Tuple[str, str,
     except Exception as e:
         return "ERROR", f"Exception: {str(e)[:50]}", details
 
-def validate_manifest(manifest_path: str) -> Dict:
-    """Validate all URLs in manifest"""
+def check_url_cached(name: str, url: str, auth: str, min_size: int,
+                     cache: Optional[ResultCache], max_age: float,
+                     session: Optional[requests.Session] = None) -> Tuple[str, str, dict]:
+    """
+    check_url() backed by the on-disk result cache
+
+    Fresh OK/WARNING results (younger than max_age) are returned without a
+    request; stale ones are revalidated with If-None-Match/If-Modified-Since
+    and a 304 reuses the cached verdict. Errors are always re-probed.
+    """
+    if cache is None:
+        return check_url(name, url, auth, min_size, session=session)
+    
+    entry = cache.get(url, auth, min_size)
+    usable = entry is not None and entry['status'] != "ERROR"
+    if usable and time.time() - entry['checked_at'] < max_age:
+        details = {
+            'status_code': entry['status_code'],
+            'content_length': entry['content_length'],
+            'content_type': None,
+            'redirects': 0,
+            'etag': entry['etag'],
+            'last_modified': entry['last_modified'],
+            'latency_ms': None,  # No request made; filter on cache == 'fresh'
+            'final_host': None,
+            'cache': 'fresh'
+        }
+        return entry['status'], entry['message'], details
+    
+    conditional = {}
+    if usable and entry['etag']:
+        conditional['If-None-Match'] = entry['etag']
+    if usable and entry['last_modified']:
+        conditional['If-Modified-Since'] = entry['last_modified']
+    
+    status, message, details = check_url(name, url, auth, min_size,
+                                         session=session, extra_headers=conditional)
+    if details['status_code'] == 304 and usable:
+        cache.touch(url)
+        details['content_length'] = entry['content_length']
+        details['cache'] = 'revalidated'
+        return entry['status'], entry['message'], details
+    
+    # Transient failures (timeouts, connection errors) are not cached
+    if details['status_code'] is not None:
+        cache.put(url, auth, min_size, status, message, details)
+    return status, message, details
+
+def _record_result(results: Dict, category: str, name: str, meta: Dict,
+                   status: str, message: str, details: dict,
+                   emit: Optional[Callable[[dict], None]] = None) -> Tuple[str, str]:
+    """
+    Count a result and store its detail row; returns (color, icon)
+    If emit is given the row is handed to it instead of being kept in memory
+    """
+    if status == "OK":
+        color = Colors.GREEN
+        icon = "[OK]"
+        results['ok'] += 1
+    elif status == "WARNING":
+        color = Colors.YELLOW
+        icon = "[WARN]"
+        results['warnings'] += 1
+    else:
+        color = Colors.RED
+        icon = "[ERROR]"
+        results['errors'] += 1
+
+    row = {
+        'category': category,
+        'name': name,
+        'status': status,
+        'message': message,
+        'url': meta.get('url', ''),
+        'auth': meta.get('auth', 'none'),
+        'modes': meta.get('modes', []),
+        'http_status': details['status_code'],
+        'size': details['content_length'],
+        'latency_ms': details.get('latency_ms'),
+        'redirects': details.get('redirects', 0),
+        'final_host': details.get('final_host'),
+        'cache': details.get('cache'),
+        'checked_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    }
+    if emit is None:
+        results['details'].append(row)
+    else:
+        emit(row)
+    return color, icon
+
+
+def validate_manifest(manifest_path: str, jobs: int = DEFAULT_JOBS,
+                      cache: Optional[ResultCache] = None,
+                      max_age: float = DEFAULT_MAX_AGE,
+                      emit: Optional[Callable[[dict], None]] = None) -> Dict:
+    """
+    Validate all URLs in manifest
+
+    With jobs > 1, entries are checked concurrently over pooled keep-alive
+    sessions (one per host) and results are printed as they complete;
+    jobs=1 keeps the original ordered, per-category output. With a result
+    cache, unchanged URLs cost a conditional request or nothing at all.
+    With emit, terminal output is suppressed and each result row is passed
+    to emit as soon as it is known (results['details'] stays empty).
+    """
     
     if not Path(manifest_path).exists():
         print(f"{Colors.RED}❌ Manifest not found: {manifest_path}{Colors.RESET}")
@@ -111,11 +328,25 @@ def validate_manifest(manifest_path: str) -> Dict:
         'details': []
     }
     
-    print(f"\n{Colors.BOLD}{'='*80}{Colors.RESET}")
-    print(f"{Colors.BOLD}COMPREHENSIVE MODEL URL VALIDATION{Colors.RESET}")
-    print(f"{Colors.BOLD}{'='*80}{Colors.RESET}\n")
+    if emit is None:
+        print(f"\n{Colors.BOLD}{'='*80}{Colors.RESET}")
+        print(f"{Colors.BOLD}COMPREHENSIVE MODEL URL VALIDATION{Colors.RESET}")
+        print(f"{Colors.BOLD}{'='*80}{Colors.RESET}\n")
+    
+    if jobs > 1:
+        _validate_parallel(manifest, results, jobs, cache, max_age, emit)
+        return results
     
     for category, models in manifest.items():
+        if emit is not None:
+            for name, meta in models.items():
+                results['total'] += 1
+                status, message, details = check_url_cached(
+                    name, meta.get('url', ''), meta.get('auth', 'none'),
+                    meta.get('min_size', 1000000), cache, max_age)
+                _record_result(results, category, name, meta, status, message, details, emit)
+            continue
+        
         print(f"\n{Colors.BLUE}{'─'*80}{Colors.RESET}")
         print(f"{Colors.BLUE}{Colors.BOLD}📦 Category: {category.upper()}{Colors.RESET}")
         print(f"{Colors.BLUE}{'─'*80}{Colors.RESET}\n")
@@ -136,41 +367,89 @@ def validate_manifest(manifest_path: str) -> Dict:
             print(f"  Modes : {modes}")
             print(f"  URL   : {url[:70]}{'...' if len(url) > 70 else ''}")
             
-            status, message, details = check_url(name, url, auth, min_size)
-            
-            # Color code the result
-            if status == "OK":
-                color = Colors.GREEN
-                icon = "[OK]"
-                results['ok'] += 1
-            elif status == "WARNING":
-                color = Colors.YELLOW
-                icon = "[WARN]"
-                results['warnings'] += 1
-            else:
-                color = Colors.RED
-                icon = "[ERROR]"
-                results['errors'] += 1
-            
-            print(f"  {color}{icon} {status}: {message}{Colors.RESET}")
-            
-            # Store detailed result
-            results['details'].append({
-                'category': category,
-                'name': name,
-                'status': status,
-                'message': message,
-                'url': url,
-                'auth': auth,
-                'modes': meta.get('modes', []),
-                'http_status': details['status_code'],
-                'size': details['content_length']
-            })
+            status, message, details = check_url_cached(name, url, auth, min_size, cache, max_age)
+            color, icon = _record_result(results, category, name, meta, status, message, details)
             
+            print(f"  {color}{icon} {status}: {message}{_cache_note(details)}{Colors.RESET}")
             print()  # Blank line between entries
     
     return results
 
+def _cache_note(details: dict) -> str:
+    return f" [cached: {details['cache']}]" if details.get('cache') else ""
+
+def _validate_parallel(manifest: Dict, results: Dict, jobs: int,
+                       cache: Optional[ResultCache], max_age: float,
+                       emit: Optional[Callable[[dict], None]] = None):
+    """Check all entries on a thread pool, streaming each result as it completes"""
+    entries = [(category, name, meta)
+               for category, models in manifest.items()
+               for name, meta in models.items()]
+    results['total'] = len(entries)
+    sessions = HostSessions()
+    
+    def run(entry):
+        category, name, meta = entry
+        url = meta.get('url', '')
+        return check_url_cached(name, url, meta.get('auth', 'none'), meta.get('min_size', 1000000),
+                                cache, max_age, session=sessions.get(url))
+    
+    if emit is None:
+        print(f"Checking {len(entries)} URLs with {jobs} workers...\n")
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(run, entry): entry for entry in entries}
+            for future in as_completed(futures):
+                category, name, meta = futures[future]
+                status, message, details = future.result()
+                color, icon = _record_result(results, category, name, meta, status, message,
+                                             details, emit)
+                if emit is not None:
+                    continue
+                domain = urlparse(meta.get('url', '')).netloc
+                print(f"{color}{icon:<7}{Colors.RESET} {Colors.BOLD}{name}{Colors.RESET} "
+                      f"({category}, {domain}): {color}{message}{_cache_note(details)}{Colors.RESET}")
+    finally:
+        sessions.close()
+
+class JsonEmitter:
+    """
+    Streams result rows as JSON (one document) or NDJSON (one object per line)
+
+    Rows are written and flushed as they arrive so large manifests are never
+    buffered; the summary follows the last row.
+    """
+
+    def __init__(self, fmt: str, stream: TextIO = sys.stdout):
+        self.ndjson = fmt == 'ndjson'
+        self.stream = stream
+        self._first = True
+        self._lock = threading.Lock()
+        if not self.ndjson:
+            self.stream.write('{"results": [\n')
+
+    def __call__(self, row: dict):
+        with self._lock:
+            if self.ndjson:
+                self.stream.write(json.dumps(dict(row, type='result')) + '\n')
+            else:
+                self.stream.write(('' if self._first else ',\n') + json.dumps(row))
+            self._first = False
+            self.stream.flush()
+
+    def close(self, results: Dict):
+        summary = {key: results[key] for key in ('total', 'ok', 'warnings', 'errors')}
+        summary['exit_code'] = summary_exit_code(results)
+        if self.ndjson:
+            self.stream.write(json.dumps(dict(summary, type='summary')) + '\n')
+        else:
+            self.stream.write('\n],\n"summary": ' + json.dumps(summary) + '}\n')
+        self.stream.flush()
+
+def summary_exit_code(results: Dict) -> int:
+    """Exit code for a validation run: 1 if any errors, else 0"""
+    return 1 if results['errors'] > 0 else 0
+
 def print_summary(results: Dict):
     """Print summary report"""
     
@@ -208,7 +487,7 @@ def print_summary(results: Dict):
     
     print(f"\n{Colors.BOLD}{'='*80}{Colors.RESET}\n")
     
-    # Exit code based on results
+    # Exit code based on results (see summary_exit_code)
     if errors > 0:
         print(f"{Colors.RED}Validation FAILED - {errors} critical error(s) found{Colors.RESET}")
         return 1
@@ -220,13 +499,47 @@ def print_summary(results: Dict):
         return 0
 
 def main():
-    manifest_path = "configs/models_manifest.json"
+    parser = argparse.ArgumentParser(description="Validate model URLs in models_manifest.json")
+    parser.add_argument("manifest", nargs="?", default="configs/models_manifest.json",
+                        help="Path to models_manifest.json")
+    parser.add_argument("-j", "--jobs", type=int, default=DEFAULT_JOBS,
+                        help=f"Concurrent checks (default: {DEFAULT_JOBS}; 1 = ordered serial output)")
+    parser.add_argument("--max-age", type=float, default=DEFAULT_MAX_AGE,
+                        help=f"Seconds a cached result is reused without a request "
+                             f"(default: {DEFAULT_MAX_AGE}; 0 = always revalidate)")
+    parser.add_argument("--cache-file", default=DEFAULT_CACHE_FILE,
+                        help=f"Result cache location (default: {DEFAULT_CACHE_FILE})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ignore and do not update the result cache")
+    parser.add_argument("--format", choices=["text", "json", "ndjson"], default="text",
+                        help="Output format; json/ndjson stream one record per URL "
+                             "(latency, redirects, final host) followed by a summary. "
+                             "Rows served from the cache have cache='fresh' and latency_ms "
+                             "null; use --max-age 0 to measure every URL")
+    args = parser.parse_args()
+    
+    # Checked before a JSON emitter opens its document, so errors stay valid JSON
+    if not Path(args.manifest).exists():
+        if args.format == 'text':
+            print(f"{Colors.RED}❌ Manifest not found: {args.manifest}{Colors.RESET}")
+        else:
+            error = {'error': f"Manifest not found: {args.manifest}", 'exit_code': 1}
+            if args.format == 'ndjson':
+                error['type'] = 'error'
+            print(json.dumps(error))
+        sys.exit(1)
+    
+    cache = None if args.no_cache else ResultCache(args.cache_file)
+    emitter = JsonEmitter(args.format) if args.format != 'text' else None
+    results = validate_manifest(args.manifest, jobs=max(args.jobs, 1),
+                                cache=cache, max_age=args.max_age, emit=emitter)
+    if cache:
+        cache.save()
     
-    # Allow custom path as argument
-    if len(sys.argv) > 1:
-        manifest_path = sys.argv[1]
+    if emitter:
+        emitter.close(results)
+        sys.exit(summary_exit_code(results))
     
-    results = validate_manifest(manifest_path)
     exit_code = print_summary(results)
     
     sys.exit(exit_code)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Workflow Dependencies
+Parses workflow JSON files and maps their loader nodes to models_manifest.json
+entries and their node types to custom node repositories, so an install can
+fetch only what the selected workflows need.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List, Tuple
+
+from comfy_utils import format_bytes
+
+WORKFLOWS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "workflows")
+
+# Loader node type -> ComfyUI models/ subfolder of its first widget value
+LOADER_FOLDERS = {
+    "CheckpointLoaderSimple": "checkpoints",
+    "CheckpointLoader": "checkpoints",
+    "ImageOnlyCheckpointLoader": "checkpoints",
+    "VAELoader": "vae",
+    "ControlNetLoader": "controlnet",
+    "DiffControlNetLoader": "controlnet",
+    "LoraLoader": "loras",
+    "LoraLoaderModelOnly": "loras",
+    "UpscaleModelLoader": "upscale_models",
+    "IPAdapterModelLoader": "ipadapter",
+    "AnimateDiffLoader": "animatediff",
+    "ADE_LoadAnimateDiffModel": "animatediff",
+}
+
+# Input that names the model file in API-format prompts (first match per node)
+PROMPT_MODEL_INPUTS = ("ckpt_name", "vae_name", "control_net_name", "lora_name",
+                       "model_name", "ipadapter_file")
+
+# Custom node repositories by node type, then by node type prefix
+NODE_REPOS = {
+    "FaceDetailer": ["https://github.com/ltdrdata/ComfyUI-Impact-Pack",
+                     "https://github.com/ltdrdata/ComfyUI-Impact-Subpack"],
+    "UltralyticsDetectorProvider": ["https://github.com/ltdrdata/ComfyUI-Impact-Subpack"],
+    "SAMLoader": ["https://github.com/ltdrdata/ComfyUI-Impact-Pack"],
+    "AnimateDiffLoader": ["https://github.com/Kosinkadink/ComfyUI-AnimateDiff-Evolved"],
+    "UltimateSDUpscale": ["https://github.com/ssitu/ComfyUI_UltimateSDUpscale"],
+    "KSampler (Efficient)": ["https://github.com/jags111/efficiency-nodes-comfyui"],
+    "OpenposePreprocessor": ["https://github.com/Fannovel16/comfyui_controlnet_aux"],
+    "DWPreprocessor": ["https://github.com/Fannovel16/comfyui_controlnet_aux"],
+    "DepthAnythingPreprocessor": ["https://github.com/Fannovel16/comfyui_controlnet_aux"],
+    "CannyEdgePreprocessor": ["https://github.com/Fannovel16/comfyui_controlnet_aux"],
+}
+NODE_PREFIX_REPOS = [
+    ("VHS_", "https://github.com/Kosinkadink/ComfyUI-VideoHelperSuite"),
+    ("ADE_", "https://github.com/Kosinkadink/ComfyUI-AnimateDiff-Evolved"),
+    ("IPAdapter", "https://github.com/cubiq/ComfyUI_IPAdapter_plus"),
+    ("Impact", "https://github.com/ltdrdata/ComfyUI-Impact-Pack"),
+    ("WAS_", "https://github.com/WASasquatch/was-node-suite-comfyui"),
+]
+
+
+def find_workflow(name: str) -> str:
+    """Path of a workflow given as a path, or as a file name under workflows/"""
+    if os.path.isfile(name):
+        return name
+    for candidate in (name, f"{name}.json", f"workflow_{name}", f"workflow_{name}.json"):
+        path = os.path.join(WORKFLOWS_DIR, candidate)
+        if os.path.isfile(path):
+            return path
+    raise FileNotFoundError(f"Workflow not found: {name}")
+
+
+def load_workflow(path: str) -> Dict:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def workflow_models(workflow_path: str) -> List[Tuple[str, str]]:
+    """
+    List the model files a workflow's loader nodes reference
+
+    Returns:
+        Unique (models subfolder, file name) pairs in node order
+    """
+    models = []
+    for node in load_workflow(workflow_path).get("nodes", []):
+        folder = LOADER_FOLDERS.get(node.get("type"))
+        values = node.get("widgets_values")
+        if folder and isinstance(values, list) and values and isinstance(values[0], str):
+            if (folder, values[0]) not in models:
+                models.append((folder, values[0]))
+    return models
+
+
+def prompt_models(prompt: Dict) -> List[Tuple[str, str]]:
+    """
+    List the model files an API-format prompt (POST /prompt body 'prompt') loads
+
+    Returns:
+        Unique (models subfolder, file name) pairs
+    """
+    models = []
+    for node in prompt.values():
+        if not isinstance(node, dict):
+            continue
+        folder = LOADER_FOLDERS.get(node.get("class_type"))
+        inputs = node.get("inputs") or {}
+        for key in PROMPT_MODEL_INPUTS:
+            value = inputs.get(key)
+            if folder and isinstance(value, str):
+                if (folder, value) not in models:
+                    models.append((folder, value))
+                break
+    return models
+
+
+def workflow_nodes(workflow_path: str) -> List[str]:
+    """Custom node repositories a workflow's node types come from"""
+    repos = []
+    for node in load_workflow(workflow_path).get("nodes", []):
+        node_type = node.get("type") or ""
+        matches = list(NODE_REPOS.get(node_type, []))
+        matches += [repo for prefix, repo in NODE_PREFIX_REPOS if node_type.startswith(prefix)]
+        for repo in matches:
+            if repo not in repos:
+                repos.append(repo)
+    return repos
+
+
+def manifest_index(manifest: Dict) -> Dict[Tuple[str, str], Tuple[str, str]]:
+    """
+    Index manifest entries by the file a workflow would load
+
+    Returns:
+        (models subfolder, file name or alias) -> (category, manifest name)
+    """
+    from model_downloader import CATEGORY_DIRS
+
+    index = {}
+    for category, models in manifest.items():
+        model_dir = CATEGORY_DIRS.get(category, f"models/{category}")
+        folder = os.path.relpath(model_dir, "models")
+        for name, meta in models.items():
+            for file_name in [name] + meta.get("aliases", []):
+                index[(folder, file_name)] = (category, name)
+    return index
+
+
+def workflow_closure(workflows: List[str], manifest: Dict) -> Dict:
+    """
+    Resolve the manifest entries and custom nodes a set of workflows needs
+
+    Args:
+        workflows: Workflow paths or names under workflows/
+        manifest: Parsed models_manifest.json
+
+    Returns:
+        Dict with 'models' (manifest entries: category, name, aliases, min_size),
+        'missing' (models referenced but not in the manifest) and 'nodes' (repo URLs)
+
+    Raises:
+        FileNotFoundError: A workflow does not exist
+    """
+    index = manifest_index(manifest)
+    closure = {"models": [], "missing": [], "nodes": []}
+    seen = set()
+    for workflow in workflows:
+        path = find_workflow(workflow)
+        for folder, file_name in workflow_models(path):
+            key = index.get((folder, file_name))
+            if key is None:
+                closure["missing"].append({"workflow": os.path.basename(path),
+                                           "folder": folder, "name": file_name})
+                continue
+            if key in seen:
+                continue
+            seen.add(key)
+            category, name = key
+            meta = manifest[category][name]
+            closure["models"].append({
+                "category": category,
+                "name": name,
+                "aliases": meta.get("aliases", []),
+                "min_size": meta.get("min_size", 0),
+                "url": meta["url"],
+            })
+        for repo in workflow_nodes(path):
+            if repo not in closure["nodes"]:
+                closure["nodes"].append(repo)
+    return closure
+
+
+def split_workflows(values: List[str]) -> List[str]:
+    """Flatten 'a.json,b.json' style arguments into a list of names"""
+    return [name.strip() for value in values for name in value.split(",") if name.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List the models and custom nodes workflows need")
+    parser.add_argument("workflows", nargs="+",
+                        help="Workflow files or names under workflows/ (comma-separated allowed)")
+    parser.add_argument("--manifest", default=os.getenv("MANIFEST", "configs/models_manifest.json"),
+                        help="Path to models_manifest.json")
+    parser.add_argument("--lockfile", default=None,
+                        help="Lockfile with exact sizes (default: <manifest>.lock.json)")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("--nodes", action="store_true", help="Print custom node repo URLs only")
+    output.add_argument("--models", action="store_true", help="Print manifest model names only")
+    output.add_argument("--json", action="store_true", help="Print the closure as JSON")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.manifest):
+        print(f"ERROR: Manifest file not found: {args.manifest}")
+        sys.exit(1)
+    with open(args.manifest, "r") as f:
+        manifest = json.load(f)
+
+    try:
+        closure = workflow_closure(split_workflows(args.workflows), manifest)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.nodes:
+        print("\n".join(closure["nodes"]))
+        return
+    if args.models:
+        print("\n".join(model["name"] for model in closure["models"]))
+        return
+    if args.json:
+        print(json.dumps(closure, indent=2))
+        return
+
+    from manifest_lock import load_lock, lockfile_path
+    lock = load_lock(args.lockfile or lockfile_path(args.manifest))
+    total = 0
+    print("=== Workflow dependencies ===")
+    for model in closure["models"]:
+        size = lock.get(model["url"], {}).get("size") or model["min_size"]
+        total += size
+        print(f"[MODEL] {model['category']}/{model['name']} ({format_bytes(size)})")
+    for missing in closure["missing"]:
+        print(f"[WARN] {missing['workflow']}: {missing['folder']}/{missing['name']} "
+              f"is not in the manifest")
+    for repo in closure["nodes"]:
+        print(f"[NODE] {repo.rsplit('/', 1)[-1]}")
+    print(f"✅ {len(closure['models'])} model(s), ~{format_bytes(total)}; "
+          f"{len(closure['nodes'])} custom node repo(s)")
+
+
+if __name__ == "__main__":
+    main()